@@ -1,5 +1,7 @@
 from .pipeline import Pipeline
 from .awis import Awis
 from .store import Store
+from .sqlitestore import SqliteStore
 from .reporter import Reporter
 from .gbqcsv import GbqCsv
+from .workerpool import WorkerPool
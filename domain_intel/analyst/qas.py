@@ -39,7 +39,10 @@ class Qas(domain_intel.Pipeline):
             for artifact in domain_intel.utils.analyst_xls_to_json(filename,
                                                                    dry=True):
                 if not dry:
-                    producer.send(topic, artifact.rstrip().encode('utf-8'))
+                    domain = next(iter(json.loads(artifact)))
+                    producer.send(topic,
+                                  artifact.rstrip().encode('utf-8'),
+                                  key=domain_intel.utils.domain_key(domain))
                     artifacts_loaded += 1
 
                 if (max_add_count is not None and
@@ -81,7 +84,9 @@ class Qas(domain_intel.Pipeline):
             for domain, value in data.items():
                 if not dry:
                     artifact = json.dumps({domain: value})
-                    producer.send(topic, artifact.encode('utf-8'))
+                    producer.send(topic,
+                                  artifact.encode('utf-8'),
+                                  key=domain_intel.utils.domain_key(domain))
                     artifacts_loaded += 1
 
                 if (max_add_count is not None and
@@ -96,7 +101,8 @@ class Qas(domain_intel.Pipeline):
                 max_read_count=None,
                 topic='analyst-qas',
                 group_id='default',
-                dry=False):
+                dry=False,
+                bulk=False):
         """Takes Analyst QA records and writes to the persistent store.
 
         *max_read_count* can limit the number of records read from *topic*.
@@ -107,6 +113,12 @@ class Qas(domain_intel.Pipeline):
         The *dry* flag will simulate execution.  No records will be
         published.
 
+        The *bulk* flag buffers the inserts through
+        :meth:`domain_intel.Store.bulk_writer` as per
+        :meth:`domain_intel.Pipeline.persist_batches`.  The edge count is
+        then the number of ``marked`` edges that the bulk imports created
+        or updated.
+
         Returns:
             tuple structure representing counts for the total number of
             records consumed and the number of domains successfully
@@ -122,33 +134,37 @@ class Qas(domain_intel.Pipeline):
         total_messages_read = 0
         edge_count = 0
 
-        with self.consumer(topic, group_id=group_id) as consumer:
-            for message in consumer:
-                total_messages_read += 1
-
-                data = json.loads(message.value.decode('utf-8'))
-                for domain, value in data.items():
-                    kwargs = {
-                        '_key': domain,
-                        'data': value
-                    }
-                    self.store.collection_insert('analyst-qas',
-                                                 kwargs,
-                                                 dry)
-
-                    edge_kwargs = {
-                        '_key': domain,
-                        '_from': 'domain/{}'.format(domain),
-                        '_to': 'analyst-qas/{}'.format(domain),
-                    }
-                    if self.store.edge_insert('marked', edge_kwargs, dry):
-                        edge_count += 1
-
-                if (max_read_count is not None and
-                        total_messages_read >= max_read_count):
-                    log.info('Max read threshold %d breached: exiting',
-                             max_read_count)
-                    break
+        with self.store.bulk_writer(enabled=bulk) as writer:
+            with self.consumer(topic, group_id=group_id) as consumer:
+                batches = self.persist_batches(consumer,
+                                               writer,
+                                               max_read_count)
+                for batch in batches:
+                    total_messages_read += len(batch)
+
+                    for message in batch:
+                        data = json.loads(message.value.decode('utf-8'))
+                        for domain, value in data.items():
+                            kwargs = {
+                                '_key': domain,
+                                'data': value
+                            }
+                            self.store.collection_insert('analyst-qas',
+                                                         kwargs,
+                                                         dry)
+
+                            edge_kwargs = {
+                                '_key': domain,
+                                '_from': 'domain/{}'.format(domain),
+                                '_to': 'analyst-qas/{}'.format(domain),
+                            }
+                            if self.store.edge_insert('marked',
+                                                      edge_kwargs,
+                                                      dry):
+                                edge_count += 1
+
+        if writer is not None:
+            edge_count = writer.stored('marked')
 
         log.info('Analyst QAs read|edge put count %d|%d',
                  total_messages_read, edge_count)
@@ -1,6 +1,8 @@
 """:class:`domain_intel.analyst.Qas` unit test cases.
 
 """
+import json
+import mock
 import pytest
 
 import domain_intel.analyst
@@ -38,3 +40,22 @@ def test_persist(persist_analystqas):
     # ... then I should receive a record count if QAs stored
     msg = 'Count against the "analyst-qas" collection incorrect'
     assert persist_analystqas == (200, 200), msg
+
+
+@mock.patch('domain_intel.utils.safe_producer')
+def test_add_qas_keyed(mock_producer, tmpdir):
+    """Analyst QAs are keyed by domain.
+    """
+    # Given a JSON file of Analyst QAs
+    source = tmpdir.join('qas.json')
+    source.write(json.dumps({'ABC.com': {'requires_login': 'N'}}))
+
+    # when I add the QAs to Kafka
+    qas = domain_intel.analyst.Qas()
+    received = qas.add_qas(str(source))
+
+    # then the QA should be published with the domain key
+    msg = 'Analyst QA message key error'
+    producer = mock_producer.return_value.__enter__.return_value
+    assert received == 1, msg
+    assert producer.send.call_args[1]['key'] == b'abc.com', msg
@@ -1,17 +1,84 @@
 """AWIS slurping base class :class:`domain_intel.awis.Awis`
 """
+import os
 import sys
 import io
+import tempfile
 import domain_intel
+import domain_intel.common
 import domain_intel.utils
+import domain_intel.ratelimit
+import domain_intel.responsecache
+from domain_intel.awisapi.retry import CircuitBreaker, RetryPolicy
+import domain_intel.workerpool
+from domain_intel.pipeline.reload import (chunk_ranges,
+                                          mapped_file,
+                                          scan_records,
+                                          source_path)
 
 from logga import log
 
+CONFIG = domain_intel.common.CONFIG
+
 
 class Awis(domain_intel.Pipeline):
     """Base class for Alexa actions.
 
     """
+    @staticmethod
+    def api_kwargs():
+        """:class:`domain_intel.awisapi.AwisApi` initialiser arguments
+        from the ``awis`` config.  Connection settings that are not
+        configured take the :mod:`domain_intel.awisapi` defaults.
+
+        AWIS requests are rate limited across all processes on the host
+        by a :class:`domain_intel.ratelimit.TokenBucket` if
+        ``requests_per_second`` is set.  AWIS responses are only cached
+        in a :class:`domain_intel.responsecache.ResponseCache` if the
+        ``enabled`` flag of the ``cache`` section is set.  The cache is
+        off by default as cached responses can be up to a TTL old.
+
+        Failed requests are retried as per the ``retry`` section.  Its
+        ``breaker`` is shared by all processes on the host through the
+        breaker ``path`` file.
+
+        Returns:
+            dictionary of keyword arguments
+
+        """
+        awis_conf = CONFIG.get('awis')
+
+        limiter = None
+        if awis_conf.get('requests_per_second'):
+            bucket = domain_intel.ratelimit.TokenBucket
+            limiter = bucket(awis_conf['requests_per_second'],
+                             burst=awis_conf.get('rate_limit_burst'),
+                             path=awis_conf.get('rate_limit_file'))
+
+        cache = None
+        if (awis_conf.get('cache') or {}).get('enabled', False):
+            cache = domain_intel.responsecache.ResponseCache()
+
+        retry_conf = dict(awis_conf.get('retry') or {})
+        breaker_conf = dict(retry_conf.pop('breaker', None) or {})
+        if breaker_conf.get('path') is None:
+            breaker_conf['path'] = os.path.join(tempfile.gettempdir(),
+                                                'domain-intel-awis.breaker')
+        retry = RetryPolicy(breaker=CircuitBreaker(**breaker_conf),
+                            **retry_conf)
+
+        return {
+            'access_id': awis_conf['access_key_id'],
+            'secret_access_key': awis_conf['secret_access_key'],
+            'connect_timeout': awis_conf.get('connect_timeout'),
+            'read_timeout': awis_conf.get('read_timeout'),
+            'max_response_bytes': awis_conf.get('max_response_bytes'),
+            'pool_size': awis_conf.get('pool_size'),
+            'limiter': limiter,
+            'cache': cache,
+            'retry': retry,
+        }
+
     def add_domains(self,
                     file_h,
                     max_add_count=None,
@@ -45,7 +112,8 @@ class Awis(domain_intel.Pipeline):
             for index, domain in enumerate(file_h, 1):
                 if not dry:
                     producer.send(topic,
-                                  domain.rstrip().encode('utf-8'))
+                                  domain.rstrip().encode('utf-8'),
+                                  key=domain_intel.utils.domain_key(domain))
                     domains_loaded += 1
                 log.info('Domain "%s" added to topic "%s"',
                          domain.rstrip(), topic)
@@ -76,48 +144,132 @@ class Awis(domain_intel.Pipeline):
 
             </aws:<end_token>>
 
+        The source file is memory-mapped and split into byte ranges of
+        ``reload_chunk_bytes`` (see
+        :func:`domain_intel.pipeline.reload.chunk_ranges`).  The ranges
+        are spread across the ``reload`` stage worker pool where each
+        worker scans its ranges for record boundaries and publishes
+        through its own producer.  A *max_read_count* threshold runs a
+        single worker so that the threshold is honoured across the file.
+
         Args:
-            *file_h*: file object to the source file
+            *file_h*: path to the source file or a file object.  A file
+            object backed by a file on disk is reloaded by its path.  Any
+            other stream (for example, :data:`sys.stdin` or an
+            :class:`io.BytesIO`) is read in full and reloaded in the
+            current process.  File objects are left open
 
         Returns:
             a tuple representing the read metrics in the form::
 
-                (<lines_consumed>, <records_read>, <records_put))
+                (<lines_consumed>, <records_read>, <records_put>,
+                 <records_failed>)
+
+        """
+        filename = source_path(file_h)
+        if filename is None:
+            data = file_h.read()
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            counts = self.reload_records(scan_records(data, end_token),
+                                         topic,
+                                         max_read_count,
+                                         dry)
+            log.info('Lines read|XML records in|XML records put|failed: '
+                     '%d|%d|%d|%d', *counts)
+
+            return counts
+
+        ranges = chunk_ranges(os.path.getsize(filename))
+        workers = 1
+        if max_read_count is None:
+            workers = domain_intel.workerpool.stage_workers('reload')
+            workers = max(min(workers, len(ranges)), 1)
+
+        target = self.parse_raw_alexa_worker
+        args = (filename, topic, end_token, ranges)
+        kwargs = {
+            'workers': workers,
+            'max_read_count': max_read_count,
+            'dry': dry,
+        }
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='reload',
+                                       workers=workers)
+
+        lines_consumed = records_read = records_put = records_failed = 0
+        for counter in pool.run():
+            lines_consumed += counter[0]
+            records_read += counter[1]
+            records_put += counter[2]
+            records_failed += counter[3]
+
+        log.info('Lines read|XML records in|XML records put|failed: '
+                 '%d|%d|%d|%d',
+                 lines_consumed, records_read, records_put, records_failed)
+
+        return tuple([lines_consumed,
+                      records_read,
+                      records_put,
+                      records_failed])
+
+    def parse_raw_alexa_worker(self,
+                               queue,
+                               filename,
+                               topic,
+                               end_token,
+                               ranges,
+                               workers=1,
+                               max_read_count=None,
+                               dry=False):
+        """:meth:`parse_raw_alexa` worker.  Scans every *workers*-th
+        byte range in *ranges* starting from the worker slot.
 
         """
-        file_h = domain_intel.utils.standardise_file_handle(file_h)
+        with mapped_file(filename) as mapped:
+            records = scan_records(mapped,
+                                   end_token,
+                                   ranges[queue.slot::workers])
+            counts = self.reload_records(records,
+                                         topic,
+                                         max_read_count,
+                                         dry)
+
+        log.info('Reload worker lines|XML records in|put|failed: '
+                 '%d|%d|%d|%d', *counts)
+
+        queue.put(counts)
 
-        start_token_processed = end_token_processed = False
+    def reload_records(self, records, topic, max_read_count=None, dry=False):
+        """Publish raw Alexa XML *records* to the Kafka *topic* through
+        a new producer.
+
+        Returns:
+            a tuple representing the read metrics in the form::
+
+                (<lines_consumed>, <records_read>, <records_put>,
+                 <records_failed>)
+
+        """
         records_read = records_put = lines_consumed = 0
-        xml_segment = []
         with self.producer() as producer:
-            for raw_line in file_h:
-                line = raw_line.rstrip()
-                if r'<?xml version="1.0"?>' in line:
-                    start_token_processed = True
-                elif r'</aws:{}>'.format(end_token) in line:
-                    end_token_processed = True
-
-                if start_token_processed:
-                    lines_consumed += 1
-                    xml_segment.append(line)
-
-                if start_token_processed and end_token_processed:
-                    records_read += 1
-                    if not dry:
-                        message = ('\n'.join(xml_segment)).encode('utf-8')
-                        producer.send(topic, message)
-                        records_put += 1
-                    start_token_processed = end_token_processed = False
-                    del xml_segment[:]
+            for record in records:
+                domain_intel.workerpool.heartbeat()
+                records_read += 1
+                lines_consumed += record.count(b'\n') + 1
+                if not dry:
+                    producer.send(topic, record)
+                    records_put += 1
 
                 if (max_read_count is not None and
                         records_read >= max_read_count):
-                    log.info('Maximum read threshold %d breached - exiting',
-                             max_read_count)
+                    log.info('Maximum read threshold %d breached - '
+                             'exiting', max_read_count)
                     break
 
-        log.info('Lines read|XML records in|XML records put: %d|%d|%d',
-                 lines_consumed, records_read, records_put)
-
-        return tuple([lines_consumed, records_read, records_put])
+        return tuple([lines_consumed,
+                      records_read,
+                      records_put,
+                      producer.failed])
@@ -3,10 +3,11 @@
 """
 import json
 import hashlib
-import multiprocessing
 from logga import log
 
 import domain_intel
+import domain_intel.fetcher
+import domain_intel.envelope
 import domain_intel.awisapi.actions
 import domain_intel.common
 
@@ -23,10 +24,7 @@ class SitesLinkingIn(domain_intel.Awis):
     def __init__(self):
         super(SitesLinkingIn, self).__init__()
 
-        kwargs = {
-            'access_id': CONFIG.get('awis')['access_key_id'],
-            'secret_access_key': CONFIG.get('awis')['secret_access_key']
-        }
+        kwargs = self.api_kwargs()
         domain_intel.Awis.api = domain_intel.awisapi.actions.SitesLinkingIn(**kwargs)
 
     def slurp_sites_linking_in(self,
@@ -117,6 +115,15 @@ class SitesLinkingIn(domain_intel.Awis):
 
         If the *dry* flag is set then only report, don't run.
 
+        Domains are slurped through a :class:`domain_intel.fetcher.Fetcher`
+        so that the AWIS requests for several domains run concurrently.
+        As a single domain can take many slurps, each poll returns no
+        more domains than the fetcher runs at once.  Offsets are
+        committed once the results of the batch have been published.
+        A failed publish raises
+        :class:`domain_intel.pipeline.producer.DeliveryError` before the
+        offsets of the batch are committed.
+
         Returns:
             tuple structure representing counts for the total number of
             records consumed and the number of domains successfully
@@ -125,51 +132,39 @@ class SitesLinkingIn(domain_intel.Awis):
         """
         total_messages_read = total_messages_put = 0
 
-        while True:
-            domain = self._get_message(topic, group_id)
-            if not domain:
-                break
-
-            total_messages_read += 1
-            results = self.slurp_sites_linking_in(domain=domain, dry=dry)
-            if results:
-                sites = {
-                    'domain': domain,
-                    'urls': results,
-                }
-                message = json.dumps(sites).encode('utf-8')
-                if not dry:
-                    with self.producer() as producer:
-                        producer.send('alexa-sli-results', message)
-                    total_messages_put += 1
-
-            if (max_read_count is not None and
-                    (total_messages_read >= max_read_count)):
-                log.info('Maximum read threshold %d breached - exiting',
-                         max_read_count)
-                break
+        def slurp(domain):
+            return self.slurp_sites_linking_in(domain=domain, dry=dry)
+
+        fetcher = domain_intel.fetcher.Fetcher(slurp)
+        with fetcher, self.producer() as producer:
+            with self.consumer(topic, group_id=group_id) as consumer:
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       max_records=fetcher.max_in_flight,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    domains = [x.value.decode('utf-8') for x in batch]
+                    total_messages_read += len(domains)
+
+                    for domain, results in fetcher.map(domains):
+                        if not results or dry:
+                            continue
+
+                        sites = {
+                            'domain': domain,
+                            'urls': results,
+                        }
+                        key = domain_intel.utils.domain_key(domain)
+                        message = domain_intel.envelope.encode(
+                            'siteslinkingin', sites, key=key)
+                        producer.send('alexa-sli-results', message, key=key)
+                        total_messages_put += 1
 
         log.info('SitesLinkingIn read|put count %d|%d',
                  total_messages_read, total_messages_put)
 
         return tuple([total_messages_read, total_messages_put])
 
-    def _get_message(self, topic, group_id='default'):
-        """Due to timeout issues, simply reads a single message from
-        the Kafka *topic*.
-
-        Returns:
-            the next consumed message or `None`
-
-        """
-        with self.consumer(topic, group_id=group_id) as consumer:
-            domain = None
-            for message in consumer:
-                domain = message.value.decode('utf-8')
-                break
-
-        return domain
-
     def parse_raw_siteslinkingin(self,
                                  file_h,
                                  max_read_count=None,
@@ -189,8 +184,8 @@ class SitesLinkingIn(domain_intel.Awis):
 
         Returns:
             tuple structure representing counts for the total number of
-            records consumed and the number of records successfully
-            published to the Kafka topic
+            records consumed, the number of records published to the
+            Kafka topic and the number of failed publishes
 
         """
         file_h = domain_intel.utils.standardise_file_handle(file_h)
@@ -202,8 +197,11 @@ class SitesLinkingIn(domain_intel.Awis):
                 records_read += 1
 
                 if not dry:
+                    line = raw_line.rstrip()
+                    domain = json.loads(line).get('domain')
                     producer.send(topic,
-                                  raw_line.rstrip().encode('utf-8'))
+                                  line.encode('utf-8'),
+                                  key=domain_intel.utils.domain_key(domain))
                     records_put += 1
 
                 if (max_read_count is not None and
@@ -212,13 +210,14 @@ class SitesLinkingIn(domain_intel.Awis):
                              max_read_count)
                     break
 
-        return tuple([records_read, records_put])
+        return tuple([records_read, records_put, producer.failed])
 
     def persist(self,
                 max_read_count=None,
                 topic='alexa-sli-results',
                 group_id='default',
-                dry=False):
+                dry=False,
+                bulk=False):
         """Takes Alexa SitesLinkingIn records and writes to the persistent
         store.
 
@@ -230,23 +229,29 @@ class SitesLinkingIn(domain_intel.Awis):
         The *dry* flag will simulate execution.  No records will be
         published.
 
+        The *bulk* flag buffers the inserts through
+        :meth:`domain_intel.Store.bulk_writer` as per
+        :meth:`domain_intel.Pipeline.persist_batches`.  The edge count is
+        then the number of ``links_into`` edges that the bulk imports created
+        or updated.
+
         Returns:
             tuple structure representing counts for the total number of
             records consumed and the number of domains successfully
             published to the Kafka topic
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.persist_worker
-        args = (count_q, max_read_count, topic, group_id)
-        kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        args = (max_read_count, topic, group_id)
+        kwargs = {'dry': dry, 'bulk': bulk}
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='sli-persist')
 
         total_read_count = 0
         total_put_count = 0
-        while not count_q.empty():
-            counter = count_q.get()
+        for counter in pool.run():
             total_read_count += counter[0]
             total_put_count += counter[1]
 
@@ -261,15 +266,16 @@ class SitesLinkingIn(domain_intel.Awis):
                        max_read_count,
                        topic,
                        group_id,
-                       dry):
+                       dry,
+                       bulk=False):
         """Write out the SitesLinkingIn information to a persistent store.
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
@@ -280,27 +286,32 @@ class SitesLinkingIn(domain_intel.Awis):
 
         messages_read = edge_count = 0
 
-        with self.consumer(topic, group_id=group_id) as consumer:
-            for message in consumer:
-                data = message.value.decode('utf-8')
+        with self.store.bulk_writer(enabled=bulk) as writer:
+            with self.consumer(topic, group_id=group_id) as consumer:
+                batches = self.persist_batches(consumer,
+                                               writer,
+                                               max_read_count)
+                for batch in batches:
+                    messages_read += len(batch)
 
-                messages_read += 1
-                edge_count += self.extract_siteslinkingin(data, dry=dry)
+                    for message in batch:
+                        data = domain_intel.envelope.loads(message.value)
+                        edge_count += self.extract_siteslinkingin(data,
+                                                                  dry=dry)
 
-                if (max_read_count is not None and
-                        messages_read >= max_read_count):
-                    log.info('Max read threshold %d breached - exiting',
-                             max_read_count)
-                    break
+                log.debug('SitesLinkingIn persist worker messages read %d',
+                          messages_read)
 
-            log.debug('SitesLinkingIn persist worker messages read %d',
-                      messages_read)
+        if writer is not None:
+            edge_count = writer.stored('links_into')
 
         queue.put((messages_read, edge_count))
 
     def extract_siteslinkingin(self, data, dry):
         """Takes *data* and re-organises the structure so that it can
         be inserted into the Domain Intel data model's graph relationship.
+        *data* is the SitesLinkingIn JSON text or the equivalent decoded
+        dictionary.
 
         *dry* run will only simulate execution and not write to the
         persistent store.
@@ -311,7 +322,9 @@ class SitesLinkingIn(domain_intel.Awis):
         """
         edge_count = 0
 
-        as_json = json.loads(data)
+        as_json = data
+        if not isinstance(as_json, dict):
+            as_json = json.loads(data)
         domain = as_json.get('domain')
         urls = as_json.get('urls', [])
 
@@ -104,7 +104,7 @@ def test_parse_raw_siteslinkingin(parse_raw_siteslinkingin):
     """Parse raw Alexa SitesLinkingIn action as JSON.
     """
     msg = 'Re-load of raw SitesLinkingIn Alexa JSON into Kafka error'
-    assert parse_raw_siteslinkingin == (68, 68), msg
+    assert parse_raw_siteslinkingin == (68, 68, 0), msg
 
 
 @pytest.mark.usefixtures('docker_compose',
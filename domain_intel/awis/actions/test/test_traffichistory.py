@@ -32,7 +32,7 @@ def test_parse_raw_traffichistory(parse_raw_traffichistory):
     """Parse raw Alexa TrafficHistory action as JSON.
     """
     msg = 'Re-load of raw TrafficHistory Alexa JSON into Kafka error'
-    assert parse_raw_traffichistory == (20123, 100, 100), msg
+    assert parse_raw_traffichistory == (20123, 100, 100, 0), msg
 
 
 def test_flatten_single_traffichistory_xml():
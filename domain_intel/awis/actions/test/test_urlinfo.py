@@ -7,6 +7,7 @@ from datetime import datetime
 import pytest
 import mock
 
+import domain_intel
 import domain_intel.awis.actions
 import domain_intel.utils
 
@@ -78,12 +79,34 @@ def test_flatten_single_domain_xml():
     assert len(received) == 1, msg
 
 
+def test_flatten_batched_domain_xml_keyed():
+    """Flatten a batched-domain XML response keyed by domain.
+    """
+    # Given an Alexa AWIS batched XML response
+    with open(os.path.join('domain_intel',
+                           'test',
+                           'files',
+                           'samples',
+                           'multi-domain-result.xml')) as _fh:
+        source_xml = _fh.read().rstrip()
+
+    # when I flatten the XML with domain keys
+    awis = domain_intel.awis.actions.UrlInfo()
+    received = awis.flatten_batched_xml(source_xml, keyed=True)
+
+    # then I should receive a list of (domain, JSON) pairs
+    msg = 'Keyed flattened domains should pair DataUrl with JSON'
+    assert len(received) == 2, msg
+    for url, flattened in received:
+        assert url in flattened, msg
+
+
 @pytest.mark.usefixtures('docker_compose', 'kafka_ready')
 def test_parse_raw_urlinfo(parse_raw_urlinfo):
     """Parse raw Alexa XML.
     """
     msg = 'Real load of raw Alexa load into Kafka error'
-    assert parse_raw_urlinfo == (9385, 16, 16), msg
+    assert parse_raw_urlinfo == (9385, 16, 16, 0), msg
 
 
 @pytest.mark.usefixtures('docker_compose',
@@ -322,3 +345,157 @@ def test_wide_column_dump_worker():
     # then I should get a count of CSV lines
     msg = 'Wide-column CSV count incorrect'
     assert received == (80, 242), msg
+
+
+@mock.patch('domain_intel.awis.actions.UrlInfo.consumer')
+@mock.patch('domain_intel.utils.safe_producer')
+@mock.patch('domain_intel.awis.actions.UrlInfo.batches')
+@mock.patch('domain_intel.awis.actions.UrlInfo.api',
+            new_callable=mock.PropertyMock)
+@mock.patch('domain_intel.awis.actions.UrlInfo.store',
+            new_callable=mock.PropertyMock)
+def test_fused_worker(mock_store,
+                      mock_api,
+                      mock_batches,
+                      mock_producer,
+                      mock_consumer,
+                      tmpdir):
+    """Fused slurp, flatten and persist of a domain batch.
+    """
+    # Given an Alexa AWIS batched XML response
+    with open(os.path.join('domain_intel',
+                           'test',
+                           'files',
+                           'samples',
+                           'multi-domain-result.xml'), 'rb') as _fh:
+        mock_api.return_value.url_info.return_value = _fh.read()
+
+    # and a batch of 2 domains
+    mock_batches.return_value = [[mock.Mock(value=b'a.com\n'),
+                                  mock.Mock(value=b'b.com\n')]]
+
+    # and an embedded store
+    store = domain_intel.SqliteStore(path=str(tmpdir.join('fused.db')))
+    mock_store.return_value = store
+
+    # when I run the fused worker with a raw archive topic
+    queue = mock.Mock()
+    awis = domain_intel.awis.actions.UrlInfo()
+    awis.fused_worker(queue, None, 'gtr-domains', 'default',
+                      archive='alexa-results')
+
+    # then the read|put counts should be returned
+    msg = 'Fused worker read|put count error'
+    assert queue.put.call_args[0][0] == (2, 2), msg
+
+    # and the flattened domains should be persisted
+    msg = 'Fused worker domain persist count error'
+    assert store.get_collection_count() == 2, msg
+
+    # and the raw Alexa response should be archived
+    msg = 'Fused worker raw archive error'
+    producer = mock_producer.return_value.__enter__.return_value
+    assert producer.send.call_args[0][0] == 'alexa-results', msg
+
+
+@mock.patch('domain_intel.awis.actions.UrlInfo.consumer')
+@mock.patch('domain_intel.utils.safe_producer')
+@mock.patch('domain_intel.awis.actions.UrlInfo.batches')
+@mock.patch('domain_intel.awis.actions.UrlInfo.store',
+            new_callable=mock.PropertyMock)
+def test_traverse_relationship_read_count(mock_store,
+                                          mock_batches,
+                                          mock_producer,
+                                          mock_consumer):
+    """Traverse worker counts the messages read.
+    """
+    # Given a batch of 2 domain labels
+    mock_batches.return_value = [[mock.Mock(value=b'a.com'),
+                                  mock.Mock(value=b'b.com')]]
+
+    # and a store that only traverses the first domain
+    traverse_many = mock_store.return_value.traverse_many
+    traverse_many.return_value = [('a.com', {'vertices': [], 'paths': []})]
+
+    # when I run the traverse worker
+    awis = domain_intel.awis.actions.UrlInfo()
+    received = awis.traverse_relationship(dry=True)
+
+    # then both messages should be counted as read
+    msg = 'Traverse worker read count error'
+    assert received == 2, msg
+
+    # and a failed batch traversal should be raised
+    msg = 'Batch traversal should halt on error'
+    assert traverse_many.call_args[1]['halt_on_error'], msg
+
+
+@mock.patch('domain_intel.awis.actions.UrlInfo.consumer')
+@mock.patch('domain_intel.awis.actions.UrlInfo.write_to_store')
+@mock.patch('domain_intel.awis.actions.UrlInfo.batches')
+@mock.patch('domain_intel.awis.actions.UrlInfo.store',
+            new_callable=mock.PropertyMock)
+def test_persist_worker_bulk_counts(mock_store,
+                                    mock_batches,
+                                    mock_write,
+                                    mock_consumer):
+    """Bulk persist worker reports the bulk import put count.
+    """
+    # Given a batch of 3 flattened domains
+    mock_batches.return_value = [[mock.Mock(value=b'{}'),
+                                  mock.Mock(value=b'{}'),
+                                  mock.Mock(value=b'{}')]]
+
+    # and a bulk writer that imports 2 of the URL info documents
+    writer = mock.Mock()
+    writer.stored.return_value = 2
+    bulk_writer = mock_store.return_value.bulk_writer
+    bulk_writer.return_value.__enter__.return_value = writer
+
+    # when I run the bulk persist worker
+    queue = mock.Mock()
+    awis = domain_intel.awis.actions.UrlInfo()
+    awis.persist_worker(queue, None, 'alexa-flattened', 'default', bulk=True)
+
+    # then the read|put counts should be returned
+    msg = 'Bulk persist worker read|put count error'
+    assert queue.put.call_args[0][0] == (3, 2), msg
+    writer.stored.assert_called_once_with('url-info')
+
+    # and the writer buffers should be flushed before commits and on idle
+    msg = 'Bulk persist worker flush callables error'
+    kwargs = mock_batches.call_args[1]
+    assert kwargs['flush'] == [writer.flush], msg
+    assert kwargs['idle'] == [writer.flush_stale], msg
+
+
+@mock.patch('domain_intel.awis.actions.UrlInfo.consumer')
+@mock.patch('domain_intel.utils.safe_producer')
+@mock.patch('domain_intel.awis.actions.UrlInfo.batches')
+@mock.patch('domain_intel.awis.actions.UrlInfo.api',
+            new_callable=mock.PropertyMock)
+def test_read_worker_coalesced_unpublished(mock_api,
+                                           mock_batches,
+                                           mock_producer,
+                                           mock_consumer):
+    """Read worker raises when coalesced domains are not published.
+    """
+    # Given a batch of 2 domains
+    mock_batches.return_value = [[mock.Mock(value=b'a.com\n'),
+                                  mock.Mock(value=b'b.com\n')]]
+
+    # and a coalescer that only publishes one of them
+    coalescer = mock.Mock()
+    coalescer.submit.return_value = 1
+
+    # when I run the read worker
+    # then a RuntimeError should be raised so offsets are not committed
+    queue = mock.Mock()
+    awis = domain_intel.awis.actions.UrlInfo()
+    with pytest.raises(RuntimeError):
+        awis.read_worker(queue, None, 'gtr-domains', 'default', True,
+                         coalescer=coalescer)
+
+    # and no read count should be reported
+    msg = 'Read worker should not report a failed batch'
+    assert not queue.put.called, msg
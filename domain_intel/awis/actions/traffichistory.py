@@ -2,7 +2,6 @@
 :class:`domain_intel.awis.actions.TrafficHistory`
 """
 import json
-import multiprocessing
 import collections
 import lxml.etree
 import xmljson
@@ -10,6 +9,8 @@ from logga import log
 
 import domain_intel
 import domain_intel.parser
+import domain_intel.fetcher
+import domain_intel.envelope
 import domain_intel.awisapi.actions
 
 CONFIG = domain_intel.common.CONFIG
@@ -23,10 +24,7 @@ class TrafficHistory(domain_intel.Awis):
     def __init__(self):
         super(TrafficHistory, self).__init__()
 
-        kwargs = {
-            'access_id': CONFIG.get('awis')['access_key_id'],
-            'secret_access_key': CONFIG.get('awis')['secret_access_key']
-        }
+        kwargs = self.api_kwargs()
         domain_intel.Awis.api = domain_intel.awisapi.actions.TrafficHistory(**kwargs)
 
     def slurp_traffic(self,
@@ -54,17 +52,17 @@ class TrafficHistory(domain_intel.Awis):
             published to the Kafka topics
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.slurp_traffic_worker
-        args = (count_q, max_read_count, topic, group_id)
+        args = (max_read_count, topic, group_id)
         kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='traffic-slurp')
 
         total_read_count = 0
         total_put_count = 0
-        while not count_q.empty():
-            counter = count_q.get()
+        for counter in pool.run():
             total_read_count += counter[0]
             total_put_count += counter[1]
 
@@ -82,38 +80,48 @@ class TrafficHistory(domain_intel.Awis):
                              dry=False):
         """Slurp TrafficHistory worker.
 
+        Each batch of domains is slurped through a
+        :class:`domain_intel.fetcher.Fetcher` so that AWIS requests run
+        concurrently.
+
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The remaining parameter list is as per :meth:`slurp_traffic`.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
         total_messages_read = 0
         total_messages_put = 0
 
-        with self.producer() as producer:
+        def traffic_history(domain):
+            return self.api.traffic_history(domain=domain)
+
+        fetcher = domain_intel.fetcher.Fetcher(traffic_history)
+        with fetcher, self.producer() as producer:
             with self.consumer(topic, group_id=group_id) as consumer:
-                for message in consumer:
-                    domain = message.value.decode('utf-8')
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    domains = [x.value.decode('utf-8') for x in batch]
+
+                    total_messages_read += len(domains)
+                    if dry:
+                        continue
 
-                    total_messages_read += 1
-                    if not dry:
-                        result = self.api.traffic_history(domain=domain)
+                    for domain, result in fetcher.map(domains):
                         if result is not None:
-                            producer.send('alexa-traffic-results', result)
+                            key = domain_intel.utils.domain_key(domain)
+                            producer.send('alexa-traffic-results',
+                                          result,
+                                          key=key)
                             total_messages_put += 1
 
-                    if (max_read_count is not None and
-                            (total_messages_read >= max_read_count)):
-                        log.info('Maximum read threshold %d breached - exiting',
-                                 max_read_count)
-                        break
-
         log.info('TrafficHistory worker read|put count %d|%d',
                  total_messages_read, total_messages_put)
 
@@ -210,18 +218,23 @@ class TrafficHistory(domain_intel.Awis):
             *group_id*: Kafka managed consumer element that manages
             the messages read from the topic
 
-        """
-        count_q = multiprocessing.Queue()
+        Returns:
+            tuple structure representing counts for the total number of
+            records consumed and the number of records successfully
+            published to the Kafka topic
 
+        """
         target = self.flatten_worker
-        args = (count_q, max_read_count, topic, group_id)
+        args = (max_read_count, topic, group_id)
         kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='traffic-flatten')
 
         total_read_count = 0
         total_put_count = 0
-        while not count_q.empty():
-            counter = count_q.get()
+        for counter in pool.run():
             total_read_count += counter[0]
             total_put_count += counter[1]
 
@@ -241,12 +254,12 @@ class TrafficHistory(domain_intel.Awis):
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The parameter list is as per :meth:`flatten_worker`.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
@@ -260,21 +273,26 @@ class TrafficHistory(domain_intel.Awis):
 
         with self.producer() as producer:
             with self.consumer(topic, group_id=group_id) as consumer:
-                records_read = 0
-                for message in consumer:
-                    total_messages_read += 1
-                    traffic = TrafficHistory.flatten_xml(message.value)
-                    if traffic is None:
-                        continue
-
-                    if not dry:
-                        total_messages_put += 1
-                        producer.send('alexa-traffic-flattened',
-                                      traffic.encode('utf-8'))
-
-                    if (max_read_count is not None and
-                            (records_read >= max_read_count)):
-                        break
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    total_messages_read += len(batch)
+
+                    for message in batch:
+                        traffic = TrafficHistory.flatten_xml(message.value)
+                        if traffic is None:
+                            continue
+
+                        if not dry:
+                            total_messages_put += 1
+                            value = domain_intel.envelope.encode(
+                                'traffichistory',
+                                json.loads(traffic),
+                                key=message.key)
+                            producer.send('alexa-traffic-flattened',
+                                          value,
+                                          key=message.key)
 
         log.info('TrafficHistory flatten worker read|put count %d|%d',
                  total_messages_read, total_messages_put)
@@ -285,7 +303,8 @@ class TrafficHistory(domain_intel.Awis):
                 max_read_count=None,
                 topic='alexa-traffic-flattened',
                 group_id='default',
-                dry=False):
+                dry=False,
+                bulk=False):
         """Takes Alexa TrafficHistory records and writes to the persistent
         store.
 
@@ -297,23 +316,29 @@ class TrafficHistory(domain_intel.Awis):
         The *dry* flag will simulate execution.  No records will be
         published.
 
+        The *bulk* flag buffers the inserts through
+        :meth:`domain_intel.Store.bulk_writer` as per
+        :meth:`domain_intel.Pipeline.persist_batches`.  The edge count is
+        then the number of ``visit`` edges that the bulk imports created
+        or updated.
+
         Returns:
             tuple structure representing counts for the total number of
             records consumed and the number of domains successfully
             published to the Kafka topic
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.persist_worker
-        args = (count_q, max_read_count, topic, group_id)
-        kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        args = (max_read_count, topic, group_id)
+        kwargs = {'dry': dry, 'bulk': bulk}
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='traffic-persist')
 
         total_read_count = 0
         total_put_count = 0
-        while not count_q.empty():
-            counter = count_q.get()
+        for counter in pool.run():
             total_read_count += counter[0]
             total_put_count += counter[1]
 
@@ -323,15 +348,21 @@ class TrafficHistory(domain_intel.Awis):
 
         return read_put_counts
 
-    def persist_worker(self, queue, max_read_count, topic, group_id, dry):
+    def persist_worker(self,
+                       queue,
+                       max_read_count,
+                       topic,
+                       group_id,
+                       dry,
+                       bulk=False):
         """TrafficHistory persistent store worker.
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
@@ -344,28 +375,32 @@ class TrafficHistory(domain_intel.Awis):
         total_messages_read = 0
         edge_count = 0
 
-        with self.consumer(topic, group_id=group_id) as consumer:
-            for message in consumer:
-                total_messages_read += 1
-
-                data = json.loads(message.value.decode('utf-8'))
-                parser = domain_intel.parser.TrafficHistory(data)
-                self.store.collection_insert('traffic',
-                                             parser.db_traffichistory_raw(),
-                                             dry)
-
-                if self.store.edge_insert('visit',
-                                          parser.db_visit_edge(),
-                                          dry):
-                    edge_count += 1
-
-                if (max_read_count is not None and
-                        total_messages_read >= max_read_count):
-                    log.info('Max read threshold %d breached - exiting',
-                             max_read_count)
-                    break
-
-            log.info('TrafficHistory persist worker messages read %d',
-                     total_messages_read)
+        with self.store.bulk_writer(enabled=bulk) as writer:
+            with self.consumer(topic, group_id=group_id) as consumer:
+                batches = self.persist_batches(consumer,
+                                               writer,
+                                               max_read_count)
+                for batch in batches:
+                    total_messages_read += len(batch)
+
+                    for message in batch:
+                        data = domain_intel.envelope.loads(message.value)
+                        parser = domain_intel.parser.TrafficHistory(data)
+                        self.store.collection_insert(
+                            'traffic',
+                            parser.db_traffichistory_raw(),
+                            dry
+                        )
+
+                        if self.store.edge_insert('visit',
+                                                  parser.db_visit_edge(),
+                                                  dry):
+                            edge_count += 1
+
+                log.info('TrafficHistory persist worker messages read %d',
+                         total_messages_read)
+
+        if writer is not None:
+            edge_count = writer.stored('visit')
 
         queue.put((total_messages_read, edge_count))
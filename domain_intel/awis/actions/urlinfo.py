@@ -6,8 +6,8 @@ import json
 import time
 import csv
 import tempfile
-import multiprocessing
 import collections
+import threading
 import hashlib
 import lxml.etree
 import xmljson
@@ -15,10 +15,21 @@ from logga import log
 
 import domain_intel
 import domain_intel.utils
+import domain_intel.fetcher
+import domain_intel.envelope
+import domain_intel.reporter
 import domain_intel.awisapi.actions
 import domain_intel.awisapi.parser
+import domain_intel.workerpool
+from domain_intel.pipeline.coalescer import BatchCoalescer
+
+try:
+    import queue as Queue
+except ImportError:
+    import Queue
 
 CONFIG = domain_intel.common.CONFIG
+PROJECTION = domain_intel.reporter.PROJECTION
 
 
 class UrlInfo(domain_intel.Awis):
@@ -29,19 +40,20 @@ class UrlInfo(domain_intel.Awis):
     def __init__(self):
         super(UrlInfo, self).__init__()
 
-        kwargs = {
-            'access_id': CONFIG.get('awis')['access_key_id'],
-            'secret_access_key': CONFIG.get('awis')['secret_access_key']
-        }
+        kwargs = self.api_kwargs()
         domain_intel.Awis.api = domain_intel.awisapi.actions.UrlInfo(**kwargs)
 
-    def add_domain_labels(self, max_add_count=None, dry=False):
+    def add_domain_labels(self, max_add_count=None, checkpoint=None, dry=False):
         """Add the "domain" collection labels to a Kafka topic.
 
         *max_add_count* is a threshold that limits the number of
         domains to publish.  If set to `None` then threshold is
         ignored and all available messages are published.
 
+        *checkpoint* is an optional file path that tracks the export
+        progress of the "domain" collection so that an interrupted
+        run can be resumed.
+
         The *dry* flag will simulate execution.  No records will be
         published.
 
@@ -52,10 +64,12 @@ class UrlInfo(domain_intel.Awis):
         labels_loaded = 0
 
         with self.producer() as producer:
-            for index, domain in enumerate(self.store.export_ids('domain'), 1):
+            labels = self.store.export_ids('domain', checkpoint=checkpoint)
+            for index, domain in enumerate(labels, 1):
                 if not dry:
                     producer.send('domain-labels',
-                                  domain.rstrip().encode('utf-8'))
+                                  domain.rstrip().encode('utf-8'),
+                                  key=domain_intel.utils.domain_key(domain))
                     labels_loaded += 1
                 log.info('Domain "%s" added', domain.rstrip())
                 if index % 1000 == 0:
@@ -90,20 +104,44 @@ class UrlInfo(domain_intel.Awis):
         we can force a re-read of the topic's messages by overriding
         *group_id* with a unique value.
 
+        If *slurp* is set then the domains read by all workers are
+        coalesced into full AWIS UrlInfo batches by a
+        :class:`domain_intel.pipeline.coalescer.BatchCoalescer` that
+        runs in this process.
+
         Returns:
             total count of records read
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.read_worker
-        args = (count_q, max_read_count, topic, group_id, slurp)
+        args = (max_read_count, topic, group_id, slurp)
         kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        workers = domain_intel.workerpool.stage_workers('urlinfo-read')
+
+        coalescer = None
+        if slurp:
+            coalescer = BatchCoalescer(workers)
+            kwargs['coalescer'] = coalescer
+
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='urlinfo-read',
+                                       workers=workers)
+
+        if coalescer is None:
+            counts = pool.run()
+        else:
+            with self.producer() as producer:
+                def dispatch(domains, done):
+                    self.slurp_domains(producer, domains, dry=dry, done=done)
+
+                with coalescer.running(dispatch):
+                    counts = pool.run()
 
         total_count = 0
-        while not count_q.empty():
-            total_count += count_q.get()
+        for count in counts:
+            total_count += count
 
         return total_count
 
@@ -113,59 +151,69 @@ class UrlInfo(domain_intel.Awis):
                     topic,
                     group_id,
                     slurp,
-                    dry=False):
+                    dry=False,
+                    coalescer=None):
         """Read all domains from the Kafka partitions.
 
+        If *slurp* is set then the domains of each batch are handed to
+        the pool-wide *coalescer* for slurping.  If any of those domains
+        are not published then a :class:`RuntimeError` is raised so
+        that the offsets of the batch are not committed.  Without a
+        *coalescer* the 5-domain batches are slurped through a
+        :class:`domain_intel.fetcher.Fetcher` so that AWIS requests run
+        concurrently.
+
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The parameter list is as per :meth:`read_domains`.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
         log.debug('Read worker set to read %s messages',
                   max_read_count or 'all')
 
-        with self.producer() as producer:
+        fetcher = domain_intel.fetcher.Fetcher(self.api.url_info)
+        with fetcher, self.producer() as producer:
             with self.consumer(topic, group_id) as consumer:
-                domain_batch = []
-                messages_read = 0
                 total_messages_read = 0
 
-                for message in consumer:
-                    messages_read += 1
-                    total_messages_read += 1
-
-                    domain_batch.append(message.value.rstrip())
-                    if (len(domain_batch) > 4 or
-                            (max_read_count is not None and
-                             messages_read >= max_read_count)):
-                        if slurp:
-                            self.slurp_domains(producer, domain_batch, dry=dry)
-                        else:
+                # Domains are slurped before the next poll so that the
+                # committed offsets never run ahead of the API calls.
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    total_messages_read += len(batch)
+
+                    domains = [x.value.rstrip() for x in batch]
+                    domain_batches = [domains[i:i + 5]
+                                      for i in range(0, len(domains), 5)]
+                    if not slurp:
+                        for domain_batch in domain_batches:
                             log.info('Domains pending: %s', domain_batch)
-                        del domain_batch[:]
-                        messages_read = 0
+                        continue
 
-                    if (max_read_count is not None and
-                            (total_messages_read >= max_read_count)):
-                        break
+                    if coalescer is not None:
+                        published = coalescer.submit(domains)
+                        if published < len(domains):
+                            raise RuntimeError('{} of {} coalesced domains '
+                                               'not published'.
+                                               format(len(domains) - published,
+                                                      len(domains)))
+                        continue
 
-                # ... and check for laggards.
-                if domain_batch:
-                    log.info('Processing laggards before close')
-                    if slurp:
-                        self.slurp_domains(producer, domain_batch, dry=dry)
-                    else:
-                        log.info('Domains pending: %s', domain_batch)
+                    for _, results in fetcher.map(domain_batches):
+                        if results is not None and not dry:
+                            producer.send('alexa-results', results.rstrip())
 
         queue.put(total_messages_read)
 
-    def slurp_domains(self, producer, domains, dry=False):
+    def slurp_domains(self, producer, domains, dry=False, done=None):
         """Get domain information from Alexa.
 
         Args:
@@ -176,11 +224,162 @@ class UrlInfo(domain_intel.Awis):
 
             *dry*: only report, don't run
 
+            *done*: optional callback that is called with ``True`` once
+            the results have been delivered to Kafka (or, if *dry*, once
+            the results are received).  ``False`` if there are no
+            results to deliver or the delivery failed
+
         """
         results = self.api.url_info(domains)
 
-        if not dry:
-            producer.send('alexa-results', results.rstrip())
+        future = None
+        if results is not None and not dry:
+            future = producer.send('alexa-results', results.rstrip())
+
+        if done is None:
+            return
+        if future is None:
+            done(dry and results is not None)
+        else:
+            future.add_callback(lambda _: done(True))
+            future.add_errback(lambda _: done(False))
+
+    def fused(self,
+              max_read_count=None,
+              topic='gtr-domains',
+              group_id='default',
+              archive=None,
+              dry=False,
+              bulk=False):
+        """Fused slurp, flatten and persist of the domains read from
+        *topic*.  Unlike the :meth:`read_domains`, :meth:`flatten_domains`
+        and :meth:`persist` stages, the Alexa responses are passed
+        in-memory to the store without the `alexa-results` and
+        `alexa-flattened` topics.
+
+        If *archive* names a Kafka topic then the raw Alexa responses are
+        also published there for replay (as per `alexa-results`).
+
+        *max_read_count* can limit the number of domains read from
+        *topic*.  The *dry* flag will simulate execution.  The *bulk* flag
+        buffers the inserts through :meth:`domain_intel.Store.bulk_writer`.
+
+        Returns:
+            tuple structure representing counts for the total number of
+            domains read and the number of flattened domains persisted
+
+        """
+        target = self.fused_worker
+        args = (max_read_count, topic, group_id)
+        kwargs = {'archive': archive, 'dry': dry, 'bulk': bulk}
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='urlinfo-fused')
+
+        total_read_count = 0
+        total_put_count = 0
+        for counter in pool.run():
+            total_read_count += counter[0]
+            total_put_count += counter[1]
+
+        log.info('UrlInfo fused read|put count %d|%d',
+                 total_read_count, total_put_count)
+
+        return (total_read_count, total_put_count)
+
+    def fused_worker(self,
+                     queue,
+                     max_read_count,
+                     topic,
+                     group_id,
+                     archive=None,
+                     dry=False,
+                     bulk=False):
+        """Fused slurp, flatten and persist worker.
+
+        The worker slurps the 5-domain batches from Alexa through a
+        :class:`domain_intel.fetcher.Fetcher` and hands each response to
+        a persist thread over a bounded in-memory queue
+        (sized by the ``fused_queue_size`` config value) so that Alexa
+        requests overlap with the store writes.  Offsets are only
+        committed once the persist thread has written (and flushed) all
+        responses handed to it.
+
+        The parameter list is as per :meth:`fused`.
+
+        Returns:
+            updated *queue* result channel
+            with number of records processed
+
+        """
+        log.debug('UrlInfo fused worker set to read %s messages',
+                  max_read_count or 'all')
+
+        responses = Queue.Queue(maxsize=CONFIG.get('fused_queue_size', 10))
+        counts = collections.Counter()
+        errors = []
+
+        def persist():
+            with self.store.bulk_writer(enabled=bulk) as writer:
+                while True:
+                    results = responses.get()
+                    try:
+                        if results is None:
+                            break
+                        if errors:
+                            continue
+
+                        for domain in UrlInfo.flatten_batched_xml(results):
+                            self.write_to_store(domain.encode('utf-8'), dry)
+                            counts['put'] += 1
+
+                        if writer is not None and responses.empty():
+                            writer.flush()
+                    except Exception as err:
+                        log.error('UrlInfo fused persist failed: %s', err)
+                        errors.append(err)
+                    finally:
+                        responses.task_done()
+
+        def acknowledge():
+            responses.join()
+            if errors:
+                raise errors[0]
+
+        persister = threading.Thread(target=persist)
+        persister.start()
+        fetcher = domain_intel.fetcher.Fetcher(self.api.url_info)
+        try:
+            with fetcher, self.producer() as producer:
+                with self.consumer(topic, group_id) as consumer:
+                    batches = self.batches(consumer,
+                                           max_read_count,
+                                           flush=[acknowledge, producer.flush])
+                    for batch in batches:
+                        counts['read'] += len(batch)
+
+                        domains = [x.value.rstrip() for x in batch]
+                        domain_batches = [domains[i:i + 5]
+                                          for i in range(0, len(domains), 5)]
+                        for _, results in fetcher.map(domain_batches):
+                            if results is None:
+                                continue
+
+                            if archive is not None and not dry:
+                                producer.send(archive, results.rstrip())
+                            responses.put(results)
+
+                            if errors:
+                                raise errors[0]
+        finally:
+            responses.put(None)
+            persister.join()
+
+        log.info('UrlInfo fused worker read|put count %d|%d',
+                 counts['read'], counts['put'])
+
+        queue.put((counts['read'], counts['put']))
 
     def flatten_domains(self,
                         max_read_count=None,
@@ -198,16 +397,17 @@ class UrlInfo(domain_intel.Awis):
             the messages read from the topic
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.flatten_worker
-        args = (count_q, max_read_count, topic, group_id)
+        args = (max_read_count, topic, group_id)
         kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='urlinfo-flatten')
 
         total_count = 0
-        while not count_q.empty():
-            total_count += count_q.get()
+        for count in pool.run():
+            total_count += count
 
         log.debug('Flatten workers total records read %d', total_count)
 
@@ -223,12 +423,12 @@ class UrlInfo(domain_intel.Awis):
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The parameter list is as per :meth:`flatten_domains`.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
@@ -239,24 +439,30 @@ class UrlInfo(domain_intel.Awis):
         with self.producer() as producer:
             with self.consumer(topic, group_id=group_id) as consumer:
                 records_read = 0
-                for message in consumer:
-                    records_read += 1
-
-                    for domain in UrlInfo.flatten_batched_xml(message.value):
-                        if not dry:
-                            producer.send('alexa-flattened',
-                                          domain.encode('utf-8'))
-
-                    if (max_read_count is not None and
-                            (records_read >= max_read_count)):
-                        break
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    records_read += len(batch)
+
+                    for message in batch:
+                        domains = UrlInfo.flatten_batched_xml(message.value,
+                                                              keyed=True)
+                        for url, domain in domains:
+                            if not dry:
+                                key = domain_intel.utils.domain_key(url)
+                                value = domain_intel.envelope.encode(
+                                    'urlinfo', json.loads(domain), key=key)
+                                producer.send('alexa-flattened',
+                                              value,
+                                              key=key)
 
         log.debug('UrlInfo flatten worker records read %d', records_read)
 
         queue.put(records_read)
 
     @staticmethod
-    def flatten_batched_xml(xml):
+    def flatten_batched_xml(xml, keyed=False):
         """Batched Alexa responses need to be parsed and extracted into
         individual domain components ready for next data flow path.
 
@@ -266,8 +472,11 @@ class UrlInfo(domain_intel.Awis):
         Args:
             *xml*: the source XML to process
 
+            *keyed*: pair each domain with its Alexa DataUrl
+
         Returns:
-            list of domain-based XML
+            list of domain-based XML, or list of (<data_url>, <json>)
+            tuples if *keyed* is set
 
         """
         root = lxml.etree.fromstring(xml)
@@ -285,13 +494,18 @@ class UrlInfo(domain_intel.Awis):
         ns_replace = r'{{{0}}}'.format(domain_intel.common.NS_20050711)
         xml_to_json = [json.dumps(bf_json.data(x)) for x in xml_domains]
 
-        return [x.replace(ns_replace, '') for x in xml_to_json]
+        flattened = [x.replace(ns_replace, '') for x in xml_to_json]
+        if keyed:
+            flattened = list(zip(urls, flattened))
+
+        return flattened
 
     def persist(self,
                 max_read_count=None,
                 topic='alexa-flattened',
                 group_id='default',
-                dry=False):
+                dry=False,
+                bulk=False):
         """Persist flattened (processed) Alexa domain data to ArangoDB
         executor.
 
@@ -303,21 +517,24 @@ class UrlInfo(domain_intel.Awis):
         The *dry* flag will simulate execution.  No records will be
         published.
 
+        The *bulk* flag buffers the inserts through
+        :meth:`domain_intel.Store.bulk_writer`.
+
         Returns:
             total count of records written to the DB across all workers
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.persist_worker
-        args = (count_q, max_read_count, topic, group_id)
-        kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        args = (max_read_count, topic, group_id)
+        kwargs = {'dry': dry, 'bulk': bulk}
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='urlinfo-persist')
 
         total_read_count = 0
         total_put_count = 0
-        while not count_q.empty():
-            counter = count_q.get()
+        for counter in pool.run():
             total_read_count += counter[0]
             total_put_count += counter[1]
 
@@ -332,18 +549,24 @@ class UrlInfo(domain_intel.Awis):
                        max_read_count,
                        topic,
                        group_id,
-                       dry=False):
+                       dry=False,
+                       bulk=False):
         """Persist flattened (processed) Alexa domain data to ArangoDB
         worker.
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The parameter list is as per :meth:`persist`.
 
+        If *bulk* is set then the batches are consumed as per
+        :meth:`domain_intel.Pipeline.persist_batches` and the put count
+        is taken from the bulk import results of the ``url-info``
+        collection.
+
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
@@ -354,19 +577,21 @@ class UrlInfo(domain_intel.Awis):
         total_messages_read = 0
         put_count = 0
 
-        with self.consumer(topic, group_id) as consumer:
-            for message in consumer:
-                total_messages_read += 1
+        with self.store.bulk_writer(enabled=bulk) as writer:
+            with self.consumer(topic, group_id) as consumer:
+                batches = self.persist_batches(consumer,
+                                               writer,
+                                               max_read_count)
+                for batch in batches:
+                    total_messages_read += len(batch)
 
-                self.write_to_store(message.value, dry)
-                # TODO: quantify successful insert.
-                put_count += 1
+                    for message in batch:
+                        url_info = domain_intel.envelope.loads(message.value)
+                        if self.write_to_store(url_info, dry):
+                            put_count += 1
 
-                if (max_read_count is not None and
-                        total_messages_read >= max_read_count):
-                    log.info('Maximum read threshold %d breached - exiting',
-                             max_read_count)
-                    break
+        if writer is not None:
+            put_count = writer.stored('url-info')
 
         log.info('UrlInfo persist worker messages read %d',
                  total_messages_read)
@@ -378,21 +603,26 @@ class UrlInfo(domain_intel.Awis):
         transpose a *message* into the persistent store managed by
         attr:`database`.
 
-        *message* is a :class:`kafka.consumer.fetcher.ConsumerRecord`
-        instance that contains the actual message value consumed from the
-        target Kafka topic.
+        *message* is the flattened Alexa record as decoded by
+        :func:`domain_intel.envelope.loads` or as a JSON bytes string.
 
         The *dry* flag will simulate execution.  No records will be created.
 
+        Returns:
+            Boolean ``True`` if the URL info document was persisted.
+            ``False`` otherwise
+
         """
         url_info = domain_intel.awisapi.parser.UrlInfo(message)
 
-        self.persist_url_info(url_info, dry)
+        status = self.persist_url_info(url_info, dry)
         self.persist_domain(url_info, dry)
         self.persist_country_rank(url_info, dry)
         self.persist_related_links(url_info, dry)
         self.persist_contributing_subdomains(url_info, dry)
 
+        return status
+
     def persist_url_info(self, url_info, dry=False):
         """Persist the Alexa URL info raw JSON.
 
@@ -400,12 +630,15 @@ class UrlInfo(domain_intel.Awis):
         :class:`domain_intel.awisapi.parser.UrlInfo` instance that is
         used to build the collection documents.
 
+        Returns:
+            Boolean ``True`` on success.  ``False`` otherwise
+
         """
         kwargs = {
             '_key': url_info.domain,
             'data': url_info.raw,
         }
-        self.store.collection_insert('url-info', kwargs, dry)
+        return self.store.collection_insert('url-info', kwargs, dry)
 
     def persist_domain(self, url_info, dry=False):
         """Persist the Alexa domain rank per country.
@@ -517,6 +750,7 @@ class UrlInfo(domain_intel.Awis):
                               max_read_count=None,
                               topic='domain-labels',
                               group_id='default',
+                              batch_size=None,
                               dry=False):
         """Read domain labels from the Kafka topic *topic*
         and uses that that the starting vertex to traverse the graph.
@@ -529,6 +763,14 @@ class UrlInfo(domain_intel.Awis):
         we can force a re-read of the topic's messages by overriding
         *group_id* with a unique value.
 
+        Labels are traversed in batches of *batch_size* via
+        :meth:`domain_intel.Store.traverse_many`.  One traversal is
+        published per domain and is limited to the fields in
+        :data:`domain_intel.reporter.PROJECTION`.
+
+        A batch whose traversal fails raises so that its offsets are not
+        committed and the labels are read again on the next run.
+
         Returns:
             total count of records read
 
@@ -536,24 +778,35 @@ class UrlInfo(domain_intel.Awis):
         log.debug('Traverse worker set to read %s messages',
                   max_read_count or 'all')
 
+        if batch_size is None:
+            batch_size = CONFIG.get('arango_traverse_batch_size', 100)
+
+        def publish(producer, labels):
+            traversals = self.store.traverse_many(labels,
+                                                  batch_size,
+                                                  projection=PROJECTION,
+                                                  as_json=False,
+                                                  halt_on_error=True)
+            for label, result in traversals:
+                if not dry:
+                    key = domain_intel.utils.domain_key(label)
+                    value = domain_intel.envelope.encode('traversal',
+                                                         result,
+                                                         key=key)
+                    producer.send('domain-traversals', value, key=key)
+
         with self.producer() as producer:
             with self.consumer(topic, group_id) as consumer:
                 total_messages_read = 0
 
-                for message in consumer:
-                    label = message.value.decode('utf-8')
-                    result = self.store.traverse_graph(label)
-                    if result is None:
-                        continue
-
-                    total_messages_read += 1
-                    if not dry:
-                        producer.send('domain-traversals',
-                                      result.encode('utf-8'))
-
-                    if (max_read_count is not None and
-                            (total_messages_read >= max_read_count)):
-                        break
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       max_records=batch_size,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    labels = [x.value.decode('utf-8') for x in batch]
+                    publish(producer, labels)
+                    total_messages_read += len(batch)
 
         log.debug('Domains traverser worker records read %d',
                   total_messages_read)
@@ -578,21 +831,21 @@ class UrlInfo(domain_intel.Awis):
 
         Returns:
             tuple structure representing counts for the total number of
-            records consumed and the number of domains successfully
+            records consumed and the number of CSV lines successfully
             published to the Kafka topic
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.wide_column_dump_worker
-        args = (count_q, max_read_count, topic, group_id)
+        args = (max_read_count, topic, group_id)
         kwargs = {'dry': dry}
-        domain_intel.utils.threader(self.threads, target, *args, **kwargs)
+        pool = domain_intel.WorkerPool(target,
+                                       args,
+                                       kwargs,
+                                       stage='wide-column-dump')
 
         total_read_count = 0
         total_put_count = 0
-        while not count_q.empty():
-            counter = count_q.get()
+        for counter in pool.run():
             total_read_count += counter[0]
             total_put_count += counter[1]
 
@@ -612,12 +865,12 @@ class UrlInfo(domain_intel.Awis):
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The parameter list is as per :meth:`wide_column_dump`.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
 
         """
@@ -628,22 +881,73 @@ class UrlInfo(domain_intel.Awis):
             with self.consumer(topic, group_id=group_id) as consumer:
                 total_messages_read = 0
                 total_messages_put = 0
-                for message in consumer:
-                    traversal = json.loads(message.value.decode('utf-8'))
-                    reporter = domain_intel.Reporter(data=traversal)
-                    total_messages_read += 1
-                    for line in reporter.dump_wide_column_csv():
-                        if not dry:
-                            producer.send('wide-column-csv',
-                                          line.encode('utf-8'))
-                        total_messages_put += 1
-
-                    if (max_read_count is not None and
-                            (total_messages_read >= max_read_count)):
-                        break
+                batches = self.batches(consumer,
+                                       max_read_count,
+                                       flush=[producer.flush])
+                for batch in batches:
+                    total_messages_read += len(batch)
+
+                    for message in batch:
+                        traversal = domain_intel.envelope.loads(message.value)
+                        reporter = domain_intel.Reporter(data=traversal)
+                        for line in reporter.dump_wide_column_csv():
+                            if not dry:
+                                producer.send('wide-column-csv',
+                                              line.encode('utf-8'),
+                                              key=message.key)
+                            total_messages_put += 1
 
         queue.put((total_messages_read, total_messages_put))
 
+    def wide_column_export(self,
+                           max_read_count=None,
+                           domains=None,
+                           dry=False):
+        """Wide-column CSV dump sourced directly from the persistent
+        store via :meth:`domain_intel.Store.wide_column_rows`.  Unlike
+        :meth:`wide_column_dump`, there is no dependency on the
+        `domain-traversals` topic.
+
+        *domains* is an optional list of domain names to report on.
+        Otherwise, all domains in the store are dumped.
+
+        *max_read_count* can limit the number of domains reported on.
+
+        The *dry* flag will simulate execution.  No records will be
+        published.
+
+        Returns:
+            tuple structure representing counts for the total number of
+            domains read, the number of CSV lines published to the Kafka
+            topic and the number of failed publishes
+
+        """
+        log.debug('Wide-column CSV store export set to read %s domains',
+                  max_read_count or 'all')
+
+        total_read_count = 0
+        total_put_count = 0
+        with self.producer() as producer:
+            for label, lines in self.store.wide_column_rows(domains=domains):
+                total_read_count += 1
+                key = domain_intel.utils.domain_key(label)
+                for line in lines:
+                    if not dry:
+                        producer.send('wide-column-csv',
+                                      line.encode('utf-8'),
+                                      key=key)
+                    total_put_count += 1
+
+                if (max_read_count is not None and
+                        (total_read_count >= max_read_count)):
+                    break
+
+        log.debug('Wide-column CSV store export read|put|failed count '
+                  '%d|%d|%d',
+                  total_read_count, total_put_count, producer.failed)
+
+        return (total_read_count, total_put_count, producer.failed)
+
     def alexa_csv_dump(self,
                        max_read_count=None,
                        topic='alexa-flattened',
@@ -683,22 +987,18 @@ class UrlInfo(domain_intel.Awis):
 
         with self.consumer(topic, group_id) as consumer:
             messages_read = 0
-            for message in consumer:
-                messages_read += 1
-                flattened_alexa = message.value.decode('utf-8')
-                stats = UrlInfo.alexa_flattened_extract(flattened_alexa)
-                rank_writer.writerow(stats[0])
-                if stats[1]:
-                    country_rank_writer.writerows(stats[1])
-
-                if messages_read % 10000 == 0:
-                    log.info('Exported %d domains to CSV', messages_read)
+            flush = [rank_csv.flush, country_rank_csv.flush]
+            for batch in self.batches(consumer, max_read_count, flush=flush):
+                for message in batch:
+                    messages_read += 1
+                    flattened = domain_intel.envelope.loads(message.value)
+                    stats = UrlInfo.alexa_flattened_extract(flattened)
+                    rank_writer.writerow(stats[0])
+                    if stats[1]:
+                        country_rank_writer.writerows(stats[1])
 
-                if (max_read_count is not None and
-                        messages_read >= max_read_count):
-                    log.info('Maximum read threshold %d breached - exiting',
-                             max_read_count)
-                    break
+                    if messages_read % 10000 == 0:
+                        log.info('Exported %d domains to CSV', messages_read)
 
         log.info('Global rank file %s', rank_csv.name)
         log.info('Country rank file %s', country_rank_csv.name)
@@ -717,7 +1017,8 @@ class UrlInfo(domain_intel.Awis):
         * domain rank
         * domain rank by country
 
-        *alexa_json* should be a flattened Alexa record in JSON format.
+        *alexa_json* should be a flattened Alexa record in JSON format or
+        as decoded by :func:`domain_intel.envelope.loads`.
 
         Returns:
             A tuple structure of the form::
@@ -741,7 +1042,9 @@ class UrlInfo(domain_intel.Awis):
 
         """
         epoch = time.time()
-        alexa_data = json.loads(alexa_json)
+        alexa_data = alexa_json
+        if not isinstance(alexa_data, dict):
+            alexa_data = json.loads(alexa_json)
         base = alexa_data['UrlInfoResult']['Alexa']
 
         traffic_data = base.get('TrafficData')
@@ -1,14 +1,26 @@
 """:class:`AwisApi`
 
 """
+import os
 import base64
 import datetime
 import hashlib
 import hmac
+import threading
+import requests
+import requests.adapters
 from logga import log
-from future.moves.urllib.parse import urlencode, urlunparse
-from future.moves.urllib.request import urlopen
-from future.moves.urllib.error import HTTPError
+from future.moves.urllib.parse import (urlencode,
+                                      urlunparse,
+                                      urlparse,
+                                      parse_qsl)
+
+from domain_intel.awisapi.retry import (OVERSIZE,
+                                        CircuitBreaker,
+                                        Outcome,
+                                        RetryPolicy,
+                                        classify,
+                                        retry_after)
 
 HTTP_METHOD = 'GET'
 AWIS_HOST = 'awis.amazonaws.com'
@@ -19,6 +31,12 @@ MAX_BATCH_REQUESTS = 5
 MAX_SITES_LINKING_IN_COUNT = 20
 MAX_CATEGORY_LISTINGS_COUNT = 20
 DATE_FMT = '%Y-%m-%dT%H:%M:%S.000Z'
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+MAX_RESPONSE_BYTES = 10485760
+POOL_SIZE = 10
+READ_CHUNK_BYTES = 65536
+VOLATILE_PARAMS = ('Timestamp', 'Signature')
 RESPONSE_GROUPS = {
     'url_info': [
         'RelatedLinks',
@@ -48,11 +66,156 @@ class AwisApi(object):
         ...
         <aws:StatusCode>Success</aws:StatusCode>...'
 
+    AWIS calls are made over a keep-alive :class:`requests.Session`
+    that is held per instance so that connections are reused across
+    requests.  The session is rebuilt in a forked worker process rather
+    than sharing the parent's sockets.
+
+    .. attribute:: connect_timeout
+        seconds to wait for a connection to AWIS
+
+    .. attribute:: read_timeout
+        seconds to wait between bytes of the AWIS response
+
+    .. attribute:: max_response_bytes
+        size limit of an AWIS response body
+
+    .. attribute:: pool_size
+        number of keep-alive connections to hold
+
+    .. attribute:: limiter
+        optional rate limiter (for example,
+        :class:`domain_intel.ratelimit.TokenBucket`) whose ``acquire``
+        is called before each AWIS request
+
+    .. attribute:: cache
+        optional response cache (for example,
+        :class:`domain_intel.responsecache.ResponseCache`) that is
+        consulted before each AWIS request
+
+    .. attribute:: retry
+        :class:`domain_intel.awisapi.retry.RetryPolicy` applied to failed
+        AWIS requests.  Defaults to a policy with a process-local
+        :class:`domain_intel.awisapi.retry.CircuitBreaker`
+
     """
-    def __init__(self, access_id, secret_access_key):
+    def __init__(self,
+                 access_id,
+                 secret_access_key,
+                 connect_timeout=None,
+                 read_timeout=None,
+                 max_response_bytes=None,
+                 pool_size=None,
+                 limiter=None,
+                 cache=None,
+                 retry=None):
         self.__access_id = access_id
         self.__secret_access_key = secret_access_key
 
+        if connect_timeout is None:
+            connect_timeout = CONNECT_TIMEOUT
+        self.__connect_timeout = float(connect_timeout)
+
+        if read_timeout is None:
+            read_timeout = READ_TIMEOUT
+        self.__read_timeout = float(read_timeout)
+
+        if max_response_bytes is None:
+            max_response_bytes = MAX_RESPONSE_BYTES
+        self.__max_response_bytes = int(max_response_bytes)
+
+        if pool_size is None:
+            pool_size = POOL_SIZE
+        self.__pool_size = int(pool_size)
+
+        self.__limiter = limiter
+        self.__cache = cache
+
+        if retry is None:
+            retry = RetryPolicy(breaker=CircuitBreaker())
+        self.__retry = retry
+        self.__session = None
+        self.__session_pid = None
+        self.__session_lock = threading.Lock()
+
+    @property
+    def connect_timeout(self):
+        """:attr:`connect_timeout`
+        """
+        return self.__connect_timeout
+
+    @property
+    def read_timeout(self):
+        """:attr:`read_timeout`
+        """
+        return self.__read_timeout
+
+    @property
+    def max_response_bytes(self):
+        """:attr:`max_response_bytes`
+        """
+        return self.__max_response_bytes
+
+    @property
+    def pool_size(self):
+        """:attr:`pool_size`
+        """
+        return self.__pool_size
+
+    @property
+    def limiter(self):
+        """:attr:`limiter`
+        """
+        return self.__limiter
+
+    @property
+    def cache(self):
+        """:attr:`cache`
+        """
+        return self.__cache
+
+    @cache.setter
+    def cache(self, value):
+        self.__cache = value
+
+    @property
+    def retry(self):
+        """:attr:`retry`
+        """
+        return self.__retry
+
+    @property
+    def session(self):
+        """Keep-alive :class:`requests.Session` of the current process.
+        Created on first use.  Shared by the threads of the process.
+        """
+        session = self.__session
+        if session is None or self.__session_pid != os.getpid():
+            with self.__session_lock:
+                session = self.__session
+                if session is None or self.__session_pid != os.getpid():
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_size)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self.__session = session
+                    self.__session_pid = os.getpid()
+
+        return session
+
+    def close(self):
+        """Release the pooled AWIS connections of the current process.
+
+        """
+        with self.__session_lock:
+            if (self.__session is not None and
+                    self.__session_pid == os.getpid()):
+                self.__session.close()
+            self.__session = None
+            self.__session_pid = None
+
     def calculate_signature(self, params):
         """Calculate the AWS Signature v2 as per
         `these notes <https://goo.gl/DR0sqs>`_.
@@ -114,41 +277,125 @@ class AwisApi(object):
 
         return url
 
-    @staticmethod
-    def request(url, tries=3):
-        """Wrapper around :func:`urlopen` to AWIS call.
+    def request(self, url, tries=None, use_cache=True):
+        """AWIS call over the pooled :attr:`session`.
 
-        On failure, will attempt another 2 tries for success.
+        Failed attempts are retried with backoff as per the :attr:`retry`
+        policy.  A response larger than :attr:`max_response_bytes` is a
+        failure that is not retried.
+
+        If a :attr:`cache` is set then a cached response to the same
+        query (see :meth:`cache_key`) is returned without calling AWIS.
+        Successful responses are added to the :attr:`cache`.
 
         **Args:**
             *url*: the AWIS URL to call
 
-            *tries*: number of failed tries allowed before flagging this
-            attempt as a failure
+            *tries*: optional limit on the number of attempts on top of
+            the :attr:`retry` budgets
+
+            *use_cache*: bypass the :attr:`cache` if ``False`` (for
+            actions that cache their responses at a finer grain)
 
         **Returns:**
             the HTTP response value
 
         """
-        failed_requests = 0
-        response_value = None
-        while failed_requests < tries:
-            try:
-                log.debug('Request %d of %d: "%s"',
-                          (failed_requests + 1), tries, url)
-                response = urlopen(url)
-                if response.code == 200:
-                    response_value = response.read()
-                    break
-            except HTTPError as err:
-                log.error('Request failed "%s"', err)
-
-            failed_requests += 1
-            if failed_requests >= tries:
-                log.error('All requests failed')
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            action, cache_key = self.cache_key(url)
+            response_value = cache.get(action, cache_key)
+            if response_value is not None:
+                log.debug('Cached response: "%s"', url)
+                return response_value
+
+        response_value = self.retry.run(lambda: self.__attempt(url),
+                                        max_tries=tries)
+
+        if cache is not None and response_value is not None:
+            cache.put(action, cache_key, response_value)
 
         return response_value
 
+    def __attempt(self, url):
+        """Single AWIS call to *url*.  Failures are classified as per
+        :func:`domain_intel.awisapi.retry.classify`.
+
+        Returns:
+            :class:`domain_intel.awisapi.retry.Outcome`
+
+        """
+        log.debug('Request: "%s"', url)
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+        timeout = (self.connect_timeout, self.read_timeout)
+        try:
+            response = self.session.get(url, timeout=timeout, stream=True)
+            try:
+                if response.status_code == 200:
+                    value = self.__read(response)
+                    if value is None:
+                        return Outcome(None, OVERSIZE, None)
+                    return Outcome(value, None, None)
+
+                body = next(response.iter_content(READ_CHUNK_BYTES), b'')
+                error = classify(response.status_code, body)
+                log.error('Request failed "HTTP %d: %s" (%s error)',
+                          response.status_code, response.reason, error)
+                delay = retry_after(response.headers.get('Retry-After'))
+
+                return Outcome(None, error, delay)
+            finally:
+                response.close()
+        except requests.RequestException as err:
+            log.error('Request failed "%s"', err)
+            return Outcome(None, classify(err=err), None)
+
+    def __read(self, response):
+        """Read the body of the streamed *response* up to
+        :attr:`max_response_bytes`.
+
+        Returns:
+            the response body as bytes or ``None`` if the body exceeds
+            :attr:`max_response_bytes`
+
+        """
+        length = response.headers.get('Content-Length')
+        if length is not None and int(length) > self.max_response_bytes:
+            log.error('Response of %s bytes exceeds limit of %d',
+                      length, self.max_response_bytes)
+            return None
+
+        body = []
+        received = 0
+        for chunk in response.iter_content(READ_CHUNK_BYTES):
+            received += len(chunk)
+            if received > self.max_response_bytes:
+                log.error('Response exceeds limit of %d bytes',
+                          self.max_response_bytes)
+                return None
+            body.append(chunk)
+
+        return b''.join(body)
+
+    @staticmethod
+    def cache_key(url):
+        """Response cache key of the AWIS *url*.  The key is the
+        :meth:`canonicalized_query_string` of the query parameters less
+        the :data:`VOLATILE_PARAMS` that change with each request.
+
+        Returns:
+            tuple of the form (<action>, <key>)
+
+        """
+        params = dict(parse_qsl(urlparse(url).query))
+        for name in VOLATILE_PARAMS:
+            params.pop(name, None)
+
+        return (params.get('Action'),
+                AwisApi.canonicalized_query_string(params))
+
     @staticmethod
     def canonicalized_query_string(params):
         """See `this guide <https://goo.gl/u2AzO7>`_ this guide for
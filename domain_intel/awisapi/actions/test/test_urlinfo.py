@@ -1,10 +1,12 @@
 """:class:`domain_intel.awisapi.actions.UrlInfo` unit test cases.
 
 """
+import os
 from datetime import datetime
 import mock
 from future.moves.urllib.error import HTTPError
 
+import domain_intel.responsecache
 import domain_intel.awisapi.actions as awis_api
 
 
@@ -173,3 +175,41 @@ def test_build_url(mock_dt):
                 'Url=google.com')
     msg = 'AWIS UrlInfo HTTP request URL build error'
     assert received == expected, msg
+
+
+@mock.patch('domain_intel.awisapi.actions.UrlInfo.request')
+def test_url_info_cached_per_domain(mock_request, tmpdir):
+    """Batched UrlInfo responses are cached per domain.
+    """
+    # Given a batched AWIS response for 2 domains
+    sample = os.path.join('domain_intel',
+                          'test',
+                          'files',
+                          'samples',
+                          'multi-domain-result.xml')
+    with open(sample, 'rb') as _fh:
+        mock_request.return_value = _fh.read()
+
+    # and an API with a response cache
+    cache = domain_intel.responsecache.ResponseCache(
+        path=str(tmpdir.join('cache.db')))
+    api = awis_api.UrlInfo('access', 'secret', cache=cache)
+
+    # when I request the domains in one batch
+    api.url_info(['google.com.au', 'ip-echelon.com'])
+
+    # and then request them again in a different order
+    received = api.url_info(['IP-echelon.com', 'google.com.au'])
+
+    # then only the first batch should call AWIS
+    msg = 'Per-domain cached UrlInfo should not call AWIS'
+    assert mock_request.call_count == 1, msg
+    msg = 'Per-domain cache hit count error'
+    assert cache.counts['UrlInfo']['hits'] == 2, msg
+
+    # and the response should follow the order of the domains
+    msg = 'Per-domain cached UrlInfo response order error'
+    responses = awis_api.UrlInfo.split_responses(received)
+    expected = [b'ip-echelon.com', b'google.com.au']
+    assert [expected[i] in x for i, x in enumerate(responses)] == [True,
+                                                                   True], msg
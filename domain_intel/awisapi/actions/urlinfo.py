@@ -1,5 +1,6 @@
 """AWIS API :class:`domain_intel.awisapi.actions.UrlInfo`
 """
+import lxml.etree
 from future.moves.urllib.parse import quote
 from logga import log
 
@@ -20,6 +21,9 @@ RESPONSE_GROUPS = {
         'SiteData',
     ]
 }
+NS_20051005 = 'http://alexa.amazonaws.com/doc/2005-10-05/'
+NS_20050711 = 'http://awis.amazonaws.com/doc/2005-07-11'
+NS = {'a': NS_20051005, 'b': NS_20050711}
 
 
 class UrlInfo(domain_intel.awisapi.AwisApi):
@@ -35,9 +39,13 @@ class UrlInfo(domain_intel.awisapi.AwisApi):
         ...
         <aws:StatusCode>Success</aws:StatusCode>...'
 
+    If a response :attr:`cache` is set then batched requests are cached
+    per domain so that a domain is served from the cache regardless of
+    the batch that it arrives in.
+
     """
-    def __init__(self, access_id, secret_access_key):
-        super(UrlInfo, self).__init__(access_id, secret_access_key)
+    def __init__(self, access_id, secret_access_key, **kwargs):
+        super(UrlInfo, self).__init__(access_id, secret_access_key, **kwargs)
 
         self.__response_groups = RESPONSE_GROUPS
 
@@ -64,6 +72,9 @@ class UrlInfo(domain_intel.awisapi.AwisApi):
         if response_groups is None:
             response_groups = self.__response_groups.get('url_info')
 
+        if self.cache is not None and isinstance(domains, (list, tuple)):
+            return self.__cached_url_info(domains, response_groups)
+
         params = {'Action': 'UrlInfo'}
 
         params.update(UrlInfo.build_domain_query(domains,
@@ -71,6 +82,113 @@ class UrlInfo(domain_intel.awisapi.AwisApi):
 
         return self.request(self.build_url(params))
 
+    def __cached_url_info(self, domains, response_groups):
+        """Batched UrlInfo action that caches the response of each of
+        *domains* separately.  Only the domains that miss the
+        :attr:`cache` are sent to AWIS.  The cached and fresh domain
+        responses are combined into a single batched response in the
+        order of *domains*.
+
+        **Returns:**
+            the Alexa API response string or ``None`` if the AWIS call
+            for the domains that missed the cache failed
+
+        """
+        keys = [UrlInfo.domain_cache_key(x, response_groups)
+                for x in domains]
+        cached = [self.cache.get('UrlInfo', x) for x in keys]
+        missing = [(d, k) for d, k, c in zip(domains, keys, cached)
+                   if c is None]
+
+        fresh = []
+        mapped = False
+        if missing:
+            params = {'Action': 'UrlInfo'}
+            params.update(UrlInfo.build_domain_query([x[0] for x in missing],
+                                                     response_groups))
+            response_value = self.request(self.build_url(params),
+                                          use_cache=False)
+            if response_value is None:
+                return None
+
+            fresh = UrlInfo.split_responses(response_value)
+            mapped = len(fresh) == len(missing)
+            if mapped:
+                for (_, key), response in zip(missing, fresh):
+                    if UrlInfo.successful(response):
+                        self.cache.put('UrlInfo', key, response)
+            else:
+                log.warning('UrlInfo returned %d responses for %d domains: '
+                            'not cached', len(fresh), len(missing))
+
+        responses = [x for x in cached if x is not None] + fresh
+        if mapped:
+            fresh_responses = iter(fresh)
+            responses = [x if x is not None else next(fresh_responses)
+                         for x in cached]
+
+        return UrlInfo.join_responses(responses)
+
+    @staticmethod
+    def domain_cache_key(domain, response_groups):
+        """Response cache key of the UrlInfo action for a single
+        *domain*.  The domain is normalised so that the key does not
+        depend on case or surrounding white space.
+
+        """
+        if isinstance(domain, bytes):
+            domain = domain.decode('utf-8')
+
+        params = {
+            'Action': 'UrlInfo',
+            'ResponseGroup': ','.join(sorted(response_groups)),
+            'Url': domain.strip().lower(),
+        }
+
+        return domain_intel.awisapi.AwisApi.canonicalized_query_string(params)
+
+    @staticmethod
+    def split_responses(xml):
+        """Split a batched UrlInfo response into the ``Response``
+        elements of each domain in request order.
+
+        Returns:
+            list of serialised ``Response`` elements
+
+        """
+        root = lxml.etree.fromstring(xml)
+        responses = root.xpath('//a:UrlInfoResponse/b:Response',
+                               namespaces=NS)
+
+        return [lxml.etree.tostring(x, encoding='UTF-8') for x in responses]
+
+    @staticmethod
+    def successful(response):
+        """Check if the serialised domain *response* holds a successful
+        result.
+
+        """
+        root = lxml.etree.fromstring(response)
+        status = root.xpath('./a:ResponseStatus/a:StatusCode/text()',
+                            namespaces=NS)
+
+        return status == ['Success']
+
+    @staticmethod
+    def join_responses(responses):
+        """Combine serialised domain ``Response`` elements into a single
+        batched UrlInfo response.
+
+        """
+        root = lxml.etree.Element('{{{}}}UrlInfoResponse'.format(NS_20051005),
+                                  nsmap={'aws': NS_20051005})
+        for response in responses:
+            root.append(lxml.etree.fromstring(response))
+
+        return lxml.etree.tostring(root,
+                                   xml_declaration=True,
+                                   encoding='UTF-8')
+
     @staticmethod
     def build_domain_query(domains, response_groups):
         """Build the domain query list based on *domains*.
@@ -33,10 +33,13 @@ class UrlInfo(object):
 
     """
     def __init__(self, record):
-        """Parse and de-construct a *record* which is a JSON bytes string.
+        """Parse and de-construct a *record* which is a JSON bytes string
+        or the equivalent decoded dictionary.
 
         """
-        self.__raw = json.loads(record.decode('utf-8'))
+        self.__raw = record
+        if not isinstance(record, dict):
+            self.__raw = json.loads(record.decode('utf-8'))
         self.__data = self.__raw['UrlInfoResult']['Alexa']
         self.__content_data = self.__data.get('ContentData')
         self.__content_site = self.__content_data.get('SiteData')
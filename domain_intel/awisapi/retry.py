@@ -0,0 +1,493 @@
+"""AWIS API :class:`RetryPolicy` and :class:`CircuitBreaker`
+
+"""
+import os
+import re
+import mmap
+import time
+import fcntl
+import random
+import struct
+import threading
+import collections
+import email.utils
+from logga import log
+
+# Error classes.  Client errors (and responses too large to read) are
+# never retried.
+THROTTLE = 'throttle'
+SERVER = 'server'
+NETWORK = 'network'
+CLIENT = 'client'
+OVERSIZE = 'oversize'
+
+BUDGETS = {
+    THROTTLE: 8,
+    SERVER: 3,
+    NETWORK: 3,
+    CLIENT: 0,
+    OVERSIZE: 0,
+}
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+REPORT_INTERVAL = 1000
+
+# AWIS/AWS error codes that flag a throttled request.
+THROTTLE_CODES = (
+    'Throttling',
+    'ThrottlingException',
+    'RequestThrottled',
+    'RequestLimitExceeded',
+    'TooManyRequests',
+)
+ERROR_CODE = re.compile(br'<(?:\w+:)?Code>\s*([\w.]+)\s*</(?:\w+:)?Code>')
+
+BREAKER_WINDOW = 50
+BREAKER_THRESHOLD = 0.5
+BREAKER_MIN_REQUESTS = 10
+BREAKER_COOLDOWN = 30.0
+
+Outcome = collections.namedtuple('Outcome', ['value', 'error', 'retry_after'])
+
+
+def error_code(body):
+    """AWIS error code of the error response *body*.
+
+    Returns:
+        the error code string or ``None`` if *body* holds no error code
+
+    """
+    match = ERROR_CODE.search(body or b'')
+    if match is None:
+        return None
+
+    return match.group(1).decode('utf-8')
+
+
+def classify(status=None, body=None, err=None):
+    """Error class of an AWIS call that returned the HTTP *status* and
+    response *body* or failed with the :mod:`requests` exception *err*.
+
+    Returns:
+        one of :data:`THROTTLE`, :data:`SERVER`, :data:`NETWORK` or
+        :data:`CLIENT`.  ``None`` for a successful call
+
+    """
+    if err is not None:
+        return NETWORK
+
+    if status == 200:
+        return None
+
+    if status == 429 or error_code(body) in THROTTLE_CODES:
+        return THROTTLE
+
+    if status is None or status >= 500:
+        return SERVER
+
+    return CLIENT
+
+
+def retry_after(value):
+    """Seconds to wait as per the HTTP ``Retry-After`` header *value*,
+    given as either delta seconds or an HTTP date.
+
+    Returns:
+        seconds to wait or ``None`` if *value* is not set or invalid
+
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+
+    return max(email.utils.mktime_tz(parsed) - time.time(), 0.0)
+
+
+class CircuitBreaker(object):
+    """Trips once the error rate of the recent AWIS calls spikes so that
+    callers pause for :attr:`cooldown` seconds rather than adding to a
+    retry storm.
+
+    If :attr:`path` is set then the trip is shared through a small
+    memory-mapped file so that every worker on the host pauses, not
+    just the worker that tripped the breaker.
+
+    .. attribute:: window
+        number of recent calls that the error rate is taken over
+
+    .. attribute:: threshold
+        error rate (0.0 to 1.0) that trips the breaker
+
+    .. attribute:: min_requests
+        number of calls in the window before the breaker can trip
+
+    .. attribute:: cooldown
+        seconds that a tripped breaker pauses callers
+
+    .. attribute:: path
+        file that shares the breaker state across processes (or ``None``
+        to hold the state in the current process only)
+
+    """
+    def __init__(self,
+                 window=None,
+                 threshold=None,
+                 min_requests=None,
+                 cooldown=None,
+                 path=None):
+        if window is None:
+            window = BREAKER_WINDOW
+        self.__window = int(window)
+
+        if threshold is None:
+            threshold = BREAKER_THRESHOLD
+        self.__threshold = float(threshold)
+
+        if min_requests is None:
+            min_requests = BREAKER_MIN_REQUESTS
+        self.__min_requests = int(min_requests)
+
+        if cooldown is None:
+            cooldown = BREAKER_COOLDOWN
+        self.__cooldown = float(cooldown)
+
+        self.__path = path
+
+        self.__lock = threading.Lock()
+        self.__outcomes = collections.deque(maxlen=self.__window)
+        self.__open_until = 0.0
+        self.__trips = 0
+        self.__fd = None
+        self.__mapped = None
+        self.__pid = None
+
+    @property
+    def window(self):
+        """:attr:`window`
+        """
+        return self.__window
+
+    @property
+    def threshold(self):
+        """:attr:`threshold`
+        """
+        return self.__threshold
+
+    @property
+    def min_requests(self):
+        """:attr:`min_requests`
+        """
+        return self.__min_requests
+
+    @property
+    def cooldown(self):
+        """:attr:`cooldown`
+        """
+        return self.__cooldown
+
+    @property
+    def path(self):
+        """:attr:`path`
+        """
+        return self.__path
+
+    @property
+    def trips(self):
+        """Number of times this breaker has tripped.
+        """
+        return self.__trips
+
+    def __shared(self):
+        """Map the shared breaker state file for the current process.
+
+        """
+        if self.__mapped is None or self.__pid != os.getpid():
+            self.__fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.__fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self.__fd).st_size < 8:
+                    os.ftruncate(self.__fd, 8)
+            finally:
+                fcntl.flock(self.__fd, fcntl.LOCK_UN)
+            self.__mapped = mmap.mmap(self.__fd, 8)
+            self.__pid = os.getpid()
+
+        return self.__mapped
+
+    @property
+    def open_until(self):
+        """Time until which the breaker pauses callers.
+        """
+        with self.__lock:
+            if self.path is None:
+                return self.__open_until
+
+            mapped = self.__shared()
+            fcntl.flock(self.__fd, fcntl.LOCK_SH)
+            try:
+                return struct.unpack_from('>d', mapped)[0]
+            finally:
+                fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+    def __trip(self, until):
+        if self.path is None:
+            self.__open_until = until
+            return
+
+        mapped = self.__shared()
+        fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        try:
+            current = struct.unpack_from('>d', mapped)[0]
+            struct.pack_into('>d', mapped, 0, max(current, until))
+        finally:
+            fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+    def record(self, failed):
+        """Record the outcome of a call.  Trips the breaker if the error
+        rate across the :attr:`window` reaches :attr:`threshold`.
+
+        Returns:
+            Boolean ``True`` if the breaker tripped
+
+        """
+        with self.__lock:
+            self.__outcomes.append(bool(failed))
+            errors = sum(self.__outcomes)
+            calls = len(self.__outcomes)
+            if (calls < self.min_requests or
+                    float(errors) / calls < self.threshold):
+                return False
+
+            self.__outcomes.clear()
+            self.__trips += 1
+            self.__trip(time.time() + self.cooldown)
+
+        log.warning('AWIS circuit breaker tripped: %d of %d calls failed. '
+                    'Pausing for %.1fs', errors, calls, self.cooldown)
+
+        return True
+
+    def wait(self):
+        """Pause while the breaker is tripped.
+
+        Returns:
+            number of seconds spent waiting
+
+        """
+        waited = 0.0
+        while True:
+            delay = self.open_until - time.time()
+            if delay <= 0:
+                break
+            time.sleep(delay)
+            waited += delay
+
+        return waited
+
+
+class RetryPolicy(object):
+    """Classified retry of AWIS calls with full-jitter exponential
+    backoff.
+
+    Each failed attempt is classified (see :func:`classify`) and retried
+    until the retry budget of its error class is spent.  The wait before
+    a retry is a random delay of up to :attr:`base_delay` doubled for
+    each retry (capped at :attr:`max_delay`) or the server's
+    ``Retry-After``, whichever is longer.
+
+    Every outcome is fed to the optional :attr:`breaker`.  Callers are
+    paused while the breaker is tripped.
+
+    .. attribute:: budgets
+        dictionary of the number of retries allowed per error class
+
+    .. attribute:: base_delay
+        seconds of the first backoff
+
+    .. attribute:: max_delay
+        upper bound of a single backoff
+
+    .. attribute:: breaker
+        optional :class:`CircuitBreaker`
+
+    .. attribute:: report_interval
+        number of calls between :meth:`report` log summaries
+
+    .. attribute:: counts
+        :class:`collections.Counter` of ``calls``, ``succeeded``,
+        ``failed`` and the ``retries``, ``errors`` and ``exhausted``
+        counts per error class (for example, ``retries.throttle``)
+
+    """
+    def __init__(self,
+                 budgets=None,
+                 base_delay=None,
+                 max_delay=None,
+                 breaker=None,
+                 report_interval=None):
+        self.__budgets = dict(BUDGETS)
+        if budgets is not None:
+            self.__budgets.update(budgets)
+
+        if base_delay is None:
+            base_delay = BASE_DELAY
+        self.__base_delay = float(base_delay)
+
+        if max_delay is None:
+            max_delay = MAX_DELAY
+        self.__max_delay = float(max_delay)
+
+        self.__breaker = breaker
+
+        if report_interval is None:
+            report_interval = REPORT_INTERVAL
+        self.__report_interval = int(report_interval)
+
+        self.__lock = threading.Lock()
+        self.__counts = collections.Counter()
+
+    @property
+    def budgets(self):
+        """:attr:`budgets`
+        """
+        return self.__budgets
+
+    @property
+    def base_delay(self):
+        """:attr:`base_delay`
+        """
+        return self.__base_delay
+
+    @property
+    def max_delay(self):
+        """:attr:`max_delay`
+        """
+        return self.__max_delay
+
+    @property
+    def breaker(self):
+        """:attr:`breaker`
+        """
+        return self.__breaker
+
+    @property
+    def report_interval(self):
+        """:attr:`report_interval`
+        """
+        return self.__report_interval
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def delay(self, retries, server_delay=None):
+        """Seconds to wait before retry number *retries* (from 0).  Full
+        jitter: a random delay between zero and the exponential backoff.
+        *server_delay* is the ``Retry-After`` seconds, if any.
+
+        """
+        backoff = min(self.max_delay, self.base_delay * 2 ** min(retries, 16))
+        delay = random.uniform(0, backoff)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay))
+
+        return delay
+
+    def __count(self, *names):
+        with self.__lock:
+            for name in names:
+                self.counts[name] += 1
+
+    def run(self, attempt, max_tries=None):
+        """Call *attempt* until it succeeds, its error class budget is
+        spent or *max_tries* attempts have been made.
+
+        *attempt* takes no arguments and returns an :class:`Outcome`
+        with the ``error`` class set on failure.
+
+        Returns:
+            the ``value`` of the final :class:`Outcome`
+
+        """
+        retries = collections.Counter()
+        outcome = None
+        tries = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.wait()
+
+            outcome = attempt()
+            tries += 1
+
+            if (self.breaker is not None and
+                    outcome.error not in (CLIENT, OVERSIZE)):
+                self.breaker.record(outcome.error is not None)
+
+            if outcome.error is None:
+                self.__count('succeeded')
+                break
+
+            self.__count('errors.{}'.format(outcome.error))
+            if retries[outcome.error] >= self.budgets.get(outcome.error, 0):
+                log.error('AWIS %s error retry budget of %d spent',
+                          outcome.error, self.budgets.get(outcome.error, 0))
+                self.__count('failed', 'exhausted.{}'.format(outcome.error))
+                break
+
+            if max_tries is not None and tries >= max_tries:
+                log.error('All %d AWIS tries failed', max_tries)
+                self.__count('failed', 'exhausted.{}'.format(outcome.error))
+                break
+
+            delay = self.delay(sum(retries.values()), outcome.retry_after)
+            retries[outcome.error] += 1
+            self.__count('retries.{}'.format(outcome.error))
+            log.warning('AWIS %s error: retry %d in %.2fs',
+                        outcome.error, retries[outcome.error], delay)
+            time.sleep(delay)
+
+        with self.__lock:
+            self.counts['calls'] += 1
+            calls = self.counts['calls']
+        if self.report_interval and calls % self.report_interval == 0:
+            self.report()
+
+        return outcome.value
+
+    def report(self):
+        """Log the AWIS call outcome counts.
+
+        Returns:
+            dictionary of :attr:`counts`
+
+        """
+        with self.__lock:
+            counts = dict(self.counts)
+
+        log.info('AWIS calls|succeeded|failed %d|%d|%d',
+                 counts.get('calls', 0),
+                 counts.get('succeeded', 0),
+                 counts.get('failed', 0))
+        for error_class in sorted(self.budgets):
+            errors = counts.get('errors.{}'.format(error_class), 0)
+            if not errors:
+                continue
+            log.info('AWIS %s errors|retries|exhausted %d|%d|%d',
+                     error_class,
+                     errors,
+                     counts.get('retries.{}'.format(error_class), 0),
+                     counts.get('exhausted.{}'.format(error_class), 0))
+        if self.breaker is not None:
+            log.info('AWIS circuit breaker trips %d', self.breaker.trips)
+
+        return counts
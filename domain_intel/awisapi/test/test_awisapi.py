@@ -1,11 +1,14 @@
 """:class:`domain_intel.awisapi.AwisApi` unit test cases.
 
 """
+import time
+import threading
 from datetime import datetime
 import mock
-from future.moves.urllib.error import HTTPError
+import requests
 
 import domain_intel.awisapi
+from domain_intel.awisapi.retry import RetryPolicy
 
 
 def test_awisapi_init():
@@ -48,8 +51,8 @@ def test_signature():
     assert received == b'vJgaj9iiyiFs7aeG9AhPcNJlkSQ=', msg
 
 
-@mock.patch('domain_intel.awisapi.urlopen')
-def test_request_success(mock_urlopen):
+@mock.patch('requests.Session.get')
+def test_request_success(mock_get):
     """Request to AWIS.
     """
     # Given an AWS access key
@@ -80,18 +83,19 @@ def test_request_success(mock_urlopen):
            'Url=google.com')
 
     # when I execute a request
-    mock_urlopen.return_value.code = 200
-    mock_urlopen.return_value.read.return_value = 'OK'
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b'O', b'K']
     api = domain_intel.awisapi.AwisApi(access_key, secret_key)
     received = api.request(url)
 
-    # then I should not receive None
-    msg = 'Valid HTTP query response should not be None'
-    assert received is not None, msg
+    # then I should receive the response body
+    msg = 'Valid HTTP query response error'
+    assert received == b'OK', msg
 
 
-@mock.patch('domain_intel.awisapi.urlopen')
-def test_request_exception(mock_urlopen):
+@mock.patch('requests.Session.get')
+def test_request_exception(mock_get):
     """Request to AWIS.
     """
     # Given an AWS access key
@@ -122,14 +126,216 @@ def test_request_exception(mock_urlopen):
            'Url=google.com')
 
     # when I execute a request
-    mock_urlopen.side_effect = HTTPError(url,
-                                         503,
-                                         'Service Unavailable',
-                                         {},
-                                         None)
-    api = domain_intel.awisapi.AwisApi(access_key, secret_key)
+    mock_get.side_effect = requests.ConnectionError('Connection refused')
+    retry = RetryPolicy(budgets={'network': 2}, base_delay=0)
+    api = domain_intel.awisapi.AwisApi(access_key, secret_key, retry=retry)
+    received = api.request(url)
+
+    # then I should receive None
+    msg = 'Failed HTTP query response should be None'
+    assert received is None, msg
+
+    # once the network error retry budget is spent
+    msg = 'Failed HTTP query should be tried 3 times'
+    assert mock_get.call_count == 3, msg
+
+
+@mock.patch('requests.Session.get')
+def test_request_http_error(mock_get):
+    """Request to AWIS: non-200 HTTP status.
+    """
+    # Given an AWIS URL
+    url = 'http://awis.amazonaws.com/?Action=UrlInfo&Url=google.com'
+
+    # when AWIS responds with a service unavailable error
+    mock_get.return_value.status_code = 503
+    mock_get.return_value.reason = 'Service Unavailable'
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = iter([b''])
+    retry = RetryPolicy(base_delay=0)
+    api = domain_intel.awisapi.AwisApi(None, None, retry=retry)
+    received = api.request(url, tries=2)
+
+    # then I should receive None
+    msg = 'HTTP error response should be None'
+    assert received is None, msg
+
+    # and each response should be released
+    msg = 'HTTP error responses should be closed'
+    assert mock_get.return_value.close.call_count == 2, msg
+
+
+@mock.patch('requests.Session.get')
+def test_request_response_too_large(mock_get):
+    """Request to AWIS: response exceeds the size limit.
+    """
+    # Given an AWIS URL
+    url = 'http://awis.amazonaws.com/?Action=UrlInfo&Url=google.com'
+
+    # and an API with a response size limit
+    api = domain_intel.awisapi.AwisApi(None, None, max_response_bytes=4)
+
+    # when AWIS responds with a body larger than the limit
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b'<?xml', b' ...']
     received = api.request(url)
 
-    # then I should not receive None
-    msg = 'Valid HTTP query response should not be None'
+    # then I should receive None
+    msg = 'Oversized HTTP response should be None'
     assert received is None, msg
+
+    # without a retry
+    msg = 'Oversized HTTP response should not be retried'
+    assert mock_get.call_count == 1, msg
+
+
+@mock.patch('requests.Session.get')
+def test_request_timeouts(mock_get):
+    """Request to AWIS: connect and read timeouts.
+    """
+    # Given an AWIS URL
+    url = 'http://awis.amazonaws.com/?Action=UrlInfo&Url=google.com'
+
+    # and an API with connect and read timeouts
+    api = domain_intel.awisapi.AwisApi(None,
+                                       None,
+                                       connect_timeout=2,
+                                       read_timeout=10)
+
+    # when I execute a request
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b'OK']
+    api.request(url)
+
+    # then the timeouts should be passed to the session
+    msg = 'Request timeouts error'
+    expected = mock.call(url, timeout=(2.0, 10.0), stream=True)
+    assert mock_get.call_args == expected, msg
+
+
+def test_session_reuse():
+    """AWIS keep-alive session is held per instance.
+    """
+    # Given an AWIS API
+    api = domain_intel.awisapi.AwisApi(None, None)
+
+    # when I reference the session more than once
+    session = api.session
+
+    # then I should receive the same session
+    msg = 'AWIS session should be reused'
+    assert api.session is session, msg
+
+    # and a new session once closed
+    api.close()
+    msg = 'Closed AWIS session should be replaced'
+    assert api.session is not session, msg
+
+
+@mock.patch('requests.Session')
+def test_session_concurrent_first_use(mock_session):
+    """Concurrent first use of the AWIS session creates one session.
+    """
+    # Given an AWIS API
+    api = domain_intel.awisapi.AwisApi(None, None)
+
+    # and a slow session build
+    mock_session.side_effect = lambda: time.sleep(0.1) or mock.Mock()
+
+    # when 4 threads reference the session at once
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(api.session))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # then a single session should be created and shared
+    msg = 'Concurrent first use should create a single AWIS session'
+    assert mock_session.call_count == 1, msg
+    assert len(set(id(x) for x in sessions)) == 1, msg
+
+
+@mock.patch('requests.Session.get')
+def test_request_rate_limited(mock_get):
+    """Request to AWIS: each try is rate limited.
+    """
+    # Given an AWIS URL
+    url = 'http://awis.amazonaws.com/?Action=UrlInfo&Url=google.com'
+
+    # and an API with a rate limiter
+    limiter = mock.Mock()
+    retry = RetryPolicy(base_delay=0)
+    api = domain_intel.awisapi.AwisApi(None,
+                                       None,
+                                       limiter=limiter,
+                                       retry=retry)
+
+    # when each try fails
+    mock_get.side_effect = requests.ConnectionError('Connection refused')
+    api.request(url, tries=2)
+
+    # then a token should be acquired for each try
+    msg = 'Rate limiter acquire count error'
+    assert limiter.acquire.call_count == 2, msg
+
+
+def test_cache_key():
+    """AWIS response cache key excludes the volatile parameters.
+    """
+    # Given two AWIS URLs for the same query at different times
+    urls = [
+        ('http://awis.amazonaws.com/?AWSAccessKeyId=AKIA&Action=UrlInfo&'
+         'Signature=abc%3D&Timestamp=2017-03-23T00%3A00%3A00.000Z&'
+         'Url=google.com'),
+        ('http://awis.amazonaws.com/?Url=google.com&Action=UrlInfo&'
+         'Timestamp=2017-03-24T00%3A00%3A00.000Z&Signature=xyz%3D&'
+         'AWSAccessKeyId=AKIA'),
+    ]
+
+    # when I generate the cache keys
+    received = [domain_intel.awisapi.AwisApi.cache_key(x) for x in urls]
+
+    # then the keys should match
+    msg = 'AWIS cache key error'
+    expected = ('UrlInfo', 'AWSAccessKeyId=AKIA&Action=UrlInfo&Url=google.com')
+    assert received == [expected, expected], msg
+
+
+@mock.patch('requests.Session.get')
+def test_request_cached(mock_get):
+    """Request to AWIS: responses are served from the cache.
+    """
+    # Given an AWIS URL
+    url = 'http://awis.amazonaws.com/?Action=UrlInfo&Url=google.com'
+
+    # and an API with a response cache
+    cache = mock.Mock()
+    cache.get.return_value = None
+    api = domain_intel.awisapi.AwisApi(None, None, cache=cache)
+
+    # when the response is not cached
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b'OK']
+    api.request(url)
+
+    # then the response should be cached
+    msg = 'AWIS response should be cached'
+    expected = mock.call('UrlInfo', 'Action=UrlInfo&Url=google.com', b'OK')
+    assert cache.put.call_args == expected, msg
+
+    # when the response is cached
+    cache.get.return_value = b'CACHED'
+    received = api.request(url)
+
+    # then I should receive the cached response
+    msg = 'Cached AWIS response error'
+    assert received == b'CACHED', msg
+
+    # without calling AWIS
+    msg = 'Cached AWIS response should not call AWIS'
+    assert mock_get.call_count == 1, msg
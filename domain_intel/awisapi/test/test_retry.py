@@ -0,0 +1,177 @@
+""":mod:`domain_intel.awisapi.retry` unit test cases.
+
+"""
+import mock
+
+from domain_intel.awisapi.retry import (CircuitBreaker,
+                                        Outcome,
+                                        RetryPolicy,
+                                        classify,
+                                        retry_after)
+
+THROTTLED = (b'<?xml version="1.0"?>\n<Response><Errors><Error>'
+             b'<Code>RequestThrottled</Code>'
+             b'<Message>Rate exceeded</Message>'
+             b'</Error></Errors></Response>')
+
+
+def test_classify():
+    """Classify AWIS call failures.
+    """
+    # When I classify the AWIS call outcomes
+    received = [
+        classify(200, b'<xml/>'),
+        classify(503, THROTTLED),
+        classify(429),
+        classify(500, b'<Code>InternalError</Code>'),
+        classify(403, b'<Code>AccessDenied</Code>'),
+        classify(err=Exception('Connection refused')),
+    ]
+
+    # then I should receive the error classes
+    msg = 'AWIS error classification error'
+    expected = [None, 'throttle', 'throttle', 'server', 'client', 'network']
+    assert received == expected, msg
+
+
+def test_retry_after():
+    """Parse the HTTP Retry-After header.
+    """
+    # When I parse delta seconds
+    received = retry_after('120')
+
+    # then I should receive the seconds to wait
+    msg = 'Retry-After delta seconds error'
+    assert received == 120.0, msg
+
+    # when I parse a missing or invalid value
+    received = [retry_after(None), retry_after('soon')]
+
+    # then I should receive None
+    msg = 'Retry-After invalid value error'
+    assert received == [None, None], msg
+
+
+def test_delay_full_jitter():
+    """Full-jitter exponential backoff is bounded.
+    """
+    # Given a retry policy
+    policy = RetryPolicy(base_delay=1, max_delay=10)
+
+    # when I generate backoff delays
+    received = [policy.delay(x) for x in range(8)]
+
+    # then each delay should be within its exponential bound
+    msg = 'Full-jitter backoff bound error'
+    expected = [1, 2, 4, 8, 10, 10, 10, 10]
+    assert all(0 <= x <= y for x, y in zip(received, expected)), msg
+
+    # and honour a Retry-After beyond the backoff
+    msg = 'Retry-After should extend the backoff'
+    assert policy.delay(0, server_delay=5) == 5, msg
+
+
+@mock.patch('domain_intel.awisapi.retry.time.sleep')
+def test_run_retry_budgets(mock_sleep):
+    """Failed attempts are retried within the error class budget.
+    """
+    # Given a retry policy that retries throttling twice
+    policy = RetryPolicy(budgets={'throttle': 2}, base_delay=0)
+
+    # when each attempt is throttled
+    attempt = mock.Mock(return_value=Outcome(None, 'throttle', 3.0))
+    received = policy.run(attempt)
+
+    # then I should receive None
+    msg = 'Exhausted retry value should be None'
+    assert received is None, msg
+
+    # after the budget is spent
+    msg = 'Throttled attempt count error'
+    assert attempt.call_count == 3, msg
+
+    # honouring the Retry-After
+    msg = 'Retry-After wait error'
+    assert mock_sleep.call_args_list == [mock.call(3.0)] * 2, msg
+
+    # and the failure should be counted
+    msg = 'Retry counts error'
+    counts = policy.report()
+    assert counts['retries.throttle'] == 2, msg
+    assert counts['exhausted.throttle'] == 1, msg
+    assert counts['failed'] == 1, msg
+
+
+def test_run_client_error_not_retried():
+    """Client errors are not retried.
+    """
+    # Given a retry policy
+    policy = RetryPolicy(base_delay=0)
+
+    # when the attempt fails with a client error
+    attempt = mock.Mock(return_value=Outcome(None, 'client', None))
+    policy.run(attempt)
+
+    # then it should not be retried
+    msg = 'Client error should not be retried'
+    assert attempt.call_count == 1, msg
+
+
+def test_run_success_after_retry():
+    """Succeed on retry.
+    """
+    # Given a retry policy
+    policy = RetryPolicy(base_delay=0)
+
+    # when the first attempt fails with a server error
+    attempt = mock.Mock(side_effect=[Outcome(None, 'server', None),
+                                     Outcome(b'<xml/>', None, None)])
+    received = policy.run(attempt)
+
+    # then I should receive the value of the retry
+    msg = 'Retried value error'
+    assert received == b'<xml/>', msg
+
+
+@mock.patch('domain_intel.awisapi.retry.time')
+def test_circuit_breaker_trip(mock_time):
+    """Circuit breaker trips when the error rate spikes.
+    """
+    # Given a circuit breaker
+    mock_time.time.return_value = 1000.0
+    breaker = CircuitBreaker(window=4, threshold=0.5, min_requests=4,
+                             cooldown=30)
+
+    # when half the calls in the window fail
+    received = [breaker.record(x) for x in [False, True, False, True]]
+
+    # then the breaker should trip
+    msg = 'Circuit breaker should trip'
+    assert received == [False, False, False, True], msg
+
+    # and pause callers for the cooldown
+    def sleep(seconds):
+        mock_time.time.return_value += seconds
+    mock_time.sleep.side_effect = sleep
+    msg = 'Circuit breaker pause error'
+    assert breaker.wait() == 30.0, msg
+
+
+@mock.patch('domain_intel.awisapi.retry.time')
+def test_circuit_breaker_shared(mock_time, tmpdir):
+    """Circuit breaker trip is shared through the breaker file.
+    """
+    # Given two circuit breakers over the same file
+    mock_time.time.return_value = 1000.0
+    path = str(tmpdir.join('breaker'))
+    kwargs = {'window': 2, 'min_requests': 2, 'cooldown': 10, 'path': path}
+    breaker = CircuitBreaker(**kwargs)
+    other = CircuitBreaker(**kwargs)
+
+    # when the first breaker trips
+    breaker.record(True)
+    breaker.record(True)
+
+    # then the second breaker should pause callers
+    msg = 'Shared circuit breaker trip error'
+    assert other.open_until == 1010.0, msg
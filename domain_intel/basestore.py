@@ -0,0 +1,381 @@
+""":class:`BaseStore`
+
+"""
+import json
+import contextlib
+
+import domain_intel.common
+import domain_intel.keycache
+import domain_intel.reporter
+
+CONFIG = domain_intel.common.CONFIG
+COUNTRY_CODES = domain_intel.common.COUNTRY_CODES
+ON_DUPLICATE_POLICIES = ['error', 'ignore', 'replace', 'update']
+SYSTEM_ATTRIBUTES = ['_id', '_key', '_from', '_to']
+
+# Vertices shared across domains that benefit from a known-key cache.
+KNOWN_KEYS_COLLECTIONS = ['country', 'ipv4', 'ipv6', 'url', 'link']
+
+# The Domain Intel graph.
+VERTEX_COLLECTIONS = [
+    'url-info',
+    'geodns',
+    'domain',
+    'country',
+    'link',
+    'subdomain',
+    'url',
+    'ipv4',
+    'ipv6',
+    'traffic',
+    'analyst-qas',
+]
+EDGE_DEFINITIONS = [
+    {
+        'from': 'domain',
+        'name': 'ranked',
+        'to': 'country',
+    },
+    {
+        'from': 'domain',
+        'name': 'related',
+        'to': 'link',
+    },
+    {
+        'from': 'subdomain',
+        'name': 'contribute',
+        'to': 'domain',
+    },
+    {
+        'from': 'url',
+        'name': 'links_into',
+        'to': 'domain',
+    },
+    {
+        'from': 'domain',
+        'name': 'ipv4_resolves',
+        'to': 'ipv4',
+    },
+    {
+        'from': 'domain',
+        'name': 'ipv6_resolves',
+        'to': 'ipv6',
+    },
+    {
+        'from': 'traffic',
+        'name': 'visit',
+        'to': 'domain',
+    },
+    {
+        'from': 'domain',
+        'name': 'marked',
+        'to': 'analyst-qas',
+    },
+]
+
+# Edge collections that feed the wide-column CSV.
+WIDE_COLUMN_EDGES = [
+    'ranked',
+    'links_into',
+    'ipv4_resolves',
+    'visit',
+    'marked',
+]
+
+
+def project_document(document, projection):
+    """Reduce *document* to the fields named in the *projection* spec
+    for the document's collection.  Nested fields are dot separated.
+    System attributes are always retained.
+
+    See :func:`domain_intel.store.projection_expression` for the
+    server-side equivalent.
+
+    Returns:
+        the projected copy of *document*
+
+    """
+    collection_name = document.get('_id', '').split('/', 1)[0]
+    fields = SYSTEM_ATTRIBUTES + projection.get(collection_name, [])
+
+    projected = {}
+    for field in fields:
+        tokens = field.split('.')
+        value = document
+        for token in tokens:
+            if not isinstance(value, dict) or token not in value:
+                break
+            value = value[token]
+        else:
+            node = projected
+            for token in tokens[:-1]:
+                node = node.setdefault(token, {})
+            node[tokens[-1]] = value
+
+    return projected
+
+
+class BaseStore(object):
+    """Persistent store contract shared by the Domain Intel store
+    backends.  Backends are selected by :func:`domain_intel.store.get_store`.
+
+    ..attribute:: database_name
+        name of the database.  Defaults to 'ipe'
+
+    ..attribute:: on_duplicate
+        conflict policy applied when a document key already exists.  One
+        of ``error`` (default), ``ignore``, ``replace`` or ``update``
+
+    ..attribute:: known_keys
+        the :class:`domain_intel.keycache.KeyCache` of keys known to
+        exist in the ``known_keys_collections``, or ``None`` if
+        disabled.  Enabled by the ``known_keys`` config value
+
+    """
+    def __init__(self, database_name='ipe', on_duplicate=None,
+                 known_keys=None):
+        self.__database_name = database_name
+
+        if on_duplicate is None:
+            on_duplicate = CONFIG.get('arango_on_duplicate', 'error')
+        if on_duplicate not in ON_DUPLICATE_POLICIES:
+            raise ValueError('Unknown on_duplicate policy "{}"'.format(
+                on_duplicate))
+        self.__on_duplicate = on_duplicate
+
+        if known_keys is None:
+            known_keys = CONFIG.get('known_keys', False)
+        self.__known_keys = None
+        if known_keys:
+            names = CONFIG.get('known_keys_collections',
+                               KNOWN_KEYS_COLLECTIONS)
+            self.__known_keys = domain_intel.keycache.KeyCache(
+                names,
+                seeder=self.export_ids
+            )
+
+    @property
+    def known_keys(self):
+        """Known-key cache.
+        """
+        return self.__known_keys
+
+    @property
+    def database_name(self):
+        """Name of the database.
+        """
+        return self.__database_name
+
+    @property
+    def on_duplicate(self):
+        """Conflict policy on existing document keys.
+        """
+        return self.__on_duplicate
+
+    def known(self, collection_name, kwargs):
+        """Check if the *kwargs* document key is known to exist in
+        *collection_name*, in which case the insert can be skipped.
+
+        Only applies when the :attr:`on_duplicate` policy would leave
+        an existing document unchanged (``error`` or ``ignore``).
+
+        Returns:
+            Boolean ``True`` if the insert can be skipped
+
+        """
+        if (self.known_keys is None or
+                self.on_duplicate not in ['error', 'ignore']):
+            return False
+
+        return self.known_keys.seen(collection_name, kwargs.get('_key'))
+
+    def remember(self, collection_name, kwargs):
+        """Record the *kwargs* document key against *collection_name*
+        in the :attr:`known_keys` cache after a successful write.
+
+        """
+        if self.known_keys is not None:
+            self.known_keys.add(collection_name, kwargs.get('_key'))
+
+    def version(self):
+        """Log the backend version.  Can also be used to verify health
+        of system.
+
+        """
+        raise NotImplementedError
+
+    def initialise(self):
+        """Initialise the database.
+
+        """
+        raise NotImplementedError
+
+    def build_graph_collection(self):
+        """Set up the Domain Intel :data:`VERTEX_COLLECTIONS` and
+        :data:`EDGE_DEFINITIONS`.
+
+        """
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def bulk_writer(self, enabled=True, max_batch_size=None,
+                    flush_interval=None):
+        """Context manager that batches :meth:`collection_insert` and
+        :meth:`edge_insert` calls.  Backends without batching support
+        write directly to the store and yield ``None``.
+
+        """
+        yield None
+
+    def collection_insert(self, collection_name, kwargs, dry=False):
+        """Insert the *kwargs* document into vertex *collection_name*.
+
+        Returns:
+            Boolean ``True`` on success.  ``False`` otherwise
+
+        """
+        raise NotImplementedError
+
+    def edge_insert(self, edge_name, kwargs, dry=False):
+        """Insert the *kwargs* document into edge collection *edge_name*.
+
+        Returns:
+            Boolean ``True`` on success.  ``False`` otherwise
+
+        """
+        raise NotImplementedError
+
+    def get_collection_count(self, collection_name='domain'):
+        """Get count of all documents in *collection_name*.
+
+        """
+        raise NotImplementedError
+
+    def drop_database(self):
+        """Remove the database identified by :attr:`database_name`.
+
+        """
+        raise NotImplementedError
+
+    def export_ids(self, collection_name, **kwargs):
+        """Dump all of the `_id` column values from *collection_name*.
+
+        Returns:
+            generator object that references the label names taken
+            from the *collection_name* collection
+
+        """
+        raise NotImplementedError
+
+    def traverse_graph(self, label, as_json=True):
+        """Single-hop traversal of the graph starting at vertex denoted
+        by *label*.
+
+        Returns:
+            the graph structure as a dictionary of the form
+            ``{'vertices': [...], 'paths': [...]}`` optionally converted
+            to JSON if *as_json* is set.  ``None`` if the traversal failed
+
+        """
+        raise NotImplementedError
+
+    def persist_country_codes(self, dry=False):
+        """Pre-load required country code information.
+
+        """
+        collection_count = 0
+
+        for country_code, country_name in COUNTRY_CODES.items():
+            kwargs = {
+                '_key': country_code.upper(),
+                'name': country_name,
+            }
+            if self.collection_insert('country', kwargs, dry=dry):
+                collection_count += 1
+
+        return collection_count
+
+    def traverse_many(self,
+                      labels,
+                      batch_size=None,
+                      projection=None,
+                      edge_collections=None,
+                      as_json=True,
+                      halt_on_error=False):
+        """Single-hop traversal of the graph for each vertex in *labels*.
+
+        If a *projection* spec is provided then only the named fields
+        of each vertex and edge are returned.  The traversal can be
+        limited to the *edge_collections* list of edge collection names.
+
+        This default implementation calls :meth:`traverse_graph` per
+        label.  *batch_size* and *halt_on_error* are ignored.
+
+        Returns:
+            generator of (<label>, <traversal>) tuples where the
+            traversal is as per :meth:`traverse_graph`
+
+        """
+        for label in labels:
+            traversal = self.traverse_graph(label, as_json=False)
+            if traversal is None:
+                continue
+
+            if edge_collections is not None:
+                paths = [traversal['paths'][0]]
+                for path in traversal['paths'][1:]:
+                    edge_name = path['edges'][0]['_id'].split('/', 1)[0]
+                    if edge_name in edge_collections:
+                        paths.append(path)
+                traversal = {
+                    'vertices': [x['vertices'][-1] for x in paths],
+                    'paths': paths,
+                }
+
+            if projection is not None:
+                project = lambda x: project_document(x, projection)
+                traversal = {
+                    'vertices': [project(x) for x in traversal['vertices']],
+                    'paths': [{
+                        'edges': [project(x) for x in path['edges']],
+                        'vertices': [project(x) for x in path['vertices']],
+                    } for path in traversal['paths']],
+                }
+
+            if as_json:
+                traversal = json.dumps(traversal)
+            yield (label, traversal)
+
+    def wide_column_rows(self, domains=None, batch_size=None):
+        """Generate the wide-column CSV rows for each domain in
+        *domains* directly from the store.  If *domains* is ``None``
+        then all domains in the "domain" collection are reported on.
+
+        Each batch of *batch_size* domains is traversed across the
+        :data:`WIDE_COLUMN_EDGES` via :meth:`traverse_many`.  The
+        projected result is then formatted by
+        :meth:`domain_intel.Reporter.dump_wide_column_csv` (traffic
+        trends are calculated client side).
+
+        Returns:
+            generator of (<label>, <csv_lines>) tuples where
+            <csv_lines> is the list of wide-column CSV lines ordered
+            as per :class:`domain_intel.GbqCsv`
+
+        """
+        if domains is None:
+            labels = self.export_ids('domain')
+        else:
+            labels = (x if x.startswith('domain/') else 'domain/{}'.format(x)
+                      for x in domains)
+
+        traversals = self.traverse_many(
+            labels,
+            batch_size,
+            projection=domain_intel.reporter.PROJECTION,
+            edge_collections=WIDE_COLUMN_EDGES,
+            as_json=False
+        )
+        for label, traversal in traversals:
+            reporter = domain_intel.reporter.Reporter(data=traversal)
+            yield (label, reporter.dump_wide_column_csv())
@@ -0,0 +1,278 @@
+""":class:`BulkWriter`
+
+"""
+import re
+import time
+import collections
+import arango.exceptions
+from logga import log
+
+import domain_intel.common
+import domain_intel.spool
+
+CONFIG = domain_intel.common.CONFIG
+
+# Position of the document in a bulk import error detail.
+DETAIL_POSITION = re.compile(r'at position (\d+):')
+
+
+class BulkImportError(Exception):
+    """Raised when a bulk import fails and its documents were neither
+    imported nor spooled.
+    """
+    pass
+
+
+class BulkWriter(object):
+    """Buffers documents per collection and flushes them to ArangoDB
+    through the bulk import endpoint.  Existing document keys are
+    handled as per the store's
+    :attr:`domain_intel.Store.on_duplicate` policy.
+
+    A flush of a collection's buffer is triggered when either
+    :attr:`max_batch_size` documents have been buffered or
+    :attr:`flush_interval` seconds have passed since the collection was
+    last flushed.  As the age of a buffer is only checked as documents
+    are added, an idle caller should :meth:`flush_stale` to flush the
+    buffers that have aged.  Any remaining documents are flushed on
+    :meth:`close`.
+
+    If the store has a :attr:`domain_intel.Store.spool` then batches that
+    fail because ArangoDB is unavailable are spooled rather than lost.
+    Any other failed import raises :class:`BulkImportError` so that the
+    caller does not commit the consumer offsets of the lost documents.
+
+    Document keys are only added to the store's known-key cache (see
+    :meth:`domain_intel.Store.remember`) once their import succeeds.
+
+    .. attribute:: store
+        the :class:`domain_intel.Store` instance to write to
+
+    .. attribute:: max_batch_size
+        number of buffered documents per collection that triggers a flush
+
+    .. attribute:: flush_interval
+        number of seconds a collection buffer can age before a flush
+
+    .. attribute:: counts
+        per-collection :class:`collections.Counter` of the bulk import
+        results (``created``, ``errors``, ``empty``, ``updated`` and
+        ``ignored`` and ``spooled``)
+
+    """
+    def __init__(self, store, max_batch_size=None, flush_interval=None):
+        self.__store = store
+
+        if max_batch_size is None:
+            max_batch_size = CONFIG.get('arango_bulk_size', 500)
+        self.__max_batch_size = int(max_batch_size)
+
+        if flush_interval is None:
+            flush_interval = CONFIG.get('arango_bulk_interval', 5)
+        self.__flush_interval = float(flush_interval)
+
+        self.__buffers = collections.defaultdict(list)
+        self.__last_flush = {}
+        self.__counts = collections.defaultdict(collections.Counter)
+
+    @property
+    def store(self):
+        """:attr:`store`
+        """
+        return self.__store
+
+    @property
+    def max_batch_size(self):
+        """:attr:`max_batch_size`
+        """
+        return self.__max_batch_size
+
+    @property
+    def flush_interval(self):
+        """:attr:`flush_interval`
+        """
+        return self.__flush_interval
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def pending(self, collection_name=None):
+        """Number of documents buffered against *collection_name*.  If
+        *collection_name* is ``None`` then the count is across all
+        collections.
+
+        """
+        if collection_name is not None:
+            return len(self.__buffers.get(collection_name, []))
+
+        return sum(len(x) for x in self.__buffers.values())
+
+    def stored(self, collection_name):
+        """Number of documents in *collection_name* that the bulk
+        imports so far have either created or updated.
+
+        """
+        counts = self.counts.get(collection_name, {})
+
+        return counts.get('created', 0) + counts.get('updated', 0)
+
+    def add(self, collection_name, document):
+        """Buffer *document* against *collection_name*.  Vertex and
+        edge documents are treated alike as the bulk import endpoint
+        takes the edge ``_from`` and ``_to`` from the document itself.
+
+        Returns:
+            the bulk import result if the add triggered a flush.
+            ``None`` otherwise
+
+        """
+        self.__last_flush.setdefault(collection_name, time.time())
+        self.__buffers[collection_name].append(document)
+
+        result = None
+        age = time.time() - self.__last_flush[collection_name]
+        if (len(self.__buffers[collection_name]) >= self.max_batch_size or
+                age >= self.flush_interval):
+            result = self.flush(collection_name)
+
+        return result
+
+    def flush(self, collection_name=None):
+        """Send buffered documents to ArangoDB.  If *collection_name*
+        is ``None`` then all collection buffers are flushed.
+
+        Returns:
+            dictionary of the accumulated :attr:`counts` for the
+            collections flushed
+
+        Raises:
+            :class:`BulkImportError` if a bulk import failed
+
+        """
+        names = [collection_name]
+        if collection_name is None:
+            names = list(self.__buffers.keys())
+
+        flushed = {}
+        for name in names:
+            documents = self.__buffers.pop(name, [])
+            self.__last_flush[name] = time.time()
+            if not documents:
+                continue
+
+            self.__import(name, documents)
+            flushed[name] = self.counts[name]
+
+        return flushed
+
+    def flush_stale(self):
+        """Flush the collection buffers that have not been flushed for
+        :attr:`flush_interval` seconds.
+
+        Returns:
+            dictionary of the accumulated :attr:`counts` for the
+            collections flushed
+
+        Raises:
+            :class:`BulkImportError` if a bulk import failed
+
+        """
+        now = time.time()
+        flushed = {}
+        for name in [k for k, v in self.__buffers.items() if v]:
+            if now - self.__last_flush[name] >= self.flush_interval:
+                flushed.update(self.flush(name))
+
+        return flushed
+
+    def __import(self, collection_name, documents):
+        """Bulk import *documents* into *collection_name* and tally
+        the results into :attr:`counts`.
+
+        """
+        log.info('Bulk importing %d documents into collection %s',
+                 len(documents), collection_name)
+
+        kwargs = {
+            'halt_on_error': False,
+            'details': True,
+            'on_duplicate': self.store.on_duplicate,
+        }
+        collection = self.store.collection(collection_name)
+        try:
+            result = collection.import_bulk(documents, **kwargs)
+        except (domain_intel.spool.UNAVAILABLE_ERRORS +
+                (arango.exceptions.DocumentInsertError,)) as err:
+            spool = self.store.spool
+            if spool is not None and domain_intel.spool.unavailable(err):
+                log.warning('Spooling %d documents for %s: %s',
+                            len(documents), collection_name, err)
+                spool.record(failed=True)
+                for document in documents:
+                    spool.append(collection_name, document)
+                spool.start_drainer(self.store)
+                self.counts[collection_name]['spooled'] += len(documents)
+                return
+            if not isinstance(err, arango.exceptions.DocumentInsertError):
+                raise
+
+            log.error('Bulk import into %s of %d documents failed: %s',
+                      collection_name, len(documents), err)
+            self.counts[collection_name]['errors'] += len(documents)
+            raise BulkImportError('Bulk import into {} of {} documents '
+                                  'failed: {}'.format(collection_name,
+                                                      len(documents),
+                                                      err))
+
+        for key in ['created', 'errors', 'empty', 'updated', 'ignored']:
+            self.counts[collection_name][key] += result.get(key, 0)
+
+        for detail in result.get('details', []):
+            log.error('Bulk import into %s: %s', collection_name, detail)
+
+        for document in self.imported(documents, result):
+            self.store.remember(collection_name, document)
+
+    @staticmethod
+    def imported(documents, result):
+        """Filter *documents* down to those that exist in the store as
+        per the bulk import *result*.  A document rejected as a
+        duplicate key already exists.  If the failed documents cannot
+        be identified from the result details then none are returned.
+
+        Returns:
+            list of documents
+
+        """
+        errors = result.get('errors', 0)
+        if not errors:
+            return list(documents)
+
+        failed = set()
+        for detail in result.get('details', []):
+            match = DETAIL_POSITION.search(detail)
+            if match is None:
+                return []
+            failed.add(int(match.group(1)))
+            if 'unique constraint violated' in detail:
+                errors -= 1
+                failed.discard(int(match.group(1)))
+
+        if errors != len(failed):
+            return []
+
+        return [x for i, x in enumerate(documents) if i not in failed]
+
+    def close(self):
+        """Flush all remaining buffers.
+
+        Returns:
+            dictionary of per-collection :attr:`counts`
+
+        """
+        self.flush()
+
+        return dict(self.counts)
@@ -0,0 +1,233 @@
+"""Versioned binary envelope for inter-stage Kafka messages.
+
+An envelope is a fixed header followed by the message key and the
+encoded payload::
+
+    +-------+---------+-------+-------------+--------+-------------+-------+
+    | magic | version | codec | compression | schema | produced_at | key   |
+    | 3s    | B       | B     | B           | H      | Q (ms)      | H len |
+    +-------+---------+-------+-------------+--------+-------------+-------+
+    | <key bytes> | <payload bytes>                                        |
+    +-------------+--------------------------------------------------------+
+
+Payload codecs and compressors are looked up by the id in the header so
+consumers decode whatever the producer was configured with.  Messages
+without the envelope magic are treated as legacy payloads.
+
+"""
+import json
+import time
+import zlib
+import struct
+import collections
+
+import domain_intel.common
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+CONFIG = domain_intel.common.CONFIG
+
+MAGIC = b'DIE'
+VERSION = 1
+HEADER = struct.Struct('>3sBBBHQH')
+
+# Payload schema ids.  Ids are part of the wire format: never reuse one.
+SCHEMAS = {
+    'urlinfo': 1,
+    'traffichistory': 2,
+    'siteslinkingin': 3,
+    'traversal': 4,
+    'checkhostnet': 5,
+    'dns': 6,
+    'geodns': 7,
+}
+SCHEMA_NAMES = {v: k for k, v in SCHEMAS.items()}
+
+Envelope = collections.namedtuple('Envelope',
+                                  ['schema', 'key', 'produced_at', 'payload'])
+
+Codec = collections.namedtuple('Codec', ['id', 'encode', 'decode'])
+
+CODECS = {}
+CODEC_IDS = {}
+
+COMPRESSORS = {}
+COMPRESSOR_IDS = {}
+
+
+class EnvelopeError(Exception):
+    """Envelope encode or decode error.
+    """
+    pass
+
+
+def register_codec(name, codec_id, encode, decode):
+    """Register payload codec *name* under the wire *codec_id*.  *encode*
+    takes a payload and returns bytes.  *decode* reverses *encode*.
+
+    """
+    codec = Codec(codec_id, encode, decode)
+    CODECS[name] = codec
+    CODEC_IDS[codec_id] = codec
+
+
+def register_compressor(name, compressor_id, compress, decompress):
+    """Register compressor *name* under the wire *compressor_id*.
+
+    """
+    compressor = Codec(compressor_id, compress, decompress)
+    COMPRESSORS[name] = compressor
+    COMPRESSOR_IDS[compressor_id] = compressor
+
+
+def _json_encode(payload):
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def _json_decode(value):
+    return json.loads(value.decode('utf-8'))
+
+
+register_codec('raw', 0, bytes, bytes)
+register_codec('json', 1, _json_encode, _json_decode)
+if msgpack is not None:
+    register_codec('msgpack',
+                   2,
+                   lambda x: msgpack.packb(x, use_bin_type=True),
+                   lambda x: msgpack.unpackb(x, raw=False))
+
+register_compressor(None, 0, bytes, bytes)
+register_compressor('zlib', 1, zlib.compress, zlib.decompress)
+if zstandard is not None:
+    register_compressor('zstd',
+                        2,
+                        lambda x: zstandard.ZstdCompressor().compress(x),
+                        lambda x: zstandard.ZstdDecompressor().decompress(x))
+if lz4 is not None:
+    register_compressor('lz4', 3, lz4.frame.compress, lz4.frame.decompress)
+
+
+def encode(schema,
+           payload,
+           key=None,
+           produced_at=None,
+           codec=None,
+           compression=None):
+    """Wrap *payload* of type *schema* (see :data:`SCHEMAS`) in an
+    envelope.
+
+    *codec* and *compression* default to the ``codec`` and
+    ``compression`` values of the ``envelope`` config.  *produced_at*
+    defaults to the current time in milliseconds since epoch.
+
+    Returns:
+        the envelope as bytes
+
+    Raises:
+        :class:`EnvelopeError` if the *schema*, *codec* or
+        *compression* is not supported
+
+    """
+    envelope_conf = CONFIG.get('envelope', {})
+    if codec is None:
+        codec = envelope_conf.get('codec', 'json')
+    if compression is None:
+        compression = envelope_conf.get('compression')
+
+    if schema not in SCHEMAS:
+        raise EnvelopeError('Unknown envelope schema "{}"'.format(schema))
+    if codec not in CODECS:
+        raise EnvelopeError('Envelope codec "{}" not available'.format(codec))
+    if compression not in COMPRESSORS:
+        raise EnvelopeError('Envelope compression "{}" not available'.
+                            format(compression))
+
+    if produced_at is None:
+        produced_at = int(time.time() * 1000)
+
+    if key is None:
+        key = b''
+    elif not isinstance(key, bytes):
+        key = key.encode('utf-8')
+
+    body = COMPRESSORS[compression].encode(CODECS[codec].encode(payload))
+    header = HEADER.pack(MAGIC,
+                         VERSION,
+                         CODECS[codec].id,
+                         COMPRESSORS[compression].id,
+                         SCHEMAS[schema],
+                         produced_at,
+                         len(key))
+
+    return header + key + body
+
+
+def decode(value, legacy=None):
+    """Unwrap the envelope *value*.  All consumers of enveloped topics
+    should decode through here.
+
+    A *value* without the envelope magic is a legacy message.  Its
+    payload is the result of the *legacy* callable, or *value* as is if
+    *legacy* is not set.  The remaining fields are ``None``.
+
+    Returns:
+        :class:`Envelope` named tuple
+
+    Raises:
+        :class:`EnvelopeError` if the envelope cannot be decoded
+
+    """
+    if value is None or value[:len(MAGIC)] != MAGIC:
+        payload = value
+        if legacy is not None:
+            payload = legacy(value)
+        return Envelope(None, None, None, payload)
+
+    try:
+        (_, version, codec_id, compressor_id,
+         schema_id, produced_at, key_length) = HEADER.unpack_from(value)
+    except struct.error as err:
+        raise EnvelopeError('Envelope header error: {}'.format(err))
+
+    if version != VERSION:
+        raise EnvelopeError('Unsupported envelope version {}'.format(version))
+    if codec_id not in CODEC_IDS:
+        raise EnvelopeError('Envelope codec id {} not available'.
+                            format(codec_id))
+    if compressor_id not in COMPRESSOR_IDS:
+        raise EnvelopeError('Envelope compression id {} not available'.
+                            format(compressor_id))
+
+    offset = HEADER.size + key_length
+    key = value[HEADER.size:offset] or None
+    body = COMPRESSOR_IDS[compressor_id].decode(value[offset:])
+    payload = CODEC_IDS[codec_id].decode(body)
+
+    return Envelope(SCHEMA_NAMES.get(schema_id, schema_id),
+                    key,
+                    produced_at,
+                    payload)
+
+
+def loads(value):
+    """Payload of the enveloped *value*.  Legacy messages are taken to
+    be JSON text.
+
+    Returns:
+        the decoded payload
+
+    """
+    return decode(value, legacy=_json_decode).payload
@@ -0,0 +1,302 @@
+""":class:`Exporter`
+
+"""
+import os
+import io
+import json
+import threading
+from future.moves import queue
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+BOUNDARY_QUERY = """FOR d IN @@collection
+    SORT d._key
+    LIMIT @offset, 1
+    RETURN d._key"""
+
+
+class Exporter(object):
+    """Partitioned, resumable export of a collection's ``_id`` values.
+
+    The collection key space is split into :attr:`partitions` contiguous
+    key ranges.  Each range is paged concurrently in its own thread via
+    key-cursor AQL queries (``FILTER d._key > @after SORT d._key LIMIT
+    @batch_size``) that are served by the primary index.
+
+    If a :attr:`checkpoint` file is provided then the last key exported
+    per partition is saved after each batch is consumed.  A subsequent
+    export against the same checkpoint resumes where it stopped.  The
+    checkpoint is removed once the export completes.
+
+    .. attribute:: store
+        the :class:`domain_intel.Store` instance to export from
+
+    .. attribute:: collection_name
+        name of the collection to export
+
+    .. attribute:: partitions
+        number of key ranges to export concurrently
+
+    .. attribute:: batch_size
+        number of ``_id`` values fetched per query
+
+    .. attribute:: checkpoint
+        path to the checkpoint file (or ``None`` to disable)
+
+    """
+    def __init__(self,
+                 store,
+                 collection_name,
+                 partitions=None,
+                 batch_size=None,
+                 checkpoint=None):
+        self.__store = store
+        self.__collection_name = collection_name
+
+        if partitions is None:
+            partitions = CONFIG.get('arango_export_partitions', 4)
+        self.__partitions = max(int(partitions), 1)
+
+        if batch_size is None:
+            batch_size = CONFIG.get('arango_export_batch_size', 1000)
+        self.__batch_size = int(batch_size)
+
+        self.__checkpoint = checkpoint
+        self.__ranges = None
+
+    @property
+    def store(self):
+        """:attr:`store`
+        """
+        return self.__store
+
+    @property
+    def collection_name(self):
+        """:attr:`collection_name`
+        """
+        return self.__collection_name
+
+    @property
+    def partitions(self):
+        """:attr:`partitions`
+        """
+        return self.__partitions
+
+    @property
+    def batch_size(self):
+        """:attr:`batch_size`
+        """
+        return self.__batch_size
+
+    @property
+    def checkpoint(self):
+        """:attr:`checkpoint`
+        """
+        return self.__checkpoint
+
+    @property
+    def ranges(self):
+        """Key range state for each partition in the form::
+
+            [
+                {
+                    'lower': <inclusive_lower_key_or_None>,
+                    'upper': <exclusive_upper_key_or_None>,
+                    'after': <last_key_exported_or_None>,
+                    'done': <Boolean>,
+                },
+                ...
+            ]
+
+        Sourced from the :attr:`checkpoint` if one exists for
+        :attr:`collection_name`.
+
+        """
+        if self.__ranges is None:
+            self.__ranges = self.load_checkpoint()
+
+        if self.__ranges is None:
+            boundaries = [None] + self.key_boundaries() + [None]
+            self.__ranges = []
+            for lower, upper in zip(boundaries[:-1], boundaries[1:]):
+                self.__ranges.append({
+                    'lower': lower,
+                    'upper': upper,
+                    'after': None,
+                    'done': False,
+                })
+
+        return self.__ranges
+
+    def key_boundaries(self):
+        """Split the collection key space into :attr:`partitions`
+        ranges of roughly equal document counts.
+
+        Returns:
+            sorted list of the keys that start each partition (excluding
+            the first partition)
+
+        """
+        count = self.store.get_collection_count(self.collection_name) or 0
+        step = count // self.partitions
+
+        boundaries = []
+        if step:
+            for index in range(1, self.partitions):
+                bind_vars = {
+                    '@collection': self.collection_name,
+                    'offset': index * step,
+                }
+                keys = list(self.store.aql(BOUNDARY_QUERY, bind_vars))
+                if keys and keys[0] not in boundaries:
+                    boundaries.append(keys[0])
+
+        log.debug('Collection "%s" export key boundaries: %s',
+                  self.collection_name, boundaries)
+
+        return boundaries
+
+    def range_query(self, key_range):
+        """Build the AQL query and bind variables that fetch the next
+        batch of ``_id`` values in *key_range*.
+
+        Returns:
+            tuple of the form (<query>, <bind_vars>)
+
+        """
+        filters = []
+        bind_vars = {
+            '@collection': self.collection_name,
+            'batch_size': self.batch_size,
+        }
+        if key_range.get('after') is not None:
+            filters.append('d._key > @after')
+            bind_vars['after'] = key_range['after']
+        elif key_range.get('lower') is not None:
+            filters.append('d._key >= @lower')
+            bind_vars['lower'] = key_range['lower']
+
+        if key_range.get('upper') is not None:
+            filters.append('d._key < @upper')
+            bind_vars['upper'] = key_range['upper']
+
+        query = ['FOR d IN @@collection']
+        if filters:
+            query.append('    FILTER {}'.format(' AND '.join(filters)))
+        query.extend(['    SORT d._key',
+                      '    LIMIT @batch_size',
+                      '    RETURN d._id'])
+
+        return ('\n'.join(query), bind_vars)
+
+    def __fetch(self, index, batches, stop):
+        """Partition *index* worker that pages through its key range
+        and pushes ``(index, ids)`` tuples onto the *batches* queue.  A
+        short ``ids`` batch flags the end of the partition.  Exceptions
+        are pushed onto *batches* for the consumer to raise.
+
+        """
+        key_range = dict(self.ranges[index])
+        try:
+            while not key_range['done'] and not stop.is_set():
+                query, bind_vars = self.range_query(key_range)
+                ids = list(self.store.aql(query, bind_vars, self.batch_size))
+                if ids:
+                    key_range['after'] = ids[-1].split('/', 1)[1]
+                if len(ids) < self.batch_size:
+                    key_range['done'] = True
+
+                while not stop.is_set():
+                    try:
+                        batches.put((index, ids), timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as err: # pylint: disable=broad-except
+            batches.put((index, err))
+
+    def __iter__(self):
+        """Stream the exported ``_id`` values across all partitions.
+
+        """
+        pending = [i for i, x in enumerate(self.ranges) if not x['done']]
+        log.info('Exporting collection "%s" across %d partitions',
+                 self.collection_name, len(pending))
+
+        batches = queue.Queue(maxsize=self.partitions * 2)
+        stop = threading.Event()
+        for index in pending:
+            worker = threading.Thread(target=self.__fetch,
+                                      args=(index, batches, stop))
+            worker.daemon = True
+            worker.start()
+
+        try:
+            active = set(pending)
+            while active:
+                index, ids = batches.get()
+                if isinstance(ids, Exception):
+                    raise ids
+
+                for _id in ids:
+                    yield _id
+
+                key_range = self.ranges[index]
+                if ids:
+                    key_range['after'] = ids[-1].split('/', 1)[1]
+                if len(ids) < self.batch_size:
+                    key_range['done'] = True
+                    active.discard(index)
+                self.save_checkpoint()
+        finally:
+            stop.set()
+
+        self.remove_checkpoint()
+
+    def load_checkpoint(self):
+        """Source the partition key ranges from :attr:`checkpoint`.
+
+        Returns:
+            list of key ranges as per :attr:`ranges` or ``None`` if the
+            checkpoint does not exist or is for another collection
+
+        """
+        ranges = None
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            with io.open(self.checkpoint, encoding='utf-8') as _fh:
+                state = json.loads(_fh.read())
+
+            if state.get('collection') == self.collection_name:
+                log.info('Resuming collection "%s" export from checkpoint %s',
+                         self.collection_name, self.checkpoint)
+                ranges = state.get('ranges')
+
+        return ranges
+
+    def save_checkpoint(self):
+        """Write the current key range state to :attr:`checkpoint`.
+
+        """
+        if self.checkpoint is None:
+            return
+
+        state = {
+            'collection': self.collection_name,
+            'ranges': self.ranges,
+        }
+        tmp_checkpoint = '{}.tmp'.format(self.checkpoint)
+        with io.open(tmp_checkpoint, 'w', encoding='utf-8') as _fh:
+            _fh.write(u'{}'.format(json.dumps(state)))
+        os.rename(tmp_checkpoint, self.checkpoint)
+
+    def remove_checkpoint(self):
+        """Remove :attr:`checkpoint` on export completion.
+
+        """
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            log.info('Export complete: removing checkpoint %s',
+                     self.checkpoint)
+            os.remove(self.checkpoint)
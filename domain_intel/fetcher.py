@@ -0,0 +1,141 @@
+""":class:`Fetcher`
+
+"""
+import threading
+import collections
+from future.moves import queue
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+
+class Fetcher(object):
+    """Thread pool that keeps up to :attr:`max_in_flight` blocking
+    *call* invocations running at once.
+
+    :meth:`map` hands each item to the pool and yields the results in
+    the order that the items were read, so that a stage can commit its
+    consumer offsets once the batch has been yielded.  Threads are
+    started on first use and are private to the process that started
+    them.
+
+    .. attribute:: call
+        the callable run against each item
+
+    .. attribute:: max_in_flight
+        number of calls that can run concurrently
+
+    """
+    def __init__(self, call, max_in_flight=None):
+        self.__call = call
+
+        if max_in_flight is None:
+            max_in_flight = CONFIG.get('awis', {}).get('max_in_flight', 4)
+        self.__max_in_flight = max(int(max_in_flight), 1)
+
+        self.__tasks = queue.Queue()
+        self.__threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def call(self):
+        """:attr:`call`
+        """
+        return self.__call
+
+    @property
+    def max_in_flight(self):
+        """:attr:`max_in_flight`
+        """
+        return self.__max_in_flight
+
+    def __work(self):
+        """Pool thread that runs :attr:`call` against each queued item
+        and puts the result (or exception) on the item's result queue.
+
+        """
+        while True:
+            task = self.__tasks.get()
+            if task is None:
+                break
+
+            item, result = task
+            try:
+                result.put((self.call(item), None))
+            except Exception as err: # pylint: disable=broad-except
+                result.put((None, err))
+
+    def __start(self):
+        if self.__threads:
+            return
+
+        log.debug('Starting fetcher with %d calls in flight',
+                  self.max_in_flight)
+        for _ in range(self.max_in_flight):
+            thread = threading.Thread(target=self.__work)
+            thread.daemon = True
+            thread.start()
+            self.__threads.append(thread)
+
+    def submit(self, item):
+        """Queue *item* for :attr:`call`.
+
+        Returns:
+            a :class:`queue.Queue` that receives a single (<result>,
+            <exception>) tuple
+
+        """
+        self.__start()
+
+        result = queue.Queue(maxsize=1)
+        self.__tasks.put((item, result))
+
+        return result
+
+    def map(self, items):
+        """Run :attr:`call` against each of *items* with up to
+        :attr:`max_in_flight` calls running at once.  *items* is read
+        lazily so that no more than :attr:`max_in_flight` items are
+        read ahead of the results.
+
+        An exception raised by :attr:`call` is raised in the caller once
+        its item's turn comes.
+
+        Returns:
+            (<item>, <result>) tuples in the order of *items* as a
+            generator
+
+        """
+        pending = collections.deque()
+        for item in items:
+            pending.append((item, self.submit(item)))
+            if len(pending) >= self.max_in_flight:
+                yield self.__result(*pending.popleft())
+
+        while pending:
+            yield self.__result(*pending.popleft())
+
+    @staticmethod
+    def __result(item, result):
+        value, err = result.get()
+        if err is not None:
+            raise err
+
+        return (item, value)
+
+    def close(self):
+        """Stop the pool threads once the queued calls are complete.
+
+        """
+        for _ in self.__threads:
+            self.__tasks.put(None)
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
@@ -2,9 +2,11 @@ from __future__ import print_function, unicode_literals
 from future.utils import raise_from
 import requests
 import json
-import pickle
 from logga import log
 
+import domain_intel.utils
+import domain_intel.envelope
+
 
 class CheckHostNetError(Exception):
     pass
@@ -20,9 +22,17 @@ class CheckHostNetResult(object):
 
     @classmethod
     def from_serialised(cls, serialised):
-        """load from pickle bytestring, as serialised by marshal()"""
-        raw = pickle.loads(serialised)
-        return cls(**raw)
+        """load from envelope bytestring, as serialised by marshal()"""
+        envelope = domain_intel.envelope.decode(serialised)
+        if envelope.schema != "checkhostnet":
+            raise CheckHostNetError("not a checkhostnet envelope: %s" % (envelope.schema,))
+
+        raw = envelope.payload
+        return cls(
+            check_result=raw["check_result"].encode("latin-1"),
+            results_result=raw["results_result"].encode("latin-1"),
+            domain=raw["domain"],
+        )
 
     def parsed_results_result(self):
         return self._parse_results_result(self.results_result)
@@ -54,15 +64,17 @@ class CheckHostNetResult(object):
             return "domain: %s, contents could not be decoded" % (self.domain)
 
     def marshal(self):
-        """return results as raw byte strings, encoded into a pickle byte string.
-        using pickle here so as to avoid forcing a string encoding on the contents."""
-        return pickle.dumps(
-            obj={
+        """return results wrapped in a domain_intel.envelope byte string.
+        the raw byte string results are carried as latin-1 so as to avoid
+        forcing a string encoding on the contents."""
+        return domain_intel.envelope.encode(
+            "checkhostnet",
+            {
                 "domain": self.domain,
-                "check_result": self.check_result,
-                "results_result": self.results_result,
+                "check_result": self.check_result.decode("latin-1"),
+                "results_result": self.results_result.decode("latin-1"),
             },
-            protocol=2
+            key=domain_intel.utils.domain_key(self.domain),
         )
 
     def __eq__(self, other):
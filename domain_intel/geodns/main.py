@@ -2,10 +2,11 @@ from __future__ import print_function, unicode_literals
 from future.utils import raise_from
 from past.builtins import basestring
 from domain_intel.geodns import CompassHTTPResolver, CheckHostNet, CheckHostNetResult, CompassServerEmptyResponse
-import json
 import six
 from logga import log
 
+import domain_intel.envelope
+
 
 class GeoDNSError(Exception):
     pass
@@ -148,17 +149,20 @@ class GeoDNS(object):
 class ParsedDNS(dict):
     """bit of a cop out. wraps the parsed dns results coming from parse_checkhostnetresult.
     doesnt really provide any functionality other than packing/unpacking"""
+    SCHEMA = "dns"
+
     def marshal(self):
-        """return self as byte string of json encoding"""
-        return json.dumps(self).encode("utf-8")
+        """return self wrapped in a domain_intel.envelope byte string"""
+        return domain_intel.envelope.encode(self.SCHEMA, dict(self))
 
     @classmethod
     def from_serialised(cls, serialised):
-        """load from serialised json bytestring, as serialised by marshal()"""
-        raw = json.loads(serialised.decode("utf-8"))
+        """load from envelope bytestring, as serialised by marshal(). legacy
+        json bytestrings are also accepted"""
+        raw = domain_intel.envelope.loads(serialised)
         return cls(**raw)
 
 
 class ParsedGeoDNS(ParsedDNS):
     """see ParsedDNS"""
-    pass
+    SCHEMA = "geodns"
@@ -6,13 +6,16 @@ import time
 import signal
 import os
 import errno
-import multiprocessing
 import unicodedata
 from logga import log
 
 import domain_intel.utils
 import domain_intel.parser
+import domain_intel.envelope
 import domain_intel.common
+import domain_intel.workerpool
+from domain_intel.pipeline.committer import OffsetCommitter
+from domain_intel.pipeline.producer import TrackedProducer
 from domain_intel.geodns import GeoDNS, GeoDNSError, CheckHostNetError, CompassServerError
 
 
@@ -40,9 +43,12 @@ class GeoDNSStage(object):
             kafka_producer_factory=None,
             max_read_count=None,
             dry=False,
+            bulk=False,
             dump=None,
             retryable_exceptions=None,
-            retryable_exceptions_count=10
+            retryable_exceptions_count=10,
+            replay=None,
+            daemon=False
     ):
         self.metrics = Counter()
         self.worker = worker
@@ -52,7 +58,12 @@ class GeoDNSStage(object):
         self.kafka_consumer_group_id = kafka_consumer_group_id
         self.kafka_producer_topics = kafka_producer_topics
         self.dry = dry
+        self.bulk = bulk
         self.dump = dump
+        # optional domain_intel.pipeline.replay.ReplayWindow
+        self.replay = replay
+        # keep consuming while idle until a drain signal
+        self.daemon = daemon
 
         if self.dump:
             for dir in ( dump, os.path.join(dump, DUMP_PUBLISH), os.path.join(dump, DUMP_CONSUME) ):
@@ -104,11 +115,17 @@ class GeoDNSStage(object):
                 else:
                     k_timeout = (5 * 60 * 1000)
 
+                # replay consumers are assigned partitions outside of
+                # any consumer group
+                group_id = self.kafka_consumer_group_id
+                if self.replay is not None:
+                    group_id = None
+
                 # side step context manager, must close explicitly now
                 self.kafka_consumer = domain_intel.utils._safe_consumer(
                     # topic can take a list of topics or scalar
                     topic=self.kafka_consumer_topics,
-                    group_id=self.kafka_consumer_group_id,
+                    group_id=group_id,
                     enable_auto_commit=False,
                     bootstrap_servers=self.bootstrap_servers,
                     session_timeout_ms=k_timeout,
@@ -124,14 +141,18 @@ class GeoDNSStage(object):
                     bootstrap_servers=self.bootstrap_servers,
                 )
 
+            # failed sends abort the offset commit on flush
+            self.kafka_producer = TrackedProducer(self.kafka_producer)
+
     def _do_dump(self, payload, offset, subdir):
         log.debug("DUMPING TO %s/%s/%s with value: %s", self.dump, subdir, offset, payload)
         with open("%s/%s/%s" % (self.dump, subdir, offset), "wb") as _fh:
             _fh.write(payload)
 
-    def publish(self, payloads):
+    def publish(self, payloads, key=None):
         """publish arbitrary data into producer. use case would be if
-        this is the first stage in a pipeline and doesnt read from anywhere"""
+        this is the first stage in a pipeline and doesnt read from anywhere.
+        optional *key* callable derives the message key from each payload"""
 
         if not self.is_producer:
             raise GeoDNSError("cannot publish without > 0 topics")
@@ -143,7 +164,11 @@ class GeoDNSStage(object):
             log.debug("publishing %s", payload)
             for dest_topic in self.kafka_producer_topics:
                 if not self.dry:
-                    self.kafka_producer.send(dest_topic, value=payload)
+                    self.kafka_producer.send(
+                        dest_topic,
+                        value=payload,
+                        key=key(payload) if key is not None else None,
+                    )
                 else:
                     log.debug("%s: %s", dest_topic, payload)
                     if self.dump:
@@ -165,7 +190,7 @@ class GeoDNSStage(object):
         # we must validate that we have what we need.
         # this is not done in the constructor to support special case stages
         # i.e. root and final leaf node
-        if self.kafka_consumer_group_id is None:
+        if self.kafka_consumer_group_id is None and self.replay is None:
             raise GeoDNSError("will not accept null kafka_consumer_group_id. set one if you are consuming")
 
         if self.worker is None:
@@ -174,10 +199,19 @@ class GeoDNSStage(object):
         if not self.is_producer and self.is_consumer:
             raise GeoDNSError("cannot call run() without input and output topics")
 
-        self.kafka_consumer.subscribe(self.kafka_consumer_topics)
+        # offsets are committed in batches once the producer sends of
+        # the processed messages have been acknowledged.  replays
+        # read a bounded window and commit nothing.
+        committer = None
+        if self.replay is not None:
+            self.replay.assign(self.kafka_consumer, self.kafka_consumer_topics)
+        else:
+            self.kafka_consumer.subscribe(self.kafka_consumer_topics)
+            committer = OffsetCommitter(self.kafka_consumer,
+                                        flush=[self.kafka_producer.flush])
 
         metrics = self.metrics
-        for msg in self.kafka_consumer:
+        for msg in self._messages(self.kafka_consumer, committer):
             metrics["messages_received"] += 1
 
             if self.dump:
@@ -218,22 +252,84 @@ class GeoDNSStage(object):
                 metrics["messages_sent"] += 1
 
                 if not self.dry:
-                    self.kafka_producer.send(dest_topic, value=res)
+                    self.kafka_producer.send(dest_topic, value=res, key=msg.key)
                 else:
                     log.debug("%s: %s", dest_topic, res)
                     if self.dump:
                         self._do_dump(res, "%d.%d" % (metrics["messages_received"], metrics["messages_sent"]), DUMP_PUBLISH)
 
-            self.kafka_producer.flush()
-            self.kafka_consumer.commit()
+            if committer is not None:
+                committer.processed([msg])
 
             log.debug(metrics)
 
             if self.max_read_count is not None and metrics["messages_received"] >= self.max_read_count:
                 break
 
+        if committer is not None:
+            committer.close()
+
         return metrics
 
+    def _messages(self, consumer, committer=None, idle=None):
+        """iterate over *consumer* messages. under a replay window,
+        messages past the upper bound are dropped and iteration stops once
+        all assigned partitions are complete. in daemon mode iteration
+        backs off while idle and only stops on a drain signal. the *idle*
+        callables are invoked whenever the consumer goes idle"""
+        if self.replay is None:
+            with domain_intel.workerpool.drain_on_signals():
+                for msg in self._daemon_messages(consumer, committer, idle):
+                    yield msg
+            return
+
+        if self.replay.done(consumer):
+            return
+
+        for msg in consumer:
+            domain_intel.workerpool.heartbeat()
+            if self.replay.within(msg):
+                yield msg
+
+            if self.replay.done(consumer):
+                log.info("replay upper bound reached")
+                break
+
+    def _daemon_messages(self, consumer, committer=None, idle=None):
+        """iterate over *consumer* messages until the consumer times out,
+        or in daemon mode, until a drain is requested. the *idle* callables
+        are invoked and the processed offsets are committed via *committer*
+        before each idle back off"""
+        backoff = float(domain_intel.common.CONFIG.get("daemon_idle_backoff", 1.0))
+        max_backoff = float(domain_intel.common.CONFIG.get("daemon_max_idle_backoff", 30.0))
+
+        idle_polls = 0
+        while not domain_intel.workerpool.draining():
+            domain_intel.workerpool.heartbeat()
+            for msg in consumer:
+                domain_intel.workerpool.heartbeat()
+                idle_polls = 0
+                yield msg
+                if domain_intel.workerpool.draining():
+                    break
+            else:
+                if not self.daemon:
+                    break
+
+                for callback in idle or []:
+                    callback()
+
+                if committer is not None:
+                    committer.commit()
+
+                delay = min(backoff * 2 ** min(idle_polls, 16), max_backoff)
+                log.debug("consumer idle for %d polls: backing off %.1fs", idle_polls, delay)
+                domain_intel.workerpool.wait(delay)
+                idle_polls += 1
+
+        if domain_intel.workerpool.draining():
+            log.info("drain requested - exiting")
+
     def persist(self):
         """Persist flattened (processed) GeoDNS data to ArangoDB.
 
@@ -245,26 +341,30 @@ class GeoDNSStage(object):
         The :attr:`dry` flag will simulate execution.  No records will be
         published.
 
+        The :attr:`bulk` flag buffers the inserts through
+        :meth:`domain_intel.Store.bulk_writer`.  The buffers are flushed
+        before each offset commit and, in daemon mode, whenever the
+        consumer goes idle.
+
         Returns:
             total count of records written to the DB across all workers
 
         """
-        count_q = multiprocessing.Queue()
-
         target = self.persist_worker
         args = (
-            count_q,
             self.max_read_count,
             self.kafka_consumer_topics[0],
             self.kafka_consumer_group_id
         )
-        kwargs = {'dry': self.dry}
-        threads = domain_intel.common.CONFIG.get('threads', 1)
-        domain_intel.utils.threader(threads, target, *args, **kwargs)
+        kwargs = {'dry': self.dry, 'bulk': self.bulk}
+        pool = domain_intel.workerpool.WorkerPool(target,
+                                                  args,
+                                                  kwargs,
+                                                  stage='geodns-persist')
 
         total_count = 0
-        while not count_q.empty():
-            total_count += count_q.get()
+        for count in pool.run():
+            total_count += count
 
         log.debug('Persisted GeoDNS total count %d', total_count)
 
@@ -275,18 +375,19 @@ class GeoDNSStage(object):
                        max_read_count,
                        topic,
                        group_id,
-                       dry=False):
+                       dry=False,
+                       bulk=False):
         """Persist flattened (processed) GeoDNS domain data to ArangoDB
         worker.
 
         As this is a worker that could be part of a set of executing
         threads, the number of messages read is pushed onto the
-        :class:`multiprocessing.Queue` *queue*.
+        :class:`domain_intel.workerpool.WorkerChannel` *queue*.
 
         The parameter list is as per :meth:`persist`.
 
         Returns:
-            updated :class:`multiprocessing.Queue` *queue* instance
+            updated *queue* result channel
             with number of records processed
         """
         log.debug('Data persist worker set to read %s messages',
@@ -294,42 +395,62 @@ class GeoDNSStage(object):
         timeout = domain_intel.common.CONFIG.get('timeout', 10000)
         log.debug('Persist worker timeout set to %d', timeout)
 
-        store = domain_intel.Store()
+        store = domain_intel.store.get_store()
 
         kafka_config = domain_intel.common.CONFIG.get('kafka', {})
         kwargs = {
             'bootstrap_servers': kafka_config.get('bootstrap_servers'),
             'group_id': group_id,
             'consumer_timeout_ms': timeout,
+            'enable_auto_commit': False,
         }
-        with domain_intel.utils.safe_consumer(topic, **kwargs) as consumer:
-            messages_read = 0
-            for message in consumer:
-                messages_read += 1
-
-                dns_data = message.value.decode('utf-8')
-                parser = domain_intel.parser.GeoDNS(dns_data)
-                store.collection_insert('geodns',
-                                        parser.db_geodns_raw(),
-                                        dry)
-
-                for ipv4 in parser.db_ipv4_vertex:
-                    store.collection_insert('ipv4', ipv4, dry)
-
-                for ipv6 in parser.db_ipv6_vertex:
-                    store.collection_insert('ipv6', ipv6, dry)
-
-                for ipv4_edge in parser.db_ipv4_edge:
-                    store.edge_insert('ipv4_resolves', ipv4_edge, dry)
-
-                for ipv6_edge in parser.db_ipv6_edge:
-                    store.edge_insert('ipv6_resolves', ipv6_edge, dry)
-
-                if (max_read_count is not None and
-                        messages_read >= max_read_count):
-                    log.info('Maximum read threshold %d breached - exiting',
-                             max_read_count)
-                    break
+        if self.replay is not None:
+            consumer_context = self.replay.consumer(topic, **kwargs)
+        else:
+            consumer_context = domain_intel.utils.safe_consumer(topic, **kwargs)
+
+        with store.bulk_writer(enabled=bulk) as writer:
+            with consumer_context as consumer:
+                flush = idle = None
+                if writer is not None:
+                    flush = [writer.flush]
+                    idle = [writer.flush_stale]
+                committer = None
+                if self.replay is None:
+                    committer = OffsetCommitter(consumer, flush=flush)
+                messages_read = 0
+                for message in self._messages(consumer, committer, idle):
+                    messages_read += 1
+
+                    dns_data = domain_intel.envelope.loads(message.value)
+                    parser = domain_intel.parser.GeoDNS(dns_data)
+                    store.collection_insert('geodns',
+                                            parser.db_geodns_raw(),
+                                            dry)
+
+                    for ipv4 in parser.db_ipv4_vertex:
+                        store.collection_insert('ipv4', ipv4, dry)
+
+                    for ipv6 in parser.db_ipv6_vertex:
+                        store.collection_insert('ipv6', ipv6, dry)
+
+                    for ipv4_edge in parser.db_ipv4_edge:
+                        store.edge_insert('ipv4_resolves', ipv4_edge, dry)
+
+                    for ipv6_edge in parser.db_ipv6_edge:
+                        store.edge_insert('ipv6_resolves', ipv6_edge, dry)
+
+                    if committer is not None:
+                        committer.processed([message])
+
+                    if (max_read_count is not None and
+                            messages_read >= max_read_count):
+                        log.info('Maximum read threshold %d breached - exiting',
+                                 max_read_count)
+                        break
+
+                if committer is not None:
+                    committer.close()
 
         log.debug('Data persist worker domains read %d', messages_read)
 
@@ -351,7 +472,8 @@ def load_domains_from_file(filename, **kwargs):
             for line in _fh:
                 yield line.rstrip()
 
-    metrics = stage.publish(_chomped_lines(filename))
+    metrics = stage.publish(_chomped_lines(filename),
+                            key=domain_intel.utils.domain_key)
     log.info("finished loading domains from %s to %s with %s", stage.kafka_producer_topics, filename, metrics)
 
     return metrics
@@ -43,7 +43,7 @@ def test_resolve_dns_fullstructure(mock_session):
 
     # response should be correct container type
     assert isinstance(response, geodns.CheckHostNetResult), "resolve_dns(domain) should return CheckHostNetResult"
-    # response should be serialisable with pickle
+    # response should be serialisable
     assert len(response.marshal()) > 0, "resolve_dns(domain) should return serialisable result of len > 0"
 
     # response should roundtrip through serialisation to the same (looking) object
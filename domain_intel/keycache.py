@@ -0,0 +1,162 @@
+""":class:`KeyCache`
+
+"""
+import collections
+import itertools
+import threading
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+
+class KeyCache(object):
+    """Exact, size-bounded LRU set of the document keys known to exist
+    per collection.  Used by the store to short-circuit inserts of
+    shared vertices (for example, ``country``, ``ipv4``, ``url`` and
+    ``link``) that have already been written.
+
+    An exact set is used rather than a Bloom filter as a false positive
+    would silently skip an insert of a new document.  A miss only costs
+    the insert that would have happened anyway.
+
+    Each collection's set is seeded on first use from *seeder*, a
+    callable that takes a collection name and returns an iterable of
+    document ``_id`` values (such as
+    :meth:`domain_intel.Store.export_ids`).
+
+    .. attribute:: collections
+        names of the collections to track.  Keys for other collections
+        are never cached
+
+    .. attribute:: size
+        maximum number of keys held per collection
+
+    .. attribute:: report_interval
+        number of lookups between :meth:`report` log summaries
+
+    .. attribute:: counts
+        per-collection :class:`collections.Counter` of ``hits``,
+        ``misses`` and ``evictions``
+
+    """
+    def __init__(self,
+                 collections_to_track,
+                 size=None,
+                 seeder=None,
+                 report_interval=None):
+        self.__collections = list(collections_to_track)
+
+        if size is None:
+            size = CONFIG.get('known_keys_size', 100000)
+        self.__size = int(size)
+
+        if report_interval is None:
+            report_interval = CONFIG.get('known_keys_report_interval', 10000)
+        self.__report_interval = int(report_interval)
+        self.__lookups = 0
+
+        self.__seeder = seeder
+        self.__keys = {}
+        self.__lock = threading.Lock()
+        self.__counts = collections.defaultdict(collections.Counter)
+
+    @property
+    def collections(self):
+        """:attr:`collections`
+        """
+        return self.__collections
+
+    @property
+    def size(self):
+        """:attr:`size`
+        """
+        return self.__size
+
+    @property
+    def report_interval(self):
+        """:attr:`report_interval`
+        """
+        return self.__report_interval
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def __lru(self, collection_name):
+        """The LRU key set for *collection_name*.  Seeded on first use.
+
+        """
+        if collection_name not in self.__keys:
+            self.__keys[collection_name] = collections.OrderedDict()
+            if self.__seeder is not None:
+                ids = itertools.islice(self.__seeder(collection_name),
+                                       self.size)
+                for _id in ids:
+                    key = _id.split('/', 1)[-1]
+                    self.__keys[collection_name][key] = None
+                log.info('Seeded %d known "%s" keys',
+                         len(self.__keys[collection_name]), collection_name)
+
+        return self.__keys[collection_name]
+
+    def seen(self, collection_name, key):
+        """Check if *key* is known to exist in *collection_name*.
+
+        Returns:
+            Boolean ``True`` if *key* is known.  ``False`` otherwise
+
+        """
+        if collection_name not in self.collections or key is None:
+            return False
+
+        with self.__lock:
+            keys = self.__lru(collection_name)
+            status = key in keys
+            if status:
+                keys.pop(key)
+                keys[key] = None
+                self.counts[collection_name]['hits'] += 1
+            else:
+                self.counts[collection_name]['misses'] += 1
+            self.__lookups += 1
+
+        if self.report_interval and self.__lookups % self.report_interval == 0:
+            self.report()
+
+        return status
+
+    def add(self, collection_name, key):
+        """Record that *key* exists in *collection_name*.  The least
+        recently used key is evicted once :attr:`size` is breached.
+
+        """
+        if collection_name not in self.collections or key is None:
+            return
+
+        with self.__lock:
+            keys = self.__lru(collection_name)
+            keys.pop(key, None)
+            keys[key] = None
+            if len(keys) > self.size:
+                keys.popitem(last=False)
+                self.counts[collection_name]['evictions'] += 1
+
+    def report(self):
+        """Log the per-collection hit rate.
+
+        Returns:
+            dictionary of per-collection :attr:`counts`
+
+        """
+        for name, counts in sorted(self.counts.items()):
+            lookups = counts['hits'] + counts['misses']
+            log.info('Known "%s" keys hit|miss|evictions %d|%d|%d (%.1f%%)',
+                     name, counts['hits'], counts['misses'],
+                     counts['evictions'],
+                     100.0 * counts['hits'] / lookups if lookups else 0)
+
+        return dict(self.counts)
@@ -22,10 +22,15 @@ class GeoDNS(object):
     def __init__(self, raw_data):
         """Break down *raw_data* JSON construct into various components
         that can be used to persist records in the Domain Intel data model.
+        *raw_data* can also be the equivalent decoded dictionary.
 
         """
-        self.__raw = raw_data
-        self.__data = json.loads(self.__raw)
+        if isinstance(raw_data, dict):
+            self.__raw = json.dumps(raw_data)
+            self.__data = raw_data
+        else:
+            self.__raw = raw_data
+            self.__data = json.loads(self.__raw)
         self.__domain = GeoDNS._get_domain(self.__data)
         self.__dns_results = self.__data.get('dns_results', {})
         self.__geog_results = self.__data.get('geog_results', {})
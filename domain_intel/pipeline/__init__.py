@@ -1,9 +1,15 @@
 """Domain Intel pipeline class :class:`domain_intel.Pipeline`
 """
 import sys
-import io
+import time
+import contextlib
 import domain_intel.utils
 import domain_intel.common
+import domain_intel.store
+import domain_intel.workerpool
+from domain_intel.pipeline.committer import OffsetCommitter
+from domain_intel.pipeline.producer import TrackedProducer
+from domain_intel.pipeline.reload import mapped_file
 
 from logga import log
 
@@ -19,17 +25,54 @@ class Pipeline(object):
     .. attribute:: threads
         number of workers to spawn to leverage parallelisation
 
+    .. attribute:: max_poll_records
+        maximum number of records returned by a single consumer poll
+
+    .. attribute:: poll_timeout
+        number of milliseconds a single consumer poll blocks while
+        waiting for records
+
+    .. attribute:: auto_commit
+        flag that the Kafka consumer commits offsets in the background.
+        Defaults to ``False`` so that offsets are only committed by
+        :meth:`batches` once the records have been processed
+
     .. attribute:: store
         reference to the persistent store
 
+    .. attribute:: replay
+        optional :class:`domain_intel.pipeline.replay.ReplayWindow` that
+        bounds consumption to an offset or timestamp range of the topic
+        outside of any consumer group
+
+    .. attribute:: daemon
+        flag that consumers stay subscribed while idle rather than exit
+        after :attr:`timeout` milliseconds without records
+
+    .. attribute:: idle_backoff
+        initial number of seconds to back off between idle polls in
+        :attr:`daemon` mode
+
+    .. attribute:: max_idle_backoff
+        maximum number of seconds to back off between idle polls in
+        :attr:`daemon` mode
+
     """
     def __init__(self):
         kafka_conf = CONFIG.get('kafka')
         self.__bs_servers = kafka_conf.get('bootstrap_servers')
         self.__timeout = int(kafka_conf.get('timeout', 10000))
+        self.__max_poll_records = int(kafka_conf.get('max_poll_records', 500))
+        self.__poll_timeout = int(kafka_conf.get('poll_timeout', 1000))
+        self.__auto_commit = kafka_conf.get('enable_auto_commit', False)
         self.__threads = CONFIG.get('threads')
+        self.__idle_backoff = float(CONFIG.get('daemon_idle_backoff', 1.0))
+        self.__max_idle_backoff = float(CONFIG.get('daemon_max_idle_backoff',
+                                                   30.0))
         self.__api = None
         self.__store = None
+        self.__replay = None
+        self.__daemon = False
 
     @property
     def bs_servers(self):
@@ -43,6 +86,24 @@ class Pipeline(object):
         """
         return self.__timeout
 
+    @property
+    def max_poll_records(self):
+        """Maximum number of records per consumer poll.
+        """
+        return self.__max_poll_records
+
+    @property
+    def poll_timeout(self):
+        """Number of milliseconds for a consumer poll to block.
+        """
+        return self.__poll_timeout
+
+    @property
+    def auto_commit(self):
+        """Kafka consumer background offset commit flag.
+        """
+        return self.__auto_commit
+
     @property
     def threads(self):
         """Number of processing threads.
@@ -60,30 +121,224 @@ class Pipeline(object):
         """Handle to the persistent store.
         """
         if self.__store is None:
-            self.__store = domain_intel.Store()
+            self.__store = domain_intel.store.get_store()
 
         return self.__store
 
+    @property
+    def replay(self):
+        """Offset or timestamp bounded replay window.
+        """
+        return self.__replay
+
+    @replay.setter
+    def replay(self, value):
+        self.__replay = value
+
+    @property
+    def daemon(self):
+        """Long running consumer flag.
+        """
+        return self.__daemon
+
+    @daemon.setter
+    def daemon(self, value):
+        self.__daemon = value
+
+    @property
+    def idle_backoff(self):
+        """Initial number of seconds between idle daemon polls.
+        """
+        return self.__idle_backoff
+
+    @property
+    def max_idle_backoff(self):
+        """Maximum number of seconds between idle daemon polls.
+        """
+        return self.__max_idle_backoff
+
+    def idle(self, idle_polls):
+        """Back off after *idle_polls* consecutive empty :attr:`daemon`
+        polls.  The delay doubles with each empty poll from
+        :attr:`idle_backoff` up to :attr:`max_idle_backoff` seconds and is
+        cut short by a drain request.
+
+        Returns:
+            Boolean ``True`` if a drain has been requested
+
+        """
+        delay = min(self.idle_backoff * 2 ** min(idle_polls, 16),
+                    self.max_idle_backoff)
+        log.debug('Consumer idle for %d polls: backing off %.1fs',
+                  idle_polls, delay)
+
+        return domain_intel.workerpool.wait(delay)
+
+    @contextlib.contextmanager
     def producer(self):
         """Wrapper around the :func:`domain_intel.utils.safe_producer`
         with default parameters.
 
+        Yields a :class:`domain_intel.pipeline.producer.TrackedProducer`
+        that bounds the number of in-flight sends.  The delivery counts
+        are final once the context exits.
+
         """
         kwargs = {'bootstrap_servers': self.bs_servers}
-        return domain_intel.utils.safe_producer(**kwargs)
+        with domain_intel.utils.safe_producer(**kwargs) as producer:
+            tracked = TrackedProducer(producer)
+            yield tracked
+
+        tracked.report()
 
     def consumer(self, topic, group_id='default'):
         """Wrapper around the :func:`domain_intel.utils.safe_consumer`
         with default parameters.
 
+        If a :attr:`replay` window is set then the consumer is assigned
+        to the window instead of joining the *group_id* consumer group.
+
         """
         kwargs = {
             'bootstrap_servers': self.bs_servers,
             'group_id': group_id,
             'consumer_timeout_ms': self.timeout,
+            'enable_auto_commit': self.auto_commit,
         }
+        if self.replay is not None:
+            return self.replay.consumer(topic, **kwargs)
+
         return domain_intel.utils.safe_consumer(topic, **kwargs)
 
+    def persist_batches(self, consumer, writer, max_read_count=None):
+        """Batch consumption of *consumer* as per :meth:`batches` for a
+        stage that persists through the bulk *writer* (``None`` if bulk
+        writes are disabled).
+
+        The *writer* buffers are flushed before each offset commit so
+        that the committed offsets never run ahead of the imported
+        documents.  Buffers that have aged beyond the writer's flush
+        interval are flushed on idle polls (see
+        :meth:`domain_intel.bulkwriter.BulkWriter.flush_stale`).
+
+        Returns:
+            generator of :class:`kafka.consumer.fetcher.ConsumerRecord`
+            lists
+
+        """
+        flush = idle = None
+        if writer is not None:
+            flush = [writer.flush]
+            idle = [writer.flush_stale]
+
+        return self.batches(consumer,
+                            max_read_count,
+                            flush=flush,
+                            idle=idle)
+
+    def batches(self,
+                consumer,
+                max_read_count=None,
+                max_records=None,
+                flush=None,
+                idle=None):
+        """Batch consumption of *consumer* via
+        :meth:`kafka.KafkaConsumer.poll`.
+
+        Each poll returns up to *max_records* records (defaults to
+        :attr:`max_poll_records`).  Iteration stops once
+        *max_read_count* records have been returned, no records have
+        arrived within :attr:`timeout` milliseconds (as per the
+        iterator's ``consumer_timeout_ms``) or a worker pool drain has
+        been requested (see :func:`domain_intel.workerpool.draining`).
+        In :attr:`daemon` mode an idle consumer backs off (see
+        :meth:`idle`) and stays subscribed until a drain is requested.
+
+        Polls never return records beyond *max_read_count* so that the
+        consumer position is not advanced past the records returned.
+
+        Under a :attr:`replay` window, records beyond the upper bound of
+        the window are dropped and iteration stops once all assigned
+        partitions have reached the upper bound.  No offsets are
+        committed.
+
+        Unless :attr:`auto_commit` is set, a batch is marked as processed
+        once the caller requests the next batch.  The processed offsets
+        are committed by a
+        :class:`domain_intel.pipeline.committer.OffsetCommitter` after
+        the *flush* callables (for example, :meth:`kafka.KafkaProducer.flush`)
+        have acknowledged the downstream writes.
+
+        The *idle* callables are invoked on each empty poll (for example,
+        :meth:`domain_intel.bulkwriter.BulkWriter.flush_stale`) ahead of
+        any commit of the processed offsets.
+
+        Returns:
+            generator of :class:`kafka.consumer.fetcher.ConsumerRecord`
+            lists
+
+        """
+        if max_records is None:
+            max_records = self.max_poll_records
+
+        committer = None
+        if not self.auto_commit and self.replay is None:
+            committer = OffsetCommitter(consumer, flush)
+
+        records_read = 0
+        idle_since = time.time()
+        idle_polls = 0
+        try:
+            while max_read_count is None or records_read < max_read_count:
+                domain_intel.workerpool.heartbeat()
+                if domain_intel.workerpool.draining():
+                    log.info('Drain requested - exiting')
+                    break
+
+                if self.replay is not None and self.replay.done(consumer):
+                    log.info('Replay upper bound reached - exiting')
+                    break
+
+                limit = max_records
+                if max_read_count is not None:
+                    limit = min(max_records, max_read_count - records_read)
+
+                polled = consumer.poll(timeout_ms=self.poll_timeout,
+                                       max_records=limit)
+                batch = [x for records in polled.values() for x in records]
+                if self.replay is not None:
+                    batch = self.replay.bound(batch)
+                if not batch:
+                    for callback in idle or []:
+                        callback()
+                    if self.daemon and self.replay is None:
+                        if committer is not None:
+                            committer.commit()
+                        if self.idle(idle_polls):
+                            log.info('Drain requested - exiting')
+                            break
+                        idle_polls += 1
+                    elif (time.time() - idle_since) * 1000 >= self.timeout:
+                        log.debug('Consumer idle for %dms - exiting',
+                                  self.timeout)
+                        break
+                    continue
+
+                idle_since = time.time()
+                idle_polls = 0
+                records_read += len(batch)
+                yield batch
+
+                if committer is not None:
+                    committer.processed(batch)
+        finally:
+            if committer is not None:
+                committer.close()
+
+        if max_read_count is not None and records_read >= max_read_count:
+            log.info('Maximum read threshold %d breached - exiting',
+                     max_read_count)
+
     def topic_dump(self,
                    max_read_count=None,
                    topic='wide-column-csv',
@@ -111,16 +366,11 @@ class Pipeline(object):
 
         with self.consumer(topic, group_id) as consumer:
             messages_read = 0
-            for message in consumer:
-                messages_read += 1
-                sys.stdout.buffer.write(message.value)
-                print()
-
-                if (max_read_count is not None and
-                        messages_read >= max_read_count):
-                    log.info('Maximum read threshold %d breached - exiting',
-                             max_read_count)
-                    break
+            for batch in self.batches(consumer, max_read_count):
+                messages_read += len(batch)
+                for message in batch:
+                    sys.stdout.buffer.write(message.value)
+                    print()
 
         return messages_read
 
@@ -128,20 +378,48 @@ class Pipeline(object):
         """Source *target_dir* for files and reload file contents
         into a given Kafka *topic*.
 
+        Each file is published as a single message.  The files are
+        spread across the ``reload`` stage worker pool where each worker
+        memory-maps its files and publishes the raw bytes through its
+        own producer.
+
         Returns:
             number of files read
 
+        """
+        target_files = list(domain_intel.utils.source_files(target_dir))
+        workers = domain_intel.workerpool.stage_workers('reload')
+        workers = max(min(workers, len(target_files)), 1)
+
+        target = self.reload_topic_worker
+        args = (target_files, topic)
+        kwargs = {'workers': workers}
+        pool = domain_intel.workerpool.WorkerPool(target,
+                                                  args,
+                                                  kwargs,
+                                                  stage='reload',
+                                                  workers=workers)
+
+        files_processed = sum(pool.run())
+        log.info('Files reloaded to topic "%s": %d', topic, files_processed)
+
+        return files_processed
+
+    def reload_topic_worker(self, queue, target_files, topic, workers=1):
+        """:meth:`reload_topic` worker.  Publishes every *workers*-th
+        file in *target_files* starting from the worker slot.
+
         """
         files_processed = 0
 
         with self.producer() as producer:
-            for target_file in domain_intel.utils.source_files(target_dir):
-                with io.open(target_file, encoding='utf-8') as _fh:
-                    contents = _fh.read()
-                    producer.send(topic, contents.encode('utf-8'))
-                    files_processed += 1
+            for target_file in target_files[queue.slot::workers]:
+                domain_intel.workerpool.heartbeat()
+                with mapped_file(target_file) as mapped:
+                    producer.send(topic, mapped[:])
+                files_processed += 1
 
-                    if not files_processed % 1000:
-                        log.info('%d files reloaded', files_processed)
+                if not files_processed % 1000:
+                    log.info('%d files reloaded', files_processed)
 
-        return files_processed
+        queue.put(files_processed)
@@ -0,0 +1,279 @@
+""":class:`BatchCoalescer`
+
+"""
+import os
+import time
+import itertools
+import threading
+import contextlib
+import collections
+import multiprocessing
+from logga import log
+
+import domain_intel.common
+import domain_intel.fetcher
+import domain_intel.workerpool
+from domain_intel.awisapi import MAX_BATCH_REQUESTS
+
+try:
+    import queue as Queue
+except ImportError:
+    import Queue
+
+CONFIG = domain_intel.common.CONFIG
+
+# Seconds between checks for a stop request while the dispatcher is idle.
+POLL_INTERVAL = 0.1
+
+# Seconds between worker heartbeats while a submission awaits its
+# acknowledgement.
+ACK_POLL_INTERVAL = 1.0
+
+
+class BatchCoalescer(object):
+    """Pool-wide coalescing of the domains read by the workers of a
+    :class:`domain_intel.WorkerPool` into full AWIS batches.
+
+    Each worker :meth:`submit` s the domains of its consumer batch and
+    blocks until all of them have been dispatched and acknowledged.  A
+    dispatcher thread in the pool process (see :meth:`running`) fills
+    batches of :attr:`batch_size` domains across all workers so that
+    low-volume partitions do not each cost a partial AWIS request.  A
+    partial batch is only dispatched once its oldest domain has waited
+    :attr:`deadline` seconds.
+
+    The coalescer must be created in the pool process before the pool
+    is started so that the workers inherit its queues.
+
+    .. attribute:: workers
+        number of worker slots in the pool
+
+    .. attribute:: batch_size
+        number of domains per dispatch.  Defaults to
+        :data:`domain_intel.awisapi.MAX_BATCH_REQUESTS`
+
+    .. attribute:: deadline
+        seconds that a domain can wait for a batch to fill
+
+    .. attribute:: ack_timeout
+        seconds that a worker waits on the dispatch of its domains
+
+    .. attribute:: counts
+        :class:`collections.Counter` of ``domains``, ``full`` and
+        ``partial`` batches dispatched
+
+    """
+    def __init__(self,
+                 workers,
+                 batch_size=None,
+                 deadline=None,
+                 ack_timeout=None):
+        self.__workers = int(workers)
+
+        if batch_size is None:
+            batch_size = MAX_BATCH_REQUESTS
+        self.__batch_size = int(batch_size)
+
+        if deadline is None:
+            deadline = CONFIG.get('coalesce_deadline', 0.5)
+        self.__deadline = float(deadline)
+
+        if ack_timeout is None:
+            ack_timeout = CONFIG.get('coalesce_ack_timeout', 600.0)
+        self.__ack_timeout = float(ack_timeout)
+
+        self.__requests = multiprocessing.Queue()
+        self.__replies = [multiprocessing.Queue()
+                          for _ in range(self.__workers)]
+        self.__sequence = itertools.count()
+        self.__lock = threading.Lock()
+        self.__counts = collections.Counter()
+
+    @property
+    def workers(self):
+        """:attr:`workers`
+        """
+        return self.__workers
+
+    @property
+    def batch_size(self):
+        """:attr:`batch_size`
+        """
+        return self.__batch_size
+
+    @property
+    def deadline(self):
+        """:attr:`deadline`
+        """
+        return self.__deadline
+
+    @property
+    def ack_timeout(self):
+        """:attr:`ack_timeout`
+        """
+        return self.__ack_timeout
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def submit(self, domains):
+        """Hand *domains* to the dispatcher from the current worker.
+        Blocks until every domain has been dispatched and acknowledged.
+        The worker keeps heartbeating while it waits (see
+        :func:`domain_intel.workerpool.heartbeat`) so that a wait on a
+        slow partial batch is not mistaken for a hung worker.
+
+        Returns:
+            number of *domains* whose batch was published
+
+        Raises:
+            :class:`RuntimeError` if the dispatch is not acknowledged
+            within :attr:`ack_timeout` seconds
+
+        """
+        domains = list(domains)
+        if not domains:
+            return 0
+
+        slot = domain_intel.workerpool.worker_slot()[0]
+        token = (os.getpid(), next(self.__sequence))
+        self.__requests.put((slot, token, domains))
+
+        remaining = len(domains)
+        published = 0
+        expires = time.time() + self.ack_timeout
+        while remaining > 0:
+            domain_intel.workerpool.heartbeat()
+            timeout = min(expires - time.time(), ACK_POLL_INTERVAL)
+            try:
+                ack_token, count, status = self.__replies[slot].get(
+                    True, max(timeout, 0))
+            except Queue.Empty:
+                if time.time() < expires:
+                    continue
+                raise RuntimeError('Batch coalescer dispatch not '
+                                   'acknowledged within {}s'.
+                                   format(self.ack_timeout))
+
+            # Skip acknowledgements owed to a previous worker in the slot.
+            if ack_token != token:
+                continue
+
+            remaining -= count
+            if status:
+                published += count
+
+        return published
+
+    def __dispatch(self, dispatch, batch):
+        """Pass the domains of *batch* to *dispatch* along with a
+        callback that acknowledges each submitting worker.
+
+        """
+        acked = threading.Event()
+
+        def done(status):
+            if acked.is_set():
+                return
+            acked.set()
+
+            owners = collections.Counter((x[1], x[2]) for x in batch)
+            for (slot, token), count in owners.items():
+                self.__replies[slot].put((token, count, bool(status)))
+
+        try:
+            dispatch([x[3] for x in batch], done)
+        except Exception as err: # pylint: disable=broad-except
+            log.error('Batch coalescer dispatch failed: %s', err)
+            done(False)
+
+    def __release(self, fetcher, pending, count):
+        """Dispatch the first *count* domains in *pending*.
+
+        """
+        batch = [pending.popleft() for _ in range(count)]
+        with self.__lock:
+            self.counts['domains'] += count
+            self.counts['full' if count == self.batch_size else
+                        'partial'] += 1
+        fetcher.submit(batch)
+
+    def __run(self, fetcher, stop):
+        """Dispatcher loop.  Runs until *stop* is set and all submitted
+        domains have been dispatched.
+
+        """
+        pending = collections.deque()
+        while True:
+            timeout = POLL_INTERVAL
+            if pending:
+                expires = pending[0][0] + self.deadline - time.time()
+                timeout = max(min(expires, POLL_INTERVAL), 0)
+
+            try:
+                slot, token, domains = self.__requests.get(True, timeout)
+                now = time.time()
+                pending.extend((now, slot, token, x) for x in domains)
+            except Queue.Empty:
+                if stop.is_set() and not pending:
+                    break
+
+            while len(pending) >= self.batch_size:
+                self.__release(fetcher, pending, self.batch_size)
+
+            if pending and (stop.is_set() or
+                            pending[0][0] + self.deadline <= time.time()):
+                self.__release(fetcher, pending, len(pending))
+
+    @contextlib.contextmanager
+    def running(self, dispatch, max_in_flight=None):
+        """Run the dispatcher in the current (pool) process for the life
+        of the context.
+
+        *dispatch* is called with a list of up to :attr:`batch_size`
+        domains and a ``done`` callback.  ``done`` must be called once
+        the batch has been handled, with ``True`` if it was published.
+        Up to *max_in_flight* dispatches run concurrently (see
+        :class:`domain_intel.fetcher.Fetcher`).
+
+        """
+        stop = threading.Event()
+
+        def call(batch):
+            self.__dispatch(dispatch, batch)
+
+        with domain_intel.fetcher.Fetcher(call, max_in_flight) as fetcher:
+            dispatcher = threading.Thread(target=self.__run,
+                                          args=(fetcher, stop))
+            dispatcher.daemon = True
+            dispatcher.start()
+            try:
+                yield self
+            finally:
+                stop.set()
+                dispatcher.join()
+
+        self.report()
+
+    def report(self):
+        """Log the dispatched batch counts.
+
+        Returns:
+            dictionary of :attr:`counts`
+
+        """
+        with self.__lock:
+            counts = dict(self.counts)
+
+        batches = counts.get('full', 0) + counts.get('partial', 0)
+        log.info('Coalesced domains|full|partial batches %d|%d|%d '
+                 '(%.2f domains per batch)',
+                 counts.get('domains', 0),
+                 counts.get('full', 0),
+                 counts.get('partial', 0),
+                 float(counts.get('domains', 0)) / batches if batches else 0)
+
+        return counts
@@ -0,0 +1,169 @@
+""":class:`OffsetCommitter`
+
+"""
+import time
+import collections
+import kafka.errors
+import kafka.structs
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+
+class OffsetCommitter(object):
+    """Manual, batched Kafka offset commits for at-least-once delivery.
+
+    Offsets of the records passed to :meth:`processed` are tracked per
+    partition.  An asynchronous commit is issued once
+    :attr:`interval_records` records have been processed or
+    :attr:`interval_ms` milliseconds have passed since the last commit.
+    A final synchronous commit is issued on :meth:`close`.
+
+    Before each commit the *flush* callables are invoked so that
+    downstream producer sends and store writes are acknowledged before
+    the source offsets are committed.  A *flush* callable raises to
+    flag a failed downstream write (for example,
+    :meth:`domain_intel.pipeline.producer.TrackedProducer.flush` raises
+    once a send has failed).  The commit is then skipped and the error
+    is raised to the caller so that the records are consumed again.
+
+    .. attribute:: consumer
+        the :class:`kafka.KafkaConsumer` to commit against.  The
+        consumer should be created with ``enable_auto_commit=False``
+
+    .. attribute:: flush
+        list of callables invoked before each commit
+
+    .. attribute:: interval_records
+        number of processed records that triggers a commit
+
+    .. attribute:: interval_ms
+        number of milliseconds between commits
+
+    .. attribute:: counts
+        :class:`collections.Counter` of ``commits``, ``failures`` and
+        ``aborted`` commits
+
+    """
+    def __init__(self,
+                 consumer,
+                 flush=None,
+                 interval_records=None,
+                 interval_ms=None):
+        self.__consumer = consumer
+        self.__flush = [x for x in (flush or []) if x is not None]
+
+        kafka_conf = CONFIG.get('kafka', {})
+        if interval_records is None:
+            interval_records = kafka_conf.get('commit_interval_records', 1000)
+        self.__interval_records = int(interval_records)
+
+        if interval_ms is None:
+            interval_ms = kafka_conf.get('commit_interval_ms', 5000)
+        self.__interval_ms = int(interval_ms)
+
+        self.__offsets = {}
+        self.__pending = 0
+        self.__last_commit = time.time()
+        self.__counts = collections.Counter()
+
+    @property
+    def consumer(self):
+        """:attr:`consumer`
+        """
+        return self.__consumer
+
+    @property
+    def flush(self):
+        """:attr:`flush`
+        """
+        return self.__flush
+
+    @property
+    def interval_records(self):
+        """:attr:`interval_records`
+        """
+        return self.__interval_records
+
+    @property
+    def interval_ms(self):
+        """:attr:`interval_ms`
+        """
+        return self.__interval_ms
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def processed(self, records):
+        """Mark *records* as processed.  Triggers an asynchronous
+        :meth:`commit` if a commit interval has been breached.
+
+        """
+        for record in records:
+            partition = kafka.structs.TopicPartition(record.topic,
+                                                     record.partition)
+            offset = max(record.offset + 1, self.__offsets.get(partition, 0))
+            self.__offsets[partition] = offset
+            self.__pending += 1
+
+        elapsed_ms = (time.time() - self.__last_commit) * 1000
+        if (self.__pending >= self.interval_records or
+                elapsed_ms >= self.interval_ms):
+            self.commit()
+
+    def commit(self, sync=False):
+        """Commit the processed offsets.  Asynchronous unless *sync*
+        is set.
+
+        Raises:
+            the error of a *flush* callable.  No offsets are committed
+
+        """
+        self.__last_commit = time.time()
+        if not self.__pending:
+            return
+
+        try:
+            for flush in self.flush:
+                flush()
+        except Exception as err:
+            log.error('Downstream flush failed - offsets %s not '
+                      'committed: %s', self.__offsets, err)
+            self.counts['aborted'] += 1
+            raise
+
+        offsets = {k: kafka.structs.OffsetAndMetadata(v, '')
+                   for k, v in self.__offsets.items()}
+        log.debug('Committing offsets (sync=%s): %s', sync, offsets)
+        if sync:
+            self.consumer.commit(offsets=offsets)
+            self.counts['commits'] += 1
+        else:
+            self.consumer.commit_async(offsets=offsets,
+                                       callback=self.__committed)
+        self.__pending = 0
+
+    def __committed(self, offsets, response):
+        """Asynchronous commit callback.
+
+        """
+        if isinstance(response, Exception):
+            log.warning('Offset commit %s failed: %s', offsets, response)
+            self.counts['failures'] += 1
+        else:
+            self.counts['commits'] += 1
+
+    def close(self):
+        """Final synchronous commit of the processed offsets.
+
+        """
+        try:
+            self.commit(sync=True)
+        except kafka.errors.KafkaError as err:
+            log.error('Final offset commit failed: %s', err)
+            self.counts['failures'] += 1
@@ -0,0 +1,170 @@
+""":class:`TrackedProducer`
+
+"""
+import threading
+import collections
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+
+class DeliveryError(Exception):
+    """Raised by :meth:`TrackedProducer.flush` when a send has failed
+    since the previous flush.
+    """
+    pass
+
+
+class TrackedProducer(object):
+    """Wrapper around a :class:`kafka.KafkaProducer` that tracks the
+    delivery of each :meth:`send` and bounds the number of sends that
+    are in flight.
+
+    Once :attr:`max_in_flight` sends are awaiting acknowledgement from
+    the broker, :meth:`send` blocks the calling loop until a delivery
+    callback frees a slot.  Delivered and failed sends are counted per
+    topic.
+
+    :meth:`flush` raises if a send has failed since the previous flush
+    so that the source offsets of the lost messages are not committed.
+    Each flush starts a new window so that a single failure does not
+    block the commits that follow.  Stages that commit source offsets
+    surface failed sends this way.  Stages without source offsets (for
+    example, file reloads) report the :attr:`failed` count instead.
+
+    All other attributes are delegated to the wrapped producer.
+
+    .. attribute:: producer
+        the wrapped :class:`kafka.KafkaProducer`
+
+    .. attribute:: max_in_flight
+        maximum number of unacknowledged sends
+
+    .. attribute:: counts
+        per-topic :class:`collections.Counter` of ``delivered`` and
+        ``failed`` sends
+
+    """
+    def __init__(self, producer, max_in_flight=None):
+        self.__producer = producer
+
+        if max_in_flight is None:
+            kafka_conf = CONFIG.get('kafka', {})
+            max_in_flight = kafka_conf.get('max_in_flight_sends', 10000)
+        self.__max_in_flight = int(max_in_flight)
+
+        self.__slots = threading.BoundedSemaphore(self.__max_in_flight)
+        self.__lock = threading.Lock()
+        self.__counts = collections.defaultdict(collections.Counter)
+        self.__flushed_failed = 0
+
+    def __getattr__(self, name):
+        if name.startswith('_TrackedProducer__'):
+            raise AttributeError(name)
+
+        return getattr(self.__producer, name)
+
+    @property
+    def producer(self):
+        """:attr:`producer`
+        """
+        return self.__producer
+
+    @property
+    def max_in_flight(self):
+        """:attr:`max_in_flight`
+        """
+        return self.__max_in_flight
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    @property
+    def delivered(self):
+        """Number of sends acknowledged across all topics.
+        """
+        return sum(x['delivered'] for x in self.counts.values())
+
+    @property
+    def failed(self):
+        """Number of failed sends across all topics.
+        """
+        return sum(x['failed'] for x in self.counts.values())
+
+    def send(self, topic, *args, **kwargs):
+        """Publish a message to *topic* as per
+        :meth:`kafka.KafkaProducer.send`.  Blocks while
+        :attr:`max_in_flight` sends are unacknowledged.
+
+        Returns:
+            the :class:`kafka.producer.future.FutureRecordMetadata`
+
+        """
+        if not self.__slots.acquire(False):
+            log.debug('%d sends in flight: waiting on delivery',
+                      self.max_in_flight)
+            self.__slots.acquire()
+
+        try:
+            future = self.__producer.send(topic, *args, **kwargs)
+        except Exception as err:
+            self.__failed(topic, err)
+            raise
+
+        future.add_callback(self.__delivered, topic)
+        future.add_errback(self.__failed, topic)
+
+        return future
+
+    def flush(self, *args, **kwargs):
+        """Block until all sends are complete as per
+        :meth:`kafka.KafkaProducer.flush`.
+
+        Raises:
+            :class:`DeliveryError` if a send has failed since the
+            previous flush
+
+        """
+        self.__producer.flush(*args, **kwargs)
+
+        with self.__lock:
+            failed = self.failed - self.__flushed_failed
+            self.__flushed_failed += failed
+
+        if failed:
+            raise DeliveryError('{} sends failed'.format(failed))
+
+    def __delivered(self, topic, metadata):
+        """Delivery callback.
+
+        """
+        with self.__lock:
+            self.counts[topic]['delivered'] += 1
+        self.__slots.release()
+
+    def __failed(self, topic, err):
+        """Delivery error callback.
+
+        """
+        log.error('Send to topic "%s" failed: %s', topic, err)
+        with self.__lock:
+            self.counts[topic]['failed'] += 1
+        self.__slots.release()
+
+    def report(self):
+        """Log the per-topic delivery counts.
+
+        Returns:
+            dictionary of per-topic :attr:`counts`
+
+        """
+        for topic, counts in sorted(self.counts.items()):
+            log.info('Topic "%s" delivered|failed %d|%d',
+                     topic, counts['delivered'], counts['failed'])
+
+        return dict(self.counts)
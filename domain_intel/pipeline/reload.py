@@ -0,0 +1,124 @@
+"""Chunked, memory-mapped Kafka topic reload helpers.
+
+"""
+import os
+import mmap
+import contextlib
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+START_TOKEN = b'<?xml version="1.0"?>'
+
+
+def end_token_bytes(end_token):
+    """Closing Alexa XML element for the response type *end_token*.
+    For example, ``UrlInfoResponse`` becomes ``</aws:UrlInfoResponse>``.
+
+    Returns:
+        the closing element as bytes
+
+    """
+    return '</aws:{}>'.format(end_token).encode('utf-8')
+
+
+def source_path(source):
+    """File system path of the reload *source*, given as either a path
+    or a file object.  The file object is not closed.
+
+    Returns:
+        the path or ``None`` if *source* is a stream that is not backed
+        by a regular file (for example, :data:`sys.stdin`)
+
+    """
+    if not hasattr(source, 'read'):
+        return source
+
+    name = getattr(source, 'name', None)
+    if not isinstance(name, int) and name and os.path.isfile(name):
+        return name
+
+    return None
+
+
+@contextlib.contextmanager
+def mapped_file(path):
+    """Read-only memory map of the file at *path*.  Empty files cannot
+    be mapped so yield an empty byte string instead.
+
+    """
+    with open(path, 'rb') as _fh:
+        if not os.fstat(_fh.fileno()).st_size:
+            yield b''
+        else:
+            mapped = mmap.mmap(_fh.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+
+def chunk_ranges(size, chunk_size=None):
+    """Split *size* bytes into contiguous byte ranges of *chunk_size*.
+    Defaults to the ``reload_chunk_bytes`` config value.
+
+    Returns:
+        list of (<start>, <end>) byte offset tuples
+
+    """
+    if chunk_size is None:
+        chunk_size = CONFIG.get('reload_chunk_bytes', 67108864)
+    chunk_size = max(int(chunk_size), 1)
+
+    return [(x, min(x + chunk_size, size))
+            for x in range(0, size, chunk_size)]
+
+
+def scan_records(mapped, end_token, ranges=None):
+    """Byte-level scan of the memory-mapped *mapped* Alexa archive for
+    raw XML records.
+
+    A record starts at the ``<?xml version="1.0"?>`` token and ends at
+    the end of the line that holds the ``</aws:<end_token>>`` token.
+
+    Each (<start>, <end>) tuple in *ranges* only owns the records that
+    *start* within it.  A record can extend past the end of its range so
+    that adjacent ranges can be scanned independently.  Defaults to the
+    whole of *mapped*.
+
+    A record that is truncated by the start of the next record or the
+    end of the file is skipped.
+
+    Returns:
+        each raw XML record as bytes as a generator
+
+    """
+    if ranges is None:
+        ranges = [(0, len(mapped))]
+
+    close_token = end_token_bytes(end_token)
+    for start, end in ranges:
+        # Allow for a start token that straddles the end of the range.
+        limit = end + len(START_TOKEN) - 1
+        pos = mapped.find(START_TOKEN, start, limit)
+        while pos != -1:
+            stop = mapped.find(close_token, pos + len(START_TOKEN))
+            if stop == -1:
+                log.warning('Truncated XML record at byte %d', pos)
+                break
+
+            restart = mapped.find(START_TOKEN, pos + len(START_TOKEN), stop)
+            if restart != -1:
+                log.warning('Truncated XML record at byte %d', pos)
+                pos = restart if restart < end else -1
+                continue
+
+            eol = mapped.find(b'\n', stop)
+            if eol == -1:
+                eol = len(mapped)
+
+            yield mapped[pos:eol].rstrip()
+
+            pos = mapped.find(START_TOKEN, eol, limit)
@@ -0,0 +1,239 @@
+""":class:`ReplayWindow`
+
+"""
+import calendar
+import datetime
+import contextlib
+import kafka.structs
+from logga import log
+
+import domain_intel.utils
+import domain_intel.workerpool
+
+TIMESTAMP_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M',
+    '%Y-%m-%d',
+]
+
+
+def parse_timestamp(value):
+    """Convert the replay timestamp *value* into milliseconds since
+    epoch.  *value* can be milliseconds since epoch or a UTC date/time
+    in one of the :data:`TIMESTAMP_FORMATS`.
+
+    Returns:
+        milliseconds since epoch
+
+    Raises:
+        :class:`ValueError` if *value* cannot be converted
+
+    """
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            _dt = datetime.datetime.strptime(value, timestamp_format)
+        except ValueError:
+            continue
+        return calendar.timegm(_dt.timetuple()) * 1000
+
+    raise ValueError('Unsupported replay timestamp "{}"'.format(value))
+
+
+class ReplayWindow(object):
+    """Bounded re-read of Kafka topics by offset or timestamp.
+
+    Replay consumers are not part of a consumer group.  Instead, each
+    worker is assigned a fixed share of the topic partitions (see
+    :func:`domain_intel.workerpool.worker_slot`) and seeks to the lower
+    bound of the window.  No offsets are committed.
+
+    The lower bound is the first offset of each partition unless
+    :attr:`from_offset` or :attr:`since` is set.  The upper bound is the
+    end of each partition at the time of assignment unless
+    :attr:`to_offset` or :attr:`until` is set.  Consumption is complete
+    once all assigned partitions have reached their upper bound.
+
+    .. attribute:: from_offset
+        first offset to read from each partition
+
+    .. attribute:: to_offset
+        last offset (inclusive) to read from each partition
+
+    .. attribute:: since
+        milliseconds since epoch of the first record to read
+
+    .. attribute:: until
+        milliseconds since epoch before which all records are read
+
+    """
+    def __init__(self,
+                 from_offset=None,
+                 to_offset=None,
+                 since=None,
+                 until=None):
+        if from_offset is not None and since is not None:
+            raise ValueError('Replay from offset and since are exclusive')
+        if to_offset is not None and until is not None:
+            raise ValueError('Replay to offset and until are exclusive')
+
+        self.__from_offset = from_offset
+        self.__to_offset = to_offset
+        self.__since = since
+        self.__until = until
+        self.__upper = {}
+
+    @property
+    def from_offset(self):
+        """:attr:`from_offset`
+        """
+        return self.__from_offset
+
+    @property
+    def to_offset(self):
+        """:attr:`to_offset`
+        """
+        return self.__to_offset
+
+    @property
+    def since(self):
+        """:attr:`since`
+        """
+        return self.__since
+
+    @property
+    def until(self):
+        """:attr:`until`
+        """
+        return self.__until
+
+    @property
+    def upper(self):
+        """Exclusive upper bound offset of each assigned
+        :class:`kafka.structs.TopicPartition`.
+        """
+        return self.__upper
+
+    @staticmethod
+    def __times(consumer, partitions, timestamp, default):
+        """Earliest offset of each of *partitions* with a timestamp at
+        or after *timestamp*.  Falls back to the *default* offset if
+        no such record exists.
+
+        """
+        times = consumer.offsets_for_times({x: timestamp for x in partitions})
+
+        offsets = {}
+        for partition in partitions:
+            found = times.get(partition)
+            offsets[partition] = default[partition]
+            if found is not None:
+                offsets[partition] = found.offset
+
+        return offsets
+
+    def assign(self, consumer, topics):
+        """Assign this worker's share of the *topics* partitions to
+        *consumer* and seek to the lower bound of the window.
+
+        Returns:
+            list of the assigned :class:`kafka.structs.TopicPartition`
+
+        """
+        if not isinstance(topics, (list, tuple)):
+            topics = [topics]
+
+        partitions = []
+        for topic in topics:
+            for partition in sorted(consumer.partitions_for_topic(topic)):
+                partitions.append(kafka.structs.TopicPartition(topic,
+                                                               partition))
+
+        slot, workers = domain_intel.workerpool.worker_slot()
+        partitions = partitions[slot::workers]
+        consumer.assign(partitions)
+        if not partitions:
+            return partitions
+
+        first = consumer.beginning_offsets(partitions)
+        last = consumer.end_offsets(partitions)
+
+        if self.since is not None:
+            lower = self.__times(consumer, partitions, self.since, last)
+        else:
+            lower = {k: max(v, self.from_offset or 0)
+                     for k, v in first.items()}
+
+        if self.until is not None:
+            upper = self.__times(consumer, partitions, self.until, last)
+        elif self.to_offset is not None:
+            upper = {k: min(v, self.to_offset + 1) for k, v in last.items()}
+        else:
+            upper = last
+
+        for partition in partitions:
+            start = min(lower[partition], last[partition])
+            log.info('Replay %s:%d offsets %d to %d',
+                     partition.topic, partition.partition,
+                     start, upper[partition])
+            consumer.seek(partition, start)
+            self.__upper[partition] = upper[partition]
+
+        return partitions
+
+    def within(self, record):
+        """Check if *record* is below the upper bound of the window.
+
+        """
+        partition = kafka.structs.TopicPartition(record.topic,
+                                                 record.partition)
+
+        return record.offset < self.upper.get(partition, 0)
+
+    def bound(self, records):
+        """Filter *records* that are beyond the upper bound of the
+        window.
+
+        Returns:
+            list of records within the window
+
+        """
+        return [x for x in records if self.within(x)]
+
+    def done(self, consumer):
+        """Pause the partitions of *consumer* that have reached their
+        upper bound.
+
+        Returns:
+            Boolean ``True`` once all assigned partitions are complete
+
+        """
+        complete = True
+        for partition in consumer.assignment():
+            if partition in consumer.paused():
+                continue
+
+            if consumer.position(partition) >= self.upper.get(partition, 0):
+                consumer.pause(partition)
+            else:
+                complete = False
+
+        return complete
+
+    @contextlib.contextmanager
+    def consumer(self, topics, **kwargs):
+        """Wrapper around :func:`domain_intel.utils.safe_consumer` that
+        yields a consumer assigned to the window over *topics* rather
+        than subscribed as part of a consumer group.
+
+        """
+        kwargs['group_id'] = None
+        kwargs['enable_auto_commit'] = False
+        with domain_intel.utils.safe_consumer(None, **kwargs) as consumer:
+            self.assign(consumer, topics)
+            yield consumer
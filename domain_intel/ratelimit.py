@@ -0,0 +1,157 @@
+""":class:`TokenBucket`
+
+"""
+import os
+import mmap
+import time
+import fcntl
+import struct
+import tempfile
+import threading
+from logga import log
+
+# Bucket state: available tokens and the time they were last topped up.
+STATE = struct.Struct('>dd')
+
+
+class TokenBucket(object):
+    """Host-wide token bucket rate limiter.
+
+    The bucket state lives in a small memory-mapped file so that every
+    process on the host that opens the same :attr:`path` shares the one
+    bucket.  Updates are serialised with an exclusive :func:`fcntl.flock`
+    on the file (and a lock between the threads of each process).
+
+    Tokens are added at :attr:`rate` per second up to :attr:`burst`.
+    Each :meth:`acquire` takes a token, sleeping until one is available.
+
+    .. attribute:: rate
+        tokens added per second
+
+    .. attribute:: burst
+        maximum number of tokens the bucket holds
+
+    .. attribute:: path
+        file that holds the shared bucket state
+
+    """
+    def __init__(self, rate, burst=None, path=None):
+        self.__rate = float(rate)
+        if self.__rate <= 0:
+            raise ValueError('Token bucket rate must be positive')
+
+        if burst is None:
+            burst = max(self.__rate, 1.0)
+        self.__burst = float(burst)
+
+        if path is None:
+            path = os.path.join(tempfile.gettempdir(),
+                                'domain-intel-ratelimit.bucket')
+        self.__path = path
+
+        self.__lock = threading.Lock()
+        self.__fd = None
+        self.__mapped = None
+        self.__pid = None
+
+    @property
+    def rate(self):
+        """:attr:`rate`
+        """
+        return self.__rate
+
+    @property
+    def burst(self):
+        """:attr:`burst`
+        """
+        return self.__burst
+
+    @property
+    def path(self):
+        """:attr:`path`
+        """
+        return self.__path
+
+    def __open(self):
+        """Map the bucket state file for the current process.  A forked
+        process must not share the parent's file description as flock
+        locks are held per open file description.
+
+        """
+        if self.__mapped is not None and self.__pid == os.getpid():
+            return
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < STATE.size:
+                log.debug('Initialising token bucket %s', self.path)
+                os.ftruncate(fd, STATE.size)
+                os.write(fd, STATE.pack(self.burst, time.time()))
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+        self.__fd = fd
+        self.__mapped = mmap.mmap(fd, STATE.size)
+        self.__pid = os.getpid()
+
+    def __take(self, tokens):
+        """Top up the bucket and take *tokens* if they are available.
+
+        Returns:
+            seconds to wait before *tokens* are available (``0.0`` if
+            the *tokens* were taken)
+
+        """
+        fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        try:
+            available, updated = STATE.unpack_from(self.__mapped)
+            now = time.time()
+            elapsed = max(now - updated, 0.0)
+            available = min(available + elapsed * self.rate, self.burst)
+
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            STATE.pack_into(self.__mapped, 0, available, now)
+        finally:
+            fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+        return wait
+
+    def acquire(self, tokens=1):
+        """Take *tokens* from the bucket.  Blocks until they are
+        available.
+
+        Returns:
+            number of seconds spent waiting
+
+        """
+        tokens = min(float(tokens), self.burst)
+        waited = 0.0
+        while True:
+            with self.__lock:
+                self.__open()
+                wait = self.__take(tokens)
+
+            if not wait:
+                break
+
+            time.sleep(wait)
+            waited += wait
+
+        return waited
+
+    def close(self):
+        """Release the bucket state file of the current process.
+
+        """
+        with self.__lock:
+            if self.__mapped is not None and self.__pid == os.getpid():
+                self.__mapped.close()
+                os.close(self.__fd)
+            self.__mapped = None
+            self.__fd = None
+            self.__pid = None
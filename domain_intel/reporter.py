@@ -41,6 +41,26 @@ LINK_KEYS = collections.OrderedDict([
     ('title', None),
 ])
 
+# Fields per collection that the Reporter reads from a graph traversal.
+# Used to project traversals so that raw payloads (for example, the
+# "url-info" and "geodns" documents) are not shipped.  See
+# :func:`domain_intel.store.projection_expression`.
+PROJECTION = {
+    'domain': [x for x in DOMAIN_KEYS.keys() if not x.startswith('_')],
+    'ranked': ['label'],
+    'links_into': ['label'],
+    'url': ['domain_linkingin'],
+    'ipv4': [
+        'organisation',
+        'isp',
+        'geospatial',
+        'country',
+        'continent',
+    ],
+    'traffic': ['data.TrafficHistory.HistoricalData'],
+    'analyst-qas': ['data'],
+}
+
 
 class Reporter(object):
     """
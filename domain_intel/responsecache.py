@@ -0,0 +1,294 @@
+""":class:`ResponseCache`
+
+"""
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+import collections
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS response (
+        key TEXT NOT NULL PRIMARY KEY,
+        action TEXT NOT NULL,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )""",
+    '''CREATE INDEX IF NOT EXISTS response_accessed_idx
+        ON response (accessed_at)''',
+]
+
+
+class ResponseCache(object):
+    """Disk-backed cache of AWIS responses held in an embedded SQLite
+    database so that a re-slurp of a domain within :attr:`ttls` does not
+    cost another AWIS call.
+
+    Responses are keyed by their canonical AWIS query (see
+    :meth:`domain_intel.awisapi.AwisApi.cache_key`).  Each response
+    expires after the TTL of its AWIS action.  Once the cached responses
+    exceed :attr:`max_bytes` the least recently used are evicted.
+
+    Settings default to the ``cache`` section of the ``awis`` config.
+    Connections are held per thread and process.
+
+    .. attribute:: path
+        SQLite database file
+
+    .. attribute:: ttls
+        dictionary of seconds that a response is cached per AWIS action
+        (for example, ``UrlInfo``)
+
+    .. attribute:: default_ttl
+        seconds that a response is cached for actions not in :attr:`ttls`
+
+    .. attribute:: max_bytes
+        size limit of the cached responses
+
+    .. attribute:: refresh
+        when set, lookups always miss so that responses are re-fetched
+        and re-cached
+
+    .. attribute:: report_interval
+        number of lookups between :meth:`report` log summaries
+
+    .. attribute:: counts
+        per-action :class:`collections.Counter` of ``hits``, ``misses``,
+        ``expired`` and ``evictions``
+
+    """
+    def __init__(self,
+                 path=None,
+                 ttls=None,
+                 default_ttl=None,
+                 max_bytes=None,
+                 refresh=False,
+                 report_interval=None):
+        cache_conf = CONFIG.get('awis', {}).get('cache') or {}
+
+        if path is None:
+            path = cache_conf.get('path')
+        if path is None:
+            path = os.path.join(tempfile.gettempdir(),
+                                'domain-intel-awis-cache.db')
+        self.__path = path
+
+        if ttls is None:
+            ttls = cache_conf.get('ttls', {})
+        self.__ttls = dict(ttls)
+
+        if default_ttl is None:
+            default_ttl = cache_conf.get('default_ttl', 86400)
+        self.__default_ttl = float(default_ttl)
+
+        if max_bytes is None:
+            max_bytes = cache_conf.get('max_bytes', 1073741824)
+        self.__max_bytes = int(max_bytes)
+
+        self.__refresh = refresh
+
+        if report_interval is None:
+            report_interval = cache_conf.get('report_interval', 1000)
+        self.__report_interval = int(report_interval)
+        self.__lookups = 0
+
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__counts = collections.defaultdict(collections.Counter)
+
+    @property
+    def path(self):
+        """:attr:`path`
+        """
+        return self.__path
+
+    @property
+    def ttls(self):
+        """:attr:`ttls`
+        """
+        return self.__ttls
+
+    @property
+    def default_ttl(self):
+        """:attr:`default_ttl`
+        """
+        return self.__default_ttl
+
+    @property
+    def max_bytes(self):
+        """:attr:`max_bytes`
+        """
+        return self.__max_bytes
+
+    @property
+    def refresh(self):
+        """:attr:`refresh`
+        """
+        return self.__refresh
+
+    @refresh.setter
+    def refresh(self, value):
+        self.__refresh = value
+
+    @property
+    def report_interval(self):
+        """:attr:`report_interval`
+        """
+        return self.__report_interval
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    @property
+    def connection(self):
+        """The :class:`sqlite3.Connection` for the current thread.
+        Created on first use along with the :data:`SCHEMA`.
+        """
+        if getattr(self.__local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if (self.path != ':memory:' and directory and
+                    not os.path.isdir(directory)):
+                os.makedirs(directory)
+
+            connection = sqlite3.connect(self.path, timeout=30)
+            if self.path != ':memory:':
+                connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+
+            self.__local.connection = connection
+            self.__local.pid = os.getpid()
+
+        return self.__local.connection
+
+    def ttl(self, action):
+        """Seconds that a response to AWIS *action* is cached.
+
+        """
+        return float(self.ttls.get(action, self.default_ttl))
+
+    def __count(self, action, name):
+        with self.__lock:
+            self.counts[action][name] += 1
+
+    def get(self, action, key):
+        """Cached response to AWIS *action* for the canonical query
+        *key*.
+
+        Returns:
+            the response body as bytes or ``None`` on a miss
+
+        """
+        body = None
+        if not self.refresh:
+            now = time.time()
+            connection = self.connection
+            row = connection.execute('SELECT body, expires_at '
+                                     'FROM response WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is not None and row[1] <= now:
+                connection.execute('DELETE FROM response WHERE key = ?',
+                                   (key,))
+                connection.commit()
+                self.__count(action, 'expired')
+            elif row is not None:
+                connection.execute('UPDATE response SET accessed_at = ? '
+                                   'WHERE key = ?', (now, key))
+                connection.commit()
+                body = bytes(row[0])
+
+        self.__count(action, 'hits' if body is not None else 'misses')
+
+        with self.__lock:
+            self.__lookups += 1
+            lookups = self.__lookups
+        if self.report_interval and lookups % self.report_interval == 0:
+            self.report()
+
+        return body
+
+    def put(self, action, key, body):
+        """Cache the AWIS *action* response *body* under the canonical
+        query *key*.  The least recently used responses are evicted
+        once :attr:`max_bytes` is breached.
+
+        """
+        ttl = self.ttl(action)
+        if ttl <= 0 or len(body) > self.max_bytes:
+            return
+
+        now = time.time()
+        connection = self.connection
+        connection.execute('INSERT OR REPLACE INTO response '
+                           '(key, action, body, size, expires_at, '
+                           'accessed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                           (key, action, sqlite3.Binary(body), len(body),
+                            now + ttl, now))
+        connection.commit()
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used responses until the cache is
+        within :attr:`max_bytes`.
+
+        Returns:
+            number of responses evicted
+
+        """
+        connection = self.connection
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) '
+                                   'FROM response').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = []
+        rows = connection.execute('SELECT key, action, size FROM response '
+                                  'ORDER BY accessed_at')
+        for key, action, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key, action))
+            total -= size
+
+        connection.executemany('DELETE FROM response WHERE key = ?',
+                               [(x[0],) for x in evicted])
+        connection.commit()
+        for _, action in evicted:
+            self.__count(action, 'evictions')
+
+        return len(evicted)
+
+    def report(self):
+        """Log the per-action hit rate.
+
+        Returns:
+            dictionary of per-action :attr:`counts`
+
+        """
+        with self.__lock:
+            counts = {k: collections.Counter(v)
+                      for k, v in self.counts.items()}
+
+        for action, count in sorted(counts.items()):
+            lookups = count['hits'] + count['misses']
+            log.info('AWIS cache "%s" hit|miss|expired|evictions '
+                     '%d|%d|%d|%d (%.1f%%)',
+                     action, count['hits'], count['misses'],
+                     count['expired'], count['evictions'],
+                     100.0 * count['hits'] / lookups if lookups else 0)
+
+        return counts
@@ -0,0 +1,416 @@
+""":class:`Spool`
+
+"""
+import os
+import io
+import glob
+import json
+import time
+import errno
+import threading
+import collections
+import arango.exceptions
+import requests.exceptions
+from logga import log
+
+import domain_intel.common
+
+CONFIG = domain_intel.common.CONFIG
+
+# Errors that flag the store as unreachable (as opposed to a rejected
+# document).
+UNAVAILABLE_ERRORS = (requests.exceptions.ConnectionError,
+                      requests.exceptions.Timeout)
+UNAVAILABLE_HTTP_CODES = [502, 503, 504]
+
+# All errors raised by a store write.  Filter with :func:`unavailable`.
+STORE_ERRORS = UNAVAILABLE_ERRORS + (arango.exceptions.ArangoError,)
+
+
+def unavailable(err):
+    """Check if the exception *err* flags that ArangoDB is unavailable.
+
+    Returns:
+        Boolean ``True`` if the store is unavailable.  ``False`` otherwise
+
+    """
+    status = isinstance(err, UNAVAILABLE_ERRORS)
+    if isinstance(err, arango.exceptions.ArangoError):
+        status = getattr(err, 'http_code', None) in UNAVAILABLE_HTTP_CODES
+
+    return status
+
+
+def pid_alive(pid):
+    """Check if process *pid* is running.
+
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        return err.errno == errno.EPERM
+
+    return True
+
+
+class Spool(object):
+    """Local append-only write-ahead spool of documents that could not
+    be written to ArangoDB.
+
+    Documents are appended as JSON lines to the current segment file
+    under :attr:`directory`.  The segment is sealed once it holds
+    :attr:`segment_size` documents.  Segment files are named after the
+    time of creation and the owning process so that the segments can be
+    replayed in order and multiple processes can share the
+    :attr:`directory`.
+
+    A drainer claims each sealed segment before it is replayed (see
+    :meth:`claim`) so that drainers in processes that share the
+    :attr:`directory` never replay the same segment.
+
+    Writes to the store are monitored via :meth:`record`.  Once
+    :attr:`error_threshold` consecutive writes have either failed or
+    exceeded :attr:`latency_threshold` seconds the spool is flagged as
+    :attr:`degraded` and all writes should be spooled.  A background
+    drainer thread (see :meth:`start_drainer`) replays the spool in bulk
+    once the store recovers.
+
+    .. attribute:: directory
+        directory that holds the spool segment files
+
+    .. attribute:: segment_size
+        number of documents per segment file
+
+    .. attribute:: latency_threshold
+        seconds beyond which a store write is considered slow
+
+    .. attribute:: error_threshold
+        number of consecutive failed or slow writes that flag the spool
+        as :attr:`degraded`
+
+    .. attribute:: drain_interval
+        seconds between drainer attempts to replay the spool
+
+    .. attribute:: degraded
+        flag that writes should go to the spool rather than the store
+
+    .. attribute:: counts
+        :class:`collections.Counter` of ``spooled``, ``drained`` and
+        ``failed`` documents
+
+    """
+    def __init__(self,
+                 directory,
+                 segment_size=None,
+                 latency_threshold=None,
+                 error_threshold=None,
+                 drain_interval=None):
+        self.__directory = directory
+        if not os.path.isdir(self.__directory):
+            os.makedirs(self.__directory)
+
+        if segment_size is None:
+            segment_size = CONFIG.get('arango_spool_segment_size', 10000)
+        self.__segment_size = int(segment_size)
+
+        if latency_threshold is None:
+            latency_threshold = CONFIG.get('arango_spool_latency', 2.0)
+        self.__latency_threshold = float(latency_threshold)
+
+        if error_threshold is None:
+            error_threshold = CONFIG.get('arango_spool_errors', 3)
+        self.__error_threshold = int(error_threshold)
+
+        if drain_interval is None:
+            drain_interval = CONFIG.get('arango_spool_drain_interval', 10)
+        self.__drain_interval = float(drain_interval)
+
+        self.__lock = threading.RLock()
+        self.__segment = None
+        self.__segment_fh = None
+        self.__segment_count = 0
+        self.__sequence = 0
+        self.__strikes = 0
+        self.__degraded = False
+        self.__drainer = None
+        self.__counts = collections.Counter()
+
+        self.seal_orphans()
+
+    @property
+    def directory(self):
+        """:attr:`directory`
+        """
+        return self.__directory
+
+    @property
+    def segment_size(self):
+        """:attr:`segment_size`
+        """
+        return self.__segment_size
+
+    @property
+    def latency_threshold(self):
+        """:attr:`latency_threshold`
+        """
+        return self.__latency_threshold
+
+    @property
+    def error_threshold(self):
+        """:attr:`error_threshold`
+        """
+        return self.__error_threshold
+
+    @property
+    def drain_interval(self):
+        """:attr:`drain_interval`
+        """
+        return self.__drain_interval
+
+    @property
+    def degraded(self):
+        """:attr:`degraded`
+        """
+        return self.__degraded
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def record(self, elapsed=None, failed=False):
+        """Track the outcome of a store write that took *elapsed*
+        seconds.  *failed* flags that the store was unavailable.
+
+        Returns:
+            the :attr:`degraded` state
+
+        """
+        with self.__lock:
+            if failed or (elapsed or 0) > self.latency_threshold:
+                self.__strikes += 1
+            else:
+                self.__strikes = 0
+
+            if not self.__degraded and self.__strikes >= self.error_threshold:
+                log.warning('Store degraded after %d failed or slow writes: '
+                            'spooling to %s', self.__strikes, self.directory)
+                self.__degraded = True
+
+        return self.__degraded
+
+    def append(self, collection_name, document):
+        """Append *document* destined for *collection_name* to the
+        current spool segment.
+
+        Returns:
+            Boolean ``True`` on success
+
+        """
+        record = json.dumps({'collection': collection_name,
+                             'document': document})
+        with self.__lock:
+            if self.__segment_fh is None:
+                self.__sequence += 1
+                name = '{:017.6f}-{}-{:06d}.jsonl'.format(time.time(),
+                                                         os.getpid(),
+                                                         self.__sequence)
+                self.__segment = os.path.join(self.directory, name)
+                self.__segment_fh = io.open('{}.open'.format(self.__segment),
+                                            'a',
+                                            encoding='utf-8')
+                self.__segment_count = 0
+
+            self.__segment_fh.write(u'{}\n'.format(record))
+            self.__segment_fh.flush()
+            self.__segment_count += 1
+            self.__counts['spooled'] += 1
+
+            if self.__segment_count >= self.segment_size:
+                self.seal()
+
+        return True
+
+    def seal(self):
+        """Close the current segment so that it can be drained.
+
+        """
+        with self.__lock:
+            if self.__segment_fh is not None:
+                self.__segment_fh.close()
+                os.rename('{}.open'.format(self.__segment), self.__segment)
+                log.debug('Sealed spool segment %s', self.__segment)
+                self.__segment_fh = None
+                self.__segment = None
+
+    def seal_orphans(self):
+        """Seal the open segments and release the segment claims left
+        behind by processes that are no longer running.
+
+        """
+        for path in glob.glob(os.path.join(self.directory, '*.jsonl.open')):
+            pid = int(os.path.basename(path).split('-')[1])
+            if not pid_alive(pid):
+                log.info('Sealing orphaned spool segment %s', path)
+                os.rename(path, path[:-len('.open')])
+
+        pattern = os.path.join(self.directory, '*.jsonl.draining.*')
+        for path in glob.glob(pattern):
+            segment, _, pid = path.rpartition('.draining.')
+            if not pid_alive(int(pid)):
+                log.info('Releasing orphaned spool segment claim %s', path)
+                self.release(path, segment)
+
+    def segments(self):
+        """Sealed segment files in replay order.
+
+        """
+        return sorted(glob.glob(os.path.join(self.directory, '*.jsonl')))
+
+    @staticmethod
+    def claim(segment):
+        """Claim *segment* for the current process by an atomic rename
+        to ``<segment>.draining.<pid>``.
+
+        Returns:
+            the claimed file name or ``None`` if *segment* has already
+            been claimed (or drained) by another process
+
+        """
+        claimed = '{}.draining.{}'.format(segment, os.getpid())
+        try:
+            os.rename(segment, claimed)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            log.debug('Spool segment %s claimed elsewhere', segment)
+            claimed = None
+
+        return claimed
+
+    @staticmethod
+    def release(claimed, segment):
+        """Return the *claimed* segment file to *segment* so that it can
+        be drained again.
+
+        """
+        try:
+            os.rename(claimed, segment)
+        except OSError as err:
+            log.error('Unable to release spool segment %s: %s',
+                      claimed, err)
+
+    def pending(self):
+        """Check if there are spooled documents that are yet to be
+        drained.
+
+        """
+        with self.__lock:
+            return bool(self.segments()) or self.__segment_fh is not None
+
+    def drain(self, store):
+        """Replay all spooled segments into *store* via the bulk import
+        endpoint.  Each segment is claimed before it is replayed and
+        segments claimed by another drainer are skipped.  Draining stops
+        at the first sign that *store* is unavailable.  The remaining
+        segments are retained.
+
+        Returns:
+            Boolean ``True`` if the spool was drained.  ``False`` otherwise
+
+        """
+        self.seal()
+
+        for segment in self.segments():
+            claimed = self.claim(segment)
+            if claimed is None:
+                continue
+
+            try:
+                documents = collections.defaultdict(list)
+                with io.open(claimed, encoding='utf-8') as _fh:
+                    for line in _fh:
+                        if not line.strip():
+                            continue
+                        record = json.loads(line)
+                        collection_name = record['collection']
+                        documents[collection_name].append(record['document'])
+
+                for collection_name, batch in documents.items():
+                    self.__replay(store, collection_name, batch)
+            except STORE_ERRORS as err:
+                self.release(claimed, segment)
+                if not unavailable(err):
+                    raise
+                log.warning('Spool drain of %s stopped: %s', segment, err)
+                return False
+            except Exception:
+                self.release(claimed, segment)
+                raise
+
+            log.info('Drained spool segment %s', segment)
+            os.remove(claimed)
+
+        return True
+
+    def __replay(self, store, collection_name, documents):
+        """Bulk import *documents* into *store* *collection_name*.
+
+        """
+        kwargs = {
+            'halt_on_error': False,
+            'details': True,
+            'on_duplicate': store.on_duplicate,
+        }
+        collection = store.collection(collection_name)
+        result = collection.import_bulk(documents, **kwargs)
+
+        self.counts['drained'] += len(documents) - result.get('errors', 0)
+        self.counts['failed'] += result.get('errors', 0)
+        for detail in result.get('details', []):
+            log.error('Spool drain into %s: %s', collection_name, detail)
+
+    def recover(self):
+        """Clear the :attr:`degraded` state so that writes go to the
+        store again.
+
+        """
+        with self.__lock:
+            if self.__degraded:
+                log.info('Store recovered: spool counts %s',
+                         dict(self.counts))
+            self.__degraded = False
+            self.__strikes = 0
+
+    def start_drainer(self, store):
+        """Start the background thread that replays the spool into
+        *store* every :attr:`drain_interval` seconds.  A no-op if the
+        drainer is already running.
+
+        """
+        with self.__lock:
+            if self.__drainer is None or not self.__drainer.is_alive():
+                self.__drainer = threading.Thread(target=self.__drain_loop,
+                                                  args=(store,))
+                self.__drainer.daemon = True
+                self.__drainer.start()
+
+    def __drain_loop(self, store):
+        """Drainer thread.  Probes *store* health before each drain.
+
+        """
+        while True:
+            time.sleep(self.drain_interval)
+            if not self.pending():
+                continue
+
+            try:
+                store.client.version()
+                drained = self.drain(store)
+            except STORE_ERRORS as err:
+                log.warning('Store not ready for spool drain: %s', err)
+                continue
+
+            if drained:
+                self.recover()
@@ -0,0 +1,359 @@
+""":class:`SqliteStore`
+
+"""
+import os
+import json
+import uuid
+import sqlite3
+import threading
+import contextlib
+from logga import log
+
+import domain_intel.common
+import domain_intel.basestore
+
+CONFIG = domain_intel.common.CONFIG
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS vertex (
+        collection TEXT NOT NULL,
+        key TEXT NOT NULL,
+        document TEXT NOT NULL,
+        PRIMARY KEY (collection, key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS edge (
+        collection TEXT NOT NULL,
+        key TEXT NOT NULL,
+        from_id TEXT NOT NULL,
+        to_id TEXT NOT NULL,
+        document TEXT NOT NULL,
+        PRIMARY KEY (collection, key)
+    )""",
+    'CREATE INDEX IF NOT EXISTS edge_from_idx ON edge (from_id)',
+    'CREATE INDEX IF NOT EXISTS edge_to_idx ON edge (to_id)',
+]
+
+INSERT_STATEMENTS = {
+    'error': 'INSERT INTO',
+    'ignore': 'INSERT OR IGNORE INTO',
+    'replace': 'INSERT OR REPLACE INTO',
+    'update': 'INSERT OR REPLACE INTO',
+}
+
+
+class SqliteStore(domain_intel.basestore.BaseStore):
+    """:class:`SqliteStore`
+
+    Embedded, file-backed :class:`domain_intel.basestore.BaseStore`
+    for offline runs and benchmarks that do not have access to ArangoDB.
+
+    Vertices and edges are held as JSON documents in the ``vertex`` and
+    ``edge`` tables.  The edge table is indexed on both ends of the edge
+    to support graph traversals.
+
+    ..attribute:: database_name
+        name of the database.  Defaults to 'ipe'
+
+    ..attribute:: on_duplicate
+        conflict policy applied when a document key already exists.  One
+        of ``error`` (default), ``ignore``, ``replace`` or ``update``
+
+    ..attribute:: path
+        SQLite database file.  Defaults to ``<database_name>.db`` under
+        the ``sqlite_dir`` config value.  ``:memory:`` holds the
+        database in memory
+
+    Connections are held per thread and process.
+
+    """
+    def __init__(self,
+                 database_name='ipe',
+                 on_duplicate=None,
+                 path=None,
+                 known_keys=None):
+        super(SqliteStore, self).__init__(database_name,
+                                          on_duplicate,
+                                          known_keys)
+
+        if path is None:
+            directory = CONFIG.get('sqlite_dir', os.curdir)
+            path = os.path.join(directory, '{}.db'.format(database_name))
+        self.__path = path
+
+        self.__local = threading.local()
+
+    @property
+    def path(self):
+        """SQLite database file.
+        """
+        return self.__path
+
+    @property
+    def connection(self):
+        """The :class:`sqlite3.Connection` for the current thread.
+        Created on first use along with the :data:`SCHEMA`.
+        """
+        if getattr(self.__local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if (self.path != ':memory:' and directory and
+                    not os.path.isdir(directory)):
+                os.makedirs(directory)
+
+            connection = sqlite3.connect(self.path, timeout=30)
+            if self.path != ':memory:':
+                connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+
+            self.__local.connection = connection
+            self.__local.pid = os.getpid()
+
+        return self.__local.connection
+
+    def version(self):
+        """Log the SQLite version.
+
+        """
+        log.info('SQLite version: %s ready', sqlite3.sqlite_version)
+
+    def initialise(self):
+        """Initialise the SQLite database.
+
+        """
+        log.info('Attempting to create DB: "%s"', self.path)
+        self.connection.commit()
+
+        return [self.database_name]
+
+    def build_graph_collection(self):
+        """Collections are implicit in the :data:`SCHEMA`.
+
+        Returns:
+            list of vertex collection names
+
+        """
+        return list(domain_intel.basestore.VERTEX_COLLECTIONS)
+
+    @contextlib.contextmanager
+    def bulk_writer(self, enabled=True, max_batch_size=None,
+                    flush_interval=None):
+        """Context manager that defers the commit of all
+        :meth:`collection_insert` and :meth:`edge_insert` calls until
+        *max_batch_size* documents have been written or the context
+        exits.  *flush_interval* is ignored.
+
+        """
+        if not enabled:
+            yield None
+            return
+
+        if max_batch_size is None:
+            max_batch_size = CONFIG.get('arango_bulk_size', 500)
+        self.__local.batch_size = int(max_batch_size)
+        self.__local.pending = 0
+        self.__local.batched = True
+        try:
+            yield None
+        finally:
+            self.__local.batched = False
+            self.connection.commit()
+
+    def __commit(self):
+        """Commit the current transaction unless writes are batched
+        via :meth:`bulk_writer`.
+
+        """
+        if not getattr(self.__local, 'batched', False):
+            self.connection.commit()
+            return
+
+        self.__local.pending += 1
+        if self.__local.pending >= self.__local.batch_size:
+            self.connection.commit()
+            self.__local.pending = 0
+
+    def __write(self, table, collection_name, kwargs):
+        """Write the *kwargs* document into *collection_name* as per
+        the :attr:`on_duplicate` policy.  A key is generated if *kwargs*
+        does not provide one.
+
+        Returns:
+            Boolean ``True`` on success.  ``False`` otherwise
+
+        """
+        document = dict(kwargs)
+        key = document.setdefault('_key', uuid.uuid4().hex)
+        document['_id'] = '{}/{}'.format(collection_name, key)
+
+        if self.on_duplicate == 'update':
+            query = 'SELECT document FROM {} WHERE collection = ? AND key = ?'
+            row = self.connection.execute(query.format(table),
+                                          (collection_name, key)).fetchone()
+            if row is not None:
+                current = json.loads(row[0])
+                current.update(document)
+                document = current
+
+        columns = ['collection', 'key', 'document']
+        values = [collection_name, key, json.dumps(document)]
+        if table == 'edge':
+            columns[2:2] = ['from_id', 'to_id']
+            values[2:2] = [document.get('_from'), document.get('_to')]
+
+        statement = '{} {} ({}) VALUES ({})'.format(
+            INSERT_STATEMENTS[self.on_duplicate],
+            table,
+            ', '.join(columns),
+            ', '.join('?' * len(columns)))
+
+        status = False
+        try:
+            self.connection.execute(statement, values)
+            self.__commit()
+            status = True
+        except sqlite3.IntegrityError as err:
+            log.error('%s: %s', err, kwargs)
+
+        return status
+
+    def collection_insert(self, collection_name, kwargs, dry=False):
+        """Insert *kwargs* into vertex *collection_name*.
+
+        Returns:
+            Boolean ``True`` on success.  ``False`` otherwise
+
+        """
+        log.info('Inserting key: "%s" into collection %s',
+                 kwargs.get('_key'), collection_name)
+
+        persist_status = False
+        if not dry and self.known(collection_name, kwargs):
+            persist_status = self.on_duplicate == 'ignore'
+        elif not dry:
+            persist_status = self.__write('vertex', collection_name, kwargs)
+            if persist_status:
+                self.remember(collection_name, kwargs)
+
+        return persist_status
+
+    def edge_insert(self, edge_name, kwargs, dry=False):
+        """Insert *kwargs* into edge collection *edge_name*.
+
+        Returns:
+            Boolean ``True`` on success.  ``False`` otherwise
+
+        """
+        log.info('Inserting key: "%s" into edge %s',
+                 kwargs.get('_key'), edge_name)
+
+        persist_status = False
+        if not dry and self.known(edge_name, kwargs):
+            persist_status = self.on_duplicate == 'ignore'
+        elif not dry:
+            persist_status = self.__write('edge', edge_name, kwargs)
+            if persist_status:
+                self.remember(edge_name, kwargs)
+
+        return persist_status
+
+    def get_collection_count(self, collection_name='domain'):
+        """Get count of all documents in *collection_name*.
+
+        """
+        count = 0
+        for table in ['vertex', 'edge']:
+            row = self.connection.execute(
+                'SELECT COUNT(*) FROM {} WHERE collection = ?'.format(table),
+                (collection_name,)).fetchone()
+            count += row[0]
+
+        return count
+
+    def drop_database(self):
+        """Remove the SQLite database file.
+
+        """
+        log.info('Deleting database "%s"', self.path)
+        self.connection.close()
+        self.__local = threading.local()
+        if self.path != ':memory:':
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+    def export_ids(self, collection_name, **kwargs):
+        """Dump all of the `_id` column values from *collection_name*
+        in key order.  Export partitioning *kwargs* are ignored.
+
+        Returns:
+            generator object that references the label names taken
+            from the *collection_name* collection
+
+        """
+        log.info('Dumping collection "%s" labels', collection_name)
+
+        cursor = self.connection.execute(
+            'SELECT key FROM vertex WHERE collection = ? ORDER BY key',
+            (collection_name,))
+        for row in cursor:
+            yield '{}/{}'.format(collection_name, row[0])
+
+    def document(self, label):
+        """Get the vertex document denoted by *label*.
+
+        Returns:
+            the document as a dictionary or ``None`` if *label* does
+            not exist
+
+        """
+        collection_name, _, key = label.partition('/')
+        row = self.connection.execute(
+            'SELECT document FROM vertex WHERE collection = ? AND key = ?',
+            (collection_name, key)).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def traverse_graph(self, label, as_json=True):
+        """Single-hop traversal of the graph starting at vertex denoted
+        by *label*.  Edges are followed in any direction.
+
+        Returns:
+            the graph structure as a dictionary optionally converted
+            to JSON if *as_json* is set.  ``None`` if *label* does not
+            exist
+
+        """
+        log.debug('Traversing label "%s"', label)
+
+        start = self.document(label)
+        if start is None:
+            log.error('Label "%s" traverse error: vertex not found', label)
+            return None
+
+        result = {
+            'vertices': [start],
+            'paths': [{'edges': [], 'vertices': [start]}],
+        }
+        cursor = self.connection.execute(
+            """SELECT document, from_id, to_id FROM edge
+            WHERE from_id = ?
+            UNION ALL
+            SELECT document, from_id, to_id FROM edge
+            WHERE to_id = ? AND from_id != ?""",
+            (label, label, label))
+        for document, from_id, to_id in cursor.fetchall():
+            vertex = self.document(to_id if from_id == label else from_id)
+            if vertex is None:
+                continue
+
+            edge = json.loads(document)
+            result['vertices'].append(vertex)
+            result['paths'].append({'edges': [edge],
+                                    'vertices': [start, vertex]})
+
+        if as_json:
+            result = json.dumps(result)
+
+        return result
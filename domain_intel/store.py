@@ -1,64 +1,319 @@
 """:class:`Store`
 
 """
+import os
 import json
+import time
+import itertools
+import contextlib
 import arango
 import arango.exceptions
+import arango.http_clients
+import requests.adapters
 import requests.exceptions
 import backoff
 from logga import log
 
 import domain_intel.common
+import domain_intel.basestore
+import domain_intel.bulkwriter
+import domain_intel.exporter
+import domain_intel.spool
+import domain_intel.sqlitestore
 
 CONFIG = domain_intel.common.CONFIG
-COUNTRY_CODES = domain_intel.common.COUNTRY_CODES
+ON_DUPLICATE_POLICIES = domain_intel.basestore.ON_DUPLICATE_POLICIES
+SYSTEM_ATTRIBUTES = domain_intel.basestore.SYSTEM_ATTRIBUTES
+
+# Single-hop traversal of a batch of start vertices that mimics the
+# structure returned by the ArangoDB traversal API.  See
+# :meth:`Store.traverse_many` for the projection placeholders.
+TRAVERSE_MANY_QUERY = """FOR label IN @labels
+    LET start = DOCUMENT(label)
+    FILTER start != null
+    LET root = %(root)s
+    LET hops = (
+        FOR v, e IN 1..1 ANY start %(edges)s
+            RETURN {vertex: %(vertex)s, edge: %(edge)s}
+    )
+    RETURN {
+        label: label,
+        vertices: APPEND([root], hops[*].vertex),
+        paths: APPEND(
+            [{edges: [], vertices: [root]}],
+            (FOR hop IN hops
+                RETURN {edges: [hop.edge], vertices: [root, hop.vertex]})
+        )
+    }"""
+
+# Per-process registry of ArangoDB clients, graphs and collection handles.
+# See :func:`process_registry`.
+_REGISTRY = {}
+
+
+def process_registry():
+    """Registry of ArangoDB objects shared by all :class:`Store` instances
+    within the current process.
+
+    The registry is keyed against the process ID so that the worker
+    processes forked by :class:`domain_intel.WorkerPool` start with an
+    empty registry and never share the parent's HTTP connections.
+
+    Returns:
+        dictionary of the form::
 
+            {
+                'pid': <process_id>,
+                'clients': {<client_key>: <arango.ArangoClient>},
+                'graphs': {<database_name>: <arango.graph.Graph>},
+                'handles': {(<database_name>, <type>, <name>): <handle>},
+                'spools': {<spool_directory>: <domain_intel.spool.Spool>},
+            }
+
+    """
+    pid = os.getpid()
+    if _REGISTRY.get('pid') != pid:
+        _REGISTRY.clear()
+        _REGISTRY.update({
+            'pid': pid,
+            'clients': {},
+            'graphs': {},
+            'handles': {},
+            'spools': {},
+        })
+
+    return _REGISTRY
 
-class Store(object):
+
+def projection_expression(projection, variable):
+    """Build an AQL expression that projects the document referenced by
+    *variable* as per the *projection* spec.  *projection* maps a
+    collection name to the list of document fields to return.  Nested
+    fields are dot separated (for example, ``data.TrafficHistory``).
+
+    The document's system attributes are always returned.  Documents
+    from a collection not in *projection* are reduced to their system
+    attributes.
+
+    Returns:
+        AQL expression string
+
+    """
+    def keep(fields):
+        return 'KEEP({}, {})'.format(variable,
+                                     ', '.join(json.dumps(x) for x in fields))
+
+    def nested(tree, path):
+        items = []
+        for name, subtree in sorted(tree.items()):
+            attribute = path + '[{}]'.format(json.dumps(name))
+            value = attribute if not subtree else nested(subtree, attribute)
+            items.append('{}: {}'.format(json.dumps(name), value))
+
+        return '{' + ', '.join(items) + '}'
+
+    expression = keep(SYSTEM_ATTRIBUTES)
+    for name, fields in sorted(projection.items(), reverse=True):
+        top = [x for x in fields if '.' not in x]
+        collection_expression = keep(SYSTEM_ATTRIBUTES + top)
+
+        tree = {}
+        for field in [x for x in fields if '.' in x]:
+            node = tree
+            for token in field.split('.'):
+                node = node.setdefault(token, {})
+        if tree:
+            collection_expression = 'MERGE({}, {})'.format(
+                collection_expression, nested(tree, variable))
+
+        condition = 'PARSE_IDENTIFIER({}).collection == {}'.format(
+            variable, json.dumps(name))
+        expression = '({} ? {} : {})'.format(condition,
+                                             collection_expression,
+                                             expression)
+
+    return expression
+
+
+class PooledHTTPClient(arango.http_clients.DefaultHTTPClient):
+    """ArangoDB HTTP client with a keep-alive :class:`requests.Session`
+    whose connection pool holds up to *pool_size* connections.
+
+    """
+    def __init__(self, pool_size=10, check_cert=True):
+        super(PooledHTTPClient, self).__init__(use_session=True,
+                                               check_cert=check_cert)
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+
+class Store(domain_intel.basestore.BaseStore):
     """:class:`Store`
 
+    ArangoDB backed :class:`domain_intel.basestore.BaseStore`.
+
     ..attribute:: database_name
         name of the ArangoDB database.  Defaults to 'ipe'
 
+    ..attribute:: on_duplicate
+        conflict policy applied when a document key already exists.  One
+        of ``error`` (default), ``ignore``, ``replace`` or ``update``
+
+    ..attribute:: enable_logging
+        log every ArangoDB API request at debug level.  Disable on hot
+        paths.  Defaults to the ``arango_logging`` config value
+
+    ..attribute:: known_keys
+        cache of keys known to exist that short-circuits inserts.
+        Defaults to the ``known_keys`` config value.  See
+        :meth:`domain_intel.basestore.BaseStore.known`
+
+    ..attribute:: spool_dir
+        directory of the local write-ahead :class:`domain_intel.spool.Spool`
+        that takes inserts while ArangoDB is unavailable or slow.
+        Defaults to the ``arango_spool_dir`` config value.  ``None``
+        disables spooling
+
+    The ArangoDB client (and its pooled HTTP session of
+    ``arango_pool_size`` connections), the graph and the collection
+    handles are shared by all :class:`Store` instances in the process.
+    See :func:`process_registry`.
+
     """
-    def __init__(self, database_name='ipe'):
-        self.__database_name = database_name
+    def __init__(self,
+                 database_name='ipe',
+                 on_duplicate=None,
+                 enable_logging=None,
+                 spool_dir=None,
+                 known_keys=None):
+        super(Store, self).__init__(database_name, on_duplicate, known_keys)
+
+        if enable_logging is None:
+            enable_logging = CONFIG.get('arango_logging', True)
+        self.__enable_logging = enable_logging
+
+        if spool_dir is None:
+            spool_dir = CONFIG.get('arango_spool_dir')
+        self.__spool_dir = spool_dir
+
+        self.__bulk_writer = None
+
+    @property
+    def enable_logging(self):
+        """ArangoDB client per-request logging flag.
+        """
+        return self.__enable_logging
+
+    @property
+    def spool_dir(self):
+        """Local write-ahead spool directory.
+        """
+        return self.__spool_dir
+
+    @property
+    def spool(self):
+        """The :class:`domain_intel.spool.Spool` for :attr:`database_name`
+        or ``None`` if spooling is disabled.  Spools are shared across
+        the process.
+        """
+        if self.spool_dir is None:
+            return None
 
+        directory = os.path.join(self.spool_dir, self.database_name)
+        spools = process_registry()['spools']
+        if directory not in spools:
+            spools[directory] = domain_intel.spool.Spool(directory)
+
+        return spools[directory]
+
+    @property
+    def client(self):
+        """Client access to ArangoDB.  Clients are shared across the
+        process per connection detail and logging setting.
+        """
         client_kwargs = {
             'protocol': 'http',
             'host': CONFIG.get('arango_host'),
             'port': CONFIG.get('arango_port'),
             'username': CONFIG.get('arango_username'),
             'password': CONFIG.get('arango_password'),
-            'enable_logging': True,
+            'enable_logging': self.enable_logging,
         }
-        self.__client = arango.ArangoClient(**client_kwargs)
-        self.__graph = None
+        key = tuple(sorted(client_kwargs.items()))
 
-    @property
-    def database_name(self):
-        """Name of the Arango database.
-        """
-        return self.__database_name
+        clients = process_registry()['clients']
+        if key not in clients:
+            pool_size = int(CONFIG.get('arango_pool_size', 10))
+            log.debug('Creating ArangoDB client with pool size %d',
+                      pool_size)
+            http_client = PooledHTTPClient(pool_size=pool_size)
+            clients[key] = arango.ArangoClient(http_client=http_client,
+                                               **client_kwargs)
 
-    @property
-    def client(self):
-        """Client access to ArangoDB.
-        """
-        return self.__client
+        return clients[key]
 
     @property
     def graph(self):
         """Client access to ArangoDB graph.
         """
-        if self.__graph is None:
-            database = self.__client.db(self.database_name)
+        graphs = process_registry()['graphs']
+        if graphs.get(self.database_name) is None:
+            database = self.client.db(self.database_name)
             try:
-                self.__graph = database.create_graph('domain-intel')
+                graph = database.create_graph('domain-intel')
             except arango.exceptions.GraphCreateError:
-                self.__graph = database.graph('domain-intel')
+                graph = database.graph('domain-intel')
+            graphs[self.database_name] = graph
+
+        return graphs[self.database_name]
+
+    @property
+    def writer(self):
+        """The active :class:`domain_intel.bulkwriter.BulkWriter` that
+        inserts are buffered through or ``None`` if inserts go directly
+        to the store.
+        """
+        return self.__bulk_writer
+
+    def collection(self, collection_name):
+        """Standard (non-graph) collection handle to *collection_name*.
+
+        """
+        return self.__handle('collection', collection_name)
+
+    def vertex_collection(self, collection_name):
+        """Graph vertex collection handle to *collection_name*.
+
+        """
+        return self.__handle('vertex', collection_name)
+
+    def edge_collection(self, edge_name):
+        """Graph edge collection handle to *edge_name*.
+
+        """
+        return self.__handle('edge', edge_name)
+
+    def __handle(self, handle_type, name):
+        """Get the cached *handle_type* handle to *name* from the
+        :func:`process_registry`.  Handle is created on first use.
 
-        return self.__graph
+        """
+        handles = process_registry()['handles']
+        key = (self.database_name, handle_type, name)
+        if key not in handles:
+            if handle_type == 'vertex':
+                handle = self.graph.vertex_collection(name)
+            elif handle_type == 'edge':
+                handle = self.graph.edge_collection(name)
+            else:
+                database = self.client.db(self.database_name)
+                handle = database.collection(name)
+            handles[key] = handle
+
+        return handles[key]
 
     @backoff.on_exception(backoff.expo,
                           (arango.exceptions.ServerVersionError,
@@ -98,19 +353,7 @@ class Store(object):
         """
         collections = []
 
-        collection_names = [
-            'url-info',
-            'geodns',
-            'domain',
-            'country',
-            'link',
-            'subdomain',
-            'url',
-            'ipv4',
-            'ipv6',
-            'traffic',
-            'analyst-qas',
-        ]
+        collection_names = domain_intel.basestore.VERTEX_COLLECTIONS
         for name in collection_names:
             try:
                 collections.append(self.graph.create_vertex_collection(name))
@@ -118,48 +361,7 @@ class Store(object):
                 pass
 
 
-        edge_defs = [
-            {
-                'from': 'domain',
-                'name': 'ranked',
-                'to': 'country',
-            },
-            {
-                'from': 'domain',
-                'name': 'related',
-                'to': 'link',
-            },
-            {
-                'from': 'subdomain',
-                'name': 'contribute',
-                'to': 'domain',
-            },
-            {
-                'from': 'url',
-                'name': 'links_into',
-                'to': 'domain',
-            },
-            {
-                'from': 'domain',
-                'name': 'ipv4_resolves',
-                'to': 'ipv4',
-            },
-            {
-                'from': 'domain',
-                'name': 'ipv6_resolves',
-                'to': 'ipv6',
-            },
-            {
-                'from': 'traffic',
-                'name': 'visit',
-                'to': 'domain',
-            },
-            {
-                'from': 'domain',
-                'name': 'marked',
-                'to': 'analyst-qas',
-            },
-        ]
+        edge_defs = domain_intel.basestore.EDGE_DEFINITIONS
         for edge_def in edge_defs:
             try:
                 self.graph.create_edge_definition(
@@ -172,44 +374,217 @@ class Store(object):
 
         return collections
 
+    @contextlib.contextmanager
+    def bulk_writer(self, enabled=True, max_batch_size=None,
+                    flush_interval=None):
+        """Context manager that buffers all :meth:`collection_insert` and
+        :meth:`edge_insert` calls through a
+        :class:`domain_intel.bulkwriter.BulkWriter`.  Buffers are
+        flushed to the ArangoDB bulk import endpoint once
+        *max_batch_size* documents have been buffered against a collection
+        or *flush_interval* seconds have passed.  Remaining documents are
+        flushed on exit.
+
+        If *enabled* is ``False`` then inserts go directly to the store
+        as per normal and ``None`` is yielded.
+
+        Typical usage::
+
+            >>> store = domain_intel.Store()
+            >>> with store.bulk_writer() as writer:
+            ...     store.collection_insert('domain', {'_key': 'abc.com'})
+            ...
+            >>> writer.counts
+            {'domain': Counter({'created': 1})}
+
+        """
+        if not enabled:
+            yield None
+            return
+
+        writer = domain_intel.bulkwriter.BulkWriter(self,
+                                                    max_batch_size,
+                                                    flush_interval)
+        self.__bulk_writer = writer
+        try:
+            yield writer
+        finally:
+            self.__bulk_writer = None
+            counts = writer.close()
+            log.info('Bulk writer counts: %s', counts)
+
     def collection_insert(self, collection_name, kwargs, dry=False):
         """Insert *kwargs* into *collection_name*.
 
+        If a :meth:`bulk_writer` is active then *kwargs* is buffered
+        for bulk import instead.  Otherwise, if :attr:`on_duplicate` is
+        other than ``error`` the conflict is resolved by the server in
+        the same request (see :meth:`upsert`).
+
+        If a :attr:`spool` is configured then *kwargs* is spooled
+        whenever ArangoDB is unavailable or slow (see :meth:`spooled`).
+
         Returns:
             Boolean try on success.  False otherwise
 
         """
-        persist_status = False
-        collection = self.graph.vertex_collection(collection_name)
-        log.info('Inserting key: "%s" into collection %s',
-                 kwargs.get('_key'), collection_name)
-        if not dry:
+        def insert():
+            status = False
+            collection = self.vertex_collection(collection_name)
             try:
                 collection.insert(kwargs)
-                persist_status = True
+                status = True
             except arango.exceptions.DocumentInsertError as err:
+                if (self.spool is not None and
+                        domain_intel.spool.unavailable(err)):
+                    raise
                 log.error('%s: %s', err, kwargs)
 
+            return status
+
+        persist_status = False
+        log.info('Inserting key: "%s" into collection %s',
+                 kwargs.get('_key'), collection_name)
+        if not dry and self.known(collection_name, kwargs):
+            persist_status = self.on_duplicate == 'ignore'
+        elif not dry and self.writer is not None:
+            self.writer.add(collection_name, kwargs)
+            persist_status = True
+        elif not dry and self.on_duplicate != 'error':
+            persist_status = self.spooled(collection_name,
+                                          kwargs,
+                                          self.upsert,
+                                          collection_name,
+                                          kwargs)
+        elif not dry:
+            persist_status = self.spooled(collection_name, kwargs, insert)
+
         return persist_status
 
     def edge_insert(self, edge_name, kwargs, dry=False):
         """Manage an ArangoDB edge insert.
 
-        """
-        persist_status = False
+        If a :meth:`bulk_writer` is active then *kwargs* is buffered
+        for bulk import instead.  Otherwise, if :attr:`on_duplicate` is
+        other than ``error`` the conflict is resolved by the server in
+        the same request (see :meth:`upsert`).
 
-        edge = self.graph.edge_collection(edge_name)
-        log.info('Inserting key: "%s" into edge %s',
-                 kwargs.get('_key'), edge_name)
-        if not dry:
+        If a :attr:`spool` is configured then *kwargs* is spooled
+        whenever ArangoDB is unavailable or slow (see :meth:`spooled`).
+
+        """
+        def insert():
+            status = False
+            edge = self.edge_collection(edge_name)
             try:
                 edge.insert(kwargs)
-                persist_status = True
+                status = True
             except arango.ArangoError as err:
+                if (self.spool is not None and
+                        domain_intel.spool.unavailable(err)):
+                    raise
                 log.error('%s: %s', err, kwargs)
 
+            return status
+
+        persist_status = False
+
+        log.info('Inserting key: "%s" into edge %s',
+                 kwargs.get('_key'), edge_name)
+        if not dry and self.known(edge_name, kwargs):
+            persist_status = self.on_duplicate == 'ignore'
+        elif not dry and self.writer is not None:
+            self.writer.add(edge_name, kwargs)
+            persist_status = True
+        elif not dry and self.on_duplicate != 'error':
+            persist_status = self.spooled(edge_name,
+                                          kwargs,
+                                          self.upsert,
+                                          edge_name,
+                                          kwargs)
+        elif not dry:
+            persist_status = self.spooled(edge_name, kwargs, insert)
+
         return persist_status
 
+    def spooled(self, collection_name, kwargs, insert, *args):
+        """Call *insert* with *args* to write *kwargs* into
+        *collection_name* under the watch of the :attr:`spool`.
+
+        *kwargs* is appended to the spool instead if the spool is
+        :attr:`domain_intel.spool.Spool.degraded` or if *insert* raises
+        an error that flags ArangoDB as unavailable.  The elapsed time
+        of each *insert* call is recorded against the spool latency
+        threshold.  The spool drainer is started on first use.
+
+        If spooling is disabled then this is a straight call to *insert*.
+
+        The *kwargs* key is added to the known-key cache (see
+        :meth:`remember`) only if *insert* succeeds.  Spooled keys are
+        not remembered.
+
+        Returns:
+            the *insert* return value or ``True`` if *kwargs* was spooled
+
+        """
+        spool = self.spool
+        if spool is not None:
+            spool.start_drainer(self)
+            if spool.degraded:
+                return spool.append(collection_name, kwargs)
+
+        start = time.time()
+        try:
+            status = insert(*args)
+        except domain_intel.spool.STORE_ERRORS as err:
+            if spool is None or not domain_intel.spool.unavailable(err):
+                raise
+            log.warning('Spooling key "%s" for %s: %s',
+                        kwargs.get('_key'), collection_name, err)
+            spool.record(failed=True)
+            return spool.append(collection_name, kwargs)
+
+        if spool is not None:
+            spool.record(elapsed=time.time() - start)
+
+        if status:
+            self.remember(collection_name, kwargs)
+
+        return status
+
+    def upsert(self, collection_name, kwargs):
+        """Write *kwargs* into *collection_name* in a single request with
+        existing keys handled as per the :attr:`on_duplicate` policy.
+
+        Works for both vertex and edge collections.
+
+        Returns:
+            Boolean ``True`` if the document was created, replaced,
+            updated or ignored.  ``False`` otherwise
+
+        """
+        kwargs_import = {
+            'halt_on_error': False,
+            'details': True,
+            'on_duplicate': self.on_duplicate,
+        }
+        collection = self.collection(collection_name)
+        try:
+            result = collection.import_bulk([kwargs], **kwargs_import)
+        except arango.exceptions.DocumentInsertError as err:
+            if (self.spool is not None and
+                    domain_intel.spool.unavailable(err)):
+                raise
+            log.error('Key "%s" upsert into %s error: %s',
+                      kwargs.get('_key'), collection_name, err)
+            return False
+
+        for detail in result.get('details', []):
+            log.error('Key "%s" upsert into %s error: %s',
+                      kwargs.get('_key'), collection_name, detail)
+
+        return not result.get('errors')
+
     def get_collection_count(self, collection_name='domain'):
         """Get count of all documents in *collection_name*.
 
@@ -222,9 +597,7 @@ class Store(object):
 
         """
         count = None
-        database = self.client.db(self.database_name)
-        collection = database.collection(collection_name)
-        count = collection.count()
+        count = self.collection(collection_name).count()
 
         return count
 
@@ -236,24 +609,39 @@ class Store(object):
         log.info('Deleting database "%s"', self.database_name)
         self.client.delete_database(self.database_name)
 
-    def persist_country_codes(self, dry=False):
-        """Pre-load required country code information.
+        registry = process_registry()
+        registry['graphs'].pop(self.database_name, None)
+        for key in list(registry['handles'].keys()):
+            if key[0] == self.database_name:
+                del registry['handles'][key]
+
+    def aql(self, query, bind_vars=None, batch_size=None):
+        """Execute the AQL *query* against :attr:`database_name` with
+        optional *bind_vars*.  *batch_size* controls the number of
+        results returned per server round trip.
+
+        Returns:
+            :class:`arango.cursor.Cursor` over the query results
 
         """
-        collection_count = 0
+        database = self.client.db(self.database_name)
 
-        for country_code, country_name in COUNTRY_CODES.items():
-            kwargs = {
-                '_key': country_code.upper(),
-                'name': country_name,
-            }
-            if self.collection_insert('country', kwargs, dry=dry):
-                collection_count += 1
+        return database.aql.execute(query,
+                                    bind_vars=bind_vars,
+                                    batch_size=batch_size)
 
-        return collection_count
+    def export_ids(self,
+                   collection_name,
+                   partitions=None,
+                   batch_size=None,
+                   checkpoint=None):
+        """Dump all of the `_id` column values from *collection_name*.
 
-    def export_ids(self, collection_name):
-        """Dump all of the `_id` column values from *collection_name*
+        The collection is split into *partitions* key ranges that are
+        exported in parallel with *batch_size* `_id` values fetched per
+        query.  If *checkpoint* is a file path then export progress is
+        saved so that an interrupted export resumes from where it
+        stopped.  See :class:`domain_intel.exporter.Exporter`.
 
         Returns:
             generator object that references the label names taken
@@ -262,13 +650,13 @@ class Store(object):
         """
         log.info('Dumping collection "%s" labels', collection_name)
 
-        database = self.client.db(self.database_name)
-        collection = database.collection(collection_name)
-        cursor = collection.export(flush=True, filter_fields=['_id'])
-
-        while True:
-            value = cursor.next()
-            yield value.get('_id')
+        exporter = domain_intel.exporter.Exporter(self,
+                                                  collection_name,
+                                                  partitions=partitions,
+                                                  batch_size=batch_size,
+                                                  checkpoint=checkpoint)
+        for _id in exporter:
+            yield _id
 
     def traverse_graph(self, label, as_json=True):
         """Traverse the :attr:`graph` starting at vertex denoted by
@@ -293,3 +681,97 @@ class Store(object):
             result = json.dumps(result)
 
         return result
+
+    def traverse_many(self,
+                      labels,
+                      batch_size=None,
+                      projection=None,
+                      edge_collections=None,
+                      as_json=True,
+                      halt_on_error=False):
+        """Single-hop traversal of the :attr:`graph` for each vertex
+        in *labels*.  Each batch of *batch_size* start vertices is
+        resolved in the one AQL query.
+
+        A batch that fails is logged and skipped unless *halt_on_error*
+        is set, in which case the AQL error is raised.
+
+        If a *projection* spec is provided then only the named fields
+        of each vertex and edge are returned.  See
+        :func:`projection_expression`.
+
+        The traversal can be limited to the *edge_collections* list
+        of edge collection names.  Otherwise, all edges in the
+        :attr:`graph` are followed.
+
+        Labels that do not reference an existing vertex are skipped.
+
+        Returns:
+            generator of (<label>, <traversal>) tuples where the
+            traversal is as per :meth:`traverse_graph`
+
+        """
+        if batch_size is None:
+            batch_size = CONFIG.get('arango_traverse_batch_size', 100)
+
+        expressions = {'root': 'start', 'vertex': 'v', 'edge': 'e'}
+        if projection is not None:
+            for key, variable in expressions.items():
+                expressions[key] = projection_expression(projection, variable)
+
+        bind_vars = {}
+        if edge_collections is None:
+            expressions['edges'] = 'GRAPH @graph'
+            bind_vars['graph'] = 'domain-intel'
+        else:
+            expressions['edges'] = ', '.join('`{}`'.format(x)
+                                             for x in edge_collections)
+        query = TRAVERSE_MANY_QUERY % expressions
+
+        labels = iter(labels)
+        while True:
+            batch = list(itertools.islice(labels, batch_size))
+            if not batch:
+                break
+            log.debug('Traversing batch of %d labels', len(batch))
+
+            bind_vars['labels'] = batch
+            try:
+                cursor = self.aql(query, bind_vars, batch_size)
+            except arango.exceptions.AQLQueryExecuteError as err:
+                log.error('Batch traverse of %d labels error: %s',
+                          len(batch), err)
+                if halt_on_error:
+                    raise
+                continue
+
+            for traversal in cursor:
+                label = traversal.pop('label')
+                if as_json:
+                    traversal = json.dumps(traversal)
+                yield (label, traversal)
+
+
+def get_store(database_name='ipe', backend=None, **kwargs):
+    """Persistent store factory.
+
+    *backend* is one of the :data:`BACKENDS` names.  Defaults to the
+    ``store_backend`` config value (or ``arango`` if not set).  *kwargs*
+    are passed through to the backend constructor.
+
+    Returns:
+        :class:`domain_intel.basestore.BaseStore` instance
+
+    """
+    if backend is None:
+        backend = CONFIG.get('store_backend', 'arango')
+    if backend not in BACKENDS:
+        raise ValueError('Unknown store backend "{}"'.format(backend))
+
+    return BACKENDS[backend](database_name, **kwargs)
+
+
+BACKENDS = {
+    'arango': Store,
+    'sqlite': domain_intel.sqlitestore.SqliteStore,
+}
@@ -0,0 +1,212 @@
+""":class:`domain_intel.bulkwriter.BulkWriter` unit test cases.
+
+"""
+import mock
+import pytest
+import arango.exceptions
+
+import domain_intel.bulkwriter
+
+
+def test_bulkwriter_init():
+    """Initialise a domain_intel.bulkwriter.BulkWriter object.
+    """
+    # When I initialise a BulkWriter object
+    writer = domain_intel.bulkwriter.BulkWriter(None)
+
+    # I should get a domain_intel.bulkwriter.BulkWriter instance
+    msg = 'Object is not a domain_intel.bulkwriter.BulkWriter instance'
+    assert isinstance(writer, domain_intel.bulkwriter.BulkWriter), msg
+
+
+def test_bulkwriter_flush_on_size():
+    """Bulk writer flush when the batch size threshold is breached.
+    """
+    # Given a store
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.return_value = {'created': 2, 'errors': 0}
+
+    # and a bulk writer with a batch size of 2
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=2,
+                                                flush_interval=3600)
+
+    # when I add 3 documents
+    for key in ['a.com', 'b.com', 'c.com']:
+        writer.add('domain', {'_key': key})
+
+    # then a single bulk import should be sent
+    msg = 'Bulk import call count error'
+    assert import_bulk.call_count == 1, msg
+
+    # and the remaining document should be pending
+    msg = 'Bulk writer pending count error'
+    assert writer.pending('domain') == 1, msg
+
+
+def test_bulkwriter_close():
+    """Bulk writer close flushes all collection buffers.
+    """
+    # Given a store
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.return_value = {'created': 1, 'errors': 1}
+
+    # and a bulk writer with buffered vertices and edges
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=100,
+                                                flush_interval=3600)
+    writer.add('domain', {'_key': 'a.com'})
+    writer.add('domain', {'_key': 'a.com'})
+    writer.add('ranked', {'_key': 'a.com:AU',
+                          '_from': 'domain/a.com',
+                          '_to': 'country/AU'})
+
+    # when I close the writer
+    received = writer.close()
+
+    # then each collection should be imported
+    msg = 'Bulk import call count on close error'
+    assert import_bulk.call_count == 2, msg
+
+    # and I should receive per-collection counts
+    msg = 'Bulk writer counts error'
+    assert received['domain']['created'] == 1, msg
+    assert received['domain']['errors'] == 1, msg
+    assert not writer.pending(), msg
+
+
+def test_bulkwriter_import_failure():
+    """A failed bulk import raises so that offsets are not committed.
+    """
+    # Given a store that cannot import
+    store = mock.Mock()
+    store.spool = None
+    import_bulk = store.collection.return_value.import_bulk
+    error = arango.exceptions.DocumentInsertError('import failed')
+    import_bulk.side_effect = error
+
+    # and a bulk writer with a buffered document
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=100,
+                                                flush_interval=3600)
+    writer.add('domain', {'_key': 'a.com'})
+
+    # when I flush the writer
+    # then the failure should be raised
+    with pytest.raises(domain_intel.bulkwriter.BulkImportError):
+        writer.flush()
+
+    # and the documents should be counted as errors
+    msg = 'Failed bulk import error count error'
+    assert writer.counts['domain']['errors'] == 1, msg
+
+
+def test_bulkwriter_remember_imported():
+    """Only imported document keys are remembered.
+    """
+    # Given a store that rejects the second of 3 documents
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.return_value = {
+        'created': 1,
+        'errors': 2,
+        'details': [
+            'at position 1: creating document failed: bad document',
+            'at position 2: creating document failed: unique constraint '
+            'violated - in index primary',
+        ],
+    }
+
+    # and a bulk writer with the buffered documents
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=100,
+                                                flush_interval=3600)
+    for key in ['a.com', 'b.com', 'c.com']:
+        writer.add('domain', {'_key': key})
+
+    # when I flush the writer
+    writer.flush()
+
+    # then the created and existing keys should be remembered
+    msg = 'Remembered bulk import keys error'
+    received = [x[0][1]['_key'] for x in store.remember.call_args_list]
+    assert received == ['a.com', 'c.com'], msg
+
+
+def test_bulkwriter_no_remember_on_failure():
+    """Keys of a failed bulk import are not remembered.
+    """
+    # Given a store that cannot import
+    store = mock.Mock()
+    store.spool = None
+    import_bulk = store.collection.return_value.import_bulk
+    error = arango.exceptions.DocumentInsertError('import failed')
+    import_bulk.side_effect = error
+
+    # and a bulk writer with a buffered document
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=100,
+                                                flush_interval=3600)
+    writer.add('domain', {'_key': 'a.com'})
+
+    # when I flush the writer
+    with pytest.raises(domain_intel.bulkwriter.BulkImportError):
+        writer.flush()
+
+    # then no keys should be remembered
+    msg = 'Failed bulk import keys should not be remembered'
+    assert not store.remember.called, msg
+
+
+@mock.patch('domain_intel.bulkwriter.time')
+def test_bulkwriter_flush_stale(mock_time):
+    """Bulk writer flushes the buffers that have aged while idle.
+    """
+    # Given a store
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.return_value = {'created': 1, 'errors': 0}
+
+    # and a bulk writer with a 5 second flush interval
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=100,
+                                                flush_interval=5)
+
+    # and a domain buffered 10 seconds ago and a link buffered now
+    mock_time.time.return_value = 100
+    writer.add('domain', {'_key': 'a.com'})
+    mock_time.time.return_value = 110
+    writer.add('link', {'_key': 'abc'})
+
+    # when I flush the stale buffers
+    received = writer.flush_stale()
+
+    # then only the aged buffer should be flushed
+    msg = 'Stale bulk writer flush error'
+    assert list(received.keys()) == ['domain'], msg
+    assert not writer.pending('domain'), msg
+    assert writer.pending('link') == 1, msg
+
+
+def test_bulkwriter_stored():
+    """Count of the documents a collection's bulk imports stored.
+    """
+    # Given a store that creates, updates and rejects documents
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.return_value = {'created': 2, 'updated': 1, 'errors': 1}
+
+    # and a bulk writer that has flushed a collection
+    writer = domain_intel.bulkwriter.BulkWriter(store,
+                                                max_batch_size=100,
+                                                flush_interval=3600)
+    writer.add('visit', {'_key': 'a.com'})
+    writer.flush()
+
+    # when I check the stored counts
+    # then the created and updated documents should be counted
+    msg = 'Bulk writer stored count error'
+    assert writer.stored('visit') == 3, msg
+    assert writer.stored('ranked') == 0, msg
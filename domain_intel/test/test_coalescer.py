@@ -0,0 +1,145 @@
+""":class:`domain_intel.pipeline.coalescer.BatchCoalescer` unit test cases.
+
+"""
+import os
+import threading
+import mock
+import pytest
+
+import domain_intel.workerpool
+from domain_intel.pipeline.coalescer import BatchCoalescer
+
+
+class Dispatcher(object):
+    """Dispatch stand-in that records each batch.
+    """
+    def __init__(self, status=True):
+        self.status = status
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, domains, done):
+        with self.lock:
+            self.batches.append(domains)
+        done(self.status)
+
+
+def test_batch_coalescer_init():
+    """Initialise a BatchCoalescer object.
+    """
+    # When I initialise a BatchCoalescer object
+    coalescer = BatchCoalescer(2)
+
+    # I should get a BatchCoalescer instance
+    msg = 'Object is not a BatchCoalescer instance'
+    assert isinstance(coalescer, BatchCoalescer), msg
+
+    # that fills AWIS UrlInfo batches
+    msg = 'Default batch size should be MAX_BATCH_REQUESTS'
+    assert coalescer.batch_size == 5, msg
+
+
+def test_batch_coalescer_across_workers():
+    """Domains from separate workers are coalesced into a full batch.
+    """
+    # Given a coalescer for 2 workers
+    coalescer = BatchCoalescer(2, deadline=10)
+    dispatcher = Dispatcher()
+
+    # when each worker submits a partial batch
+    submissions = [['a.com', 'b.com', 'c.com'], ['d.com', 'e.com']]
+    with coalescer.running(dispatcher):
+        pids = []
+        for slot, domains in enumerate(submissions):
+            pid = os.fork()
+            if not pid:
+                channel = domain_intel.workerpool.WorkerChannel(slot, None, 2)
+                domain_intel.workerpool._CHANNEL = channel
+                os._exit(coalescer.submit(domains))
+            pids.append(pid)
+
+        statuses = [os.waitpid(x, 0)[1] for x in pids]
+
+    # then a single full batch should be dispatched
+    msg = 'Coalesced batch error'
+    received = sorted(x for batch in dispatcher.batches for x in batch)
+    assert len(dispatcher.batches) == 1, msg
+    assert received == ['a.com', 'b.com', 'c.com', 'd.com', 'e.com'], msg
+
+    # and each worker should be acknowledged for its domains
+    msg = 'Worker published count error'
+    assert [os.WEXITSTATUS(x) for x in statuses] == [3, 2], msg
+
+    # and the batches counted
+    msg = 'Coalesced batch counts error'
+    assert coalescer.report() == {'domains': 5, 'full': 1}, msg
+
+
+def test_batch_coalescer_deadline():
+    """Partial batch is dispatched once the deadline passes.
+    """
+    # Given a coalescer with a short deadline
+    coalescer = BatchCoalescer(1, deadline=0.05)
+    dispatcher = Dispatcher()
+
+    # when I submit fewer domains than a full batch
+    with coalescer.running(dispatcher):
+        received = coalescer.submit(['a.com', 'b.com'])
+
+    # then the partial batch should be dispatched
+    msg = 'Partial batch dispatch error'
+    assert dispatcher.batches == [['a.com', 'b.com']], msg
+
+    # and the domains acknowledged as published
+    msg = 'Partial batch published count error'
+    assert received == 2, msg
+
+
+def test_batch_coalescer_full_batches():
+    """Submissions are split into full batches.
+    """
+    # Given a coalescer
+    coalescer = BatchCoalescer(1, deadline=0.05)
+    dispatcher = Dispatcher(status=False)
+
+    # when I submit 7 domains that are not published
+    domains = ['{}.com'.format(x) for x in 'abcdefg']
+    with coalescer.running(dispatcher):
+        received = coalescer.submit(domains)
+
+    # then a full and a partial batch should be dispatched
+    msg = 'Batch split error'
+    assert [len(x) for x in dispatcher.batches] == [5, 2], msg
+
+    # and no domains acknowledged as published
+    msg = 'Unpublished count error'
+    assert received == 0, msg
+
+
+def test_batch_coalescer_ack_timeout():
+    """Worker gives up on a dispatch that is not acknowledged.
+    """
+    # Given a coalescer that is not running
+    coalescer = BatchCoalescer(1, ack_timeout=0.05)
+
+    # when I submit domains
+    # then I should receive a RuntimeError
+    with pytest.raises(RuntimeError):
+        coalescer.submit(['a.com'])
+
+
+@mock.patch('domain_intel.pipeline.coalescer.ACK_POLL_INTERVAL', 0.02)
+@mock.patch('domain_intel.workerpool.heartbeat')
+def test_batch_coalescer_ack_heartbeat(mock_heartbeat):
+    """Worker heartbeats while it waits on an acknowledgement.
+    """
+    # Given a coalescer that is not running
+    coalescer = BatchCoalescer(1, ack_timeout=0.2)
+
+    # when I submit domains
+    with pytest.raises(RuntimeError):
+        coalescer.submit(['a.com'])
+
+    # then the worker should heartbeat while it waits
+    msg = 'Worker should heartbeat while awaiting acknowledgement'
+    assert mock_heartbeat.call_count > 1, msg
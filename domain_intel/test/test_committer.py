@@ -0,0 +1,186 @@
+""":class:`domain_intel.pipeline.committer.OffsetCommitter` unit test cases.
+
+"""
+import mock
+import pytest
+import kafka.structs
+
+from domain_intel.pipeline.committer import OffsetCommitter
+from domain_intel.pipeline.producer import DeliveryError, TrackedProducer
+
+
+def record(partition, offset, topic='t'):
+    """Consumer record stand-in.
+    """
+    return mock.Mock(topic=topic, partition=partition, offset=offset)
+
+
+def test_committer_init():
+    """Initialise an OffsetCommitter object.
+    """
+    # When I initialise a OffsetCommitter object
+    committer = OffsetCommitter(mock.Mock())
+
+    # I should get an OffsetCommitter instance
+    msg = 'Object is not an OffsetCommitter instance'
+    assert isinstance(committer, OffsetCommitter), msg
+
+
+def test_committer_interval_records():
+    """Asynchronous commit once the record interval is breached.
+    """
+    # Given a consumer
+    consumer = mock.Mock()
+
+    # and a committer that commits every 3 records
+    flush = mock.Mock()
+    committer = OffsetCommitter(consumer,
+                                flush=[flush],
+                                interval_records=3,
+                                interval_ms=60000)
+
+    # when I process 2 records
+    committer.processed([record(0, 10), record(0, 11)])
+
+    # then no commit should be issued
+    msg = 'Commit before record interval breach'
+    assert not consumer.commit_async.called, msg
+
+    # when I process another record
+    committer.processed([record(1, 4)])
+
+    # then the downstream writes should be flushed
+    msg = 'Flush before commit error'
+    assert flush.called, msg
+
+    # and the next offsets should be committed asynchronously
+    msg = 'Asynchronous commit offsets error'
+    offsets = consumer.commit_async.call_args[1]['offsets']
+    expected = {
+        kafka.structs.TopicPartition('t', 0): 12,
+        kafka.structs.TopicPartition('t', 1): 5,
+    }
+    assert {k: v.offset for k, v in offsets.items()} == expected, msg
+
+
+def test_committer_interval_ms():
+    """Asynchronous commit once the time interval is breached.
+    """
+    # Given a committer that commits on every call
+    consumer = mock.Mock()
+    committer = OffsetCommitter(consumer,
+                                interval_records=1000,
+                                interval_ms=0)
+
+    # when I process a record
+    committer.processed([record(0, 0)])
+
+    # then an asynchronous commit should be issued
+    msg = 'Time interval commit error'
+    assert consumer.commit_async.called, msg
+
+
+def test_committer_close():
+    """Synchronous commit of pending offsets on close.
+    """
+    # Given a committer with a pending record
+    consumer = mock.Mock()
+    committer = OffsetCommitter(consumer,
+                                interval_records=1000,
+                                interval_ms=60000)
+    committer.processed([record(0, 0)])
+
+    # when I close the committer
+    committer.close()
+
+    # then the pending offsets should be committed synchronously
+    msg = 'Close should commit synchronously'
+    assert consumer.commit.called, msg
+    assert committer.counts['commits'] == 1, msg
+
+    # and a subsequent close should not commit again
+    committer.close()
+    msg = 'Close without pending records should not commit'
+    assert consumer.commit.call_count == 1, msg
+
+
+def test_committer_async_failure():
+    """Failed asynchronous commits are counted.
+    """
+    # Given a committer
+    consumer = mock.Mock()
+    committer = OffsetCommitter(consumer, interval_records=1)
+
+    # when an asynchronous commit fails
+    committer.processed([record(0, 0)])
+    callback = consumer.commit_async.call_args[1]['callback']
+    callback({}, Exception('commit failed'))
+
+    # then the failure should be counted
+    msg = 'Commit failure count error'
+    assert committer.counts['failures'] == 1, msg
+
+
+def test_committer_flush_failure():
+    """A failed downstream flush aborts the commit.
+    """
+    # Given a producer with a failed send
+    kafka_producer = mock.Mock()
+    producer = TrackedProducer(kafka_producer)
+    future = kafka_producer.send.return_value
+    producer.send('t', b'1')
+    errback, topic = future.add_errback.call_args[0]
+    errback(topic, Exception('broker down'))
+
+    # and a committer that flushes the producer
+    consumer = mock.Mock()
+    committer = OffsetCommitter(consumer,
+                                flush=[producer.flush],
+                                interval_records=1000,
+                                interval_ms=60000)
+    committer.processed([record(0, 0)])
+
+    # when I close the committer
+    with pytest.raises(DeliveryError):
+        committer.close()
+
+    # then no offsets should be committed
+    msg = 'Offsets committed after a failed send'
+    assert not consumer.commit.called, msg
+    assert committer.counts['aborted'] == 1, msg
+
+
+def test_committer_commit_after_flush_failure():
+    """A failed send only aborts the commit of its own window.
+    """
+    # Given a producer that flags its sends via the delivery callbacks
+    kafka_producer = mock.Mock()
+    producer = TrackedProducer(kafka_producer)
+    future = kafka_producer.send.return_value
+
+    # and a committer that flushes the producer
+    consumer = mock.Mock()
+    committer = OffsetCommitter(consumer,
+                                flush=[producer.flush],
+                                interval_records=1000,
+                                interval_ms=60000)
+
+    # and a failed send that aborts a commit
+    producer.send('t', b'1')
+    errback, topic = future.add_errback.call_args[0]
+    errback(topic, Exception('broker down'))
+    committer.processed([record(0, 0)])
+    with pytest.raises(DeliveryError):
+        committer.commit(sync=True)
+
+    # when a later send is delivered
+    producer.send('t', b'2')
+    callback, topic = future.add_callback.call_args[0]
+    callback(topic, None)
+    committer.processed([record(0, 1)])
+
+    # then the later commit should go through
+    committer.commit(sync=True)
+    msg = 'Commit after a failed window should go through'
+    assert consumer.commit.call_count == 1, msg
+    assert committer.counts['commits'] == 1, msg
@@ -0,0 +1,111 @@
+""":mod:`domain_intel.envelope` unit test cases.
+
+"""
+import json
+import pytest
+
+import domain_intel.envelope
+
+
+def test_envelope_roundtrip():
+    """Encode and decode an enveloped payload.
+    """
+    # Given a payload
+    payload = {'domain': 'abc.com', 'urls': [{'title': 'x.com'}]}
+
+    # when I wrap the payload in an envelope
+    value = domain_intel.envelope.encode('siteslinkingin',
+                                         payload,
+                                         key=b'abc.com',
+                                         produced_at=1500000000000)
+
+    # and decode the envelope
+    received = domain_intel.envelope.decode(value)
+
+    # then I should receive the original envelope fields
+    msg = 'Envelope roundtrip error'
+    expected = domain_intel.envelope.Envelope('siteslinkingin',
+                                              b'abc.com',
+                                              1500000000000,
+                                              payload)
+    assert received == expected, msg
+
+
+def test_envelope_compressed():
+    """Encode and decode a compressed envelope.
+    """
+    # Given a repetitive payload
+    payload = {'urls': ['https://abc.com/page'] * 100}
+
+    # when I wrap the payload in a zlib compressed envelope
+    value = domain_intel.envelope.encode('siteslinkingin',
+                                         payload,
+                                         compression='zlib')
+
+    # then the envelope should be smaller than the JSON text
+    msg = 'Compressed envelope size error'
+    assert len(value) < len(json.dumps(payload)), msg
+
+    # and should decode to the original payload
+    msg = 'Compressed envelope roundtrip error'
+    assert domain_intel.envelope.loads(value) == payload, msg
+
+
+def test_envelope_msgpack():
+    """Encode and decode a msgpack envelope.
+    """
+    pytest.importorskip('msgpack')
+
+    # Given a payload with raw bytes
+    payload = {'data': b'\x00\xff'}
+
+    # when I roundtrip a msgpack envelope
+    value = domain_intel.envelope.encode('checkhostnet',
+                                         payload,
+                                         codec='msgpack')
+    received = domain_intel.envelope.loads(value)
+
+    # then I should receive the original payload
+    msg = 'msgpack envelope roundtrip error'
+    assert received == payload, msg
+
+
+def test_envelope_legacy():
+    """Decode a legacy JSON message.
+    """
+    # Given a legacy JSON message
+    value = b'{"domain": "abc.com"}'
+
+    # when I decode the message
+    received = domain_intel.envelope.decode(value)
+
+    # then the raw message should be the payload
+    msg = 'Legacy envelope decode error'
+    assert received == (None, None, None, value), msg
+
+    # and loads should parse the JSON
+    msg = 'Legacy JSON payload error'
+    assert domain_intel.envelope.loads(value) == {'domain': 'abc.com'}, msg
+
+
+def test_envelope_unavailable_codec():
+    """Encode with a codec that is not available.
+    """
+    msg = 'Unavailable codec should raise EnvelopeError'
+    with pytest.raises(domain_intel.envelope.EnvelopeError):
+        domain_intel.envelope.encode('dns', {}, codec='banana')
+        assert False, msg
+
+
+def test_envelope_unsupported_version():
+    """Decode an envelope from a later version.
+    """
+    # Given an envelope with a bumped version
+    value = bytearray(domain_intel.envelope.encode('dns', {}))
+    value[3] = domain_intel.envelope.VERSION + 1
+
+    # when I decode the envelope
+    msg = 'Unsupported envelope version should raise EnvelopeError'
+    with pytest.raises(domain_intel.envelope.EnvelopeError):
+        domain_intel.envelope.decode(bytes(value))
+        assert False, msg
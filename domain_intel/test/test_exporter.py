@@ -0,0 +1,116 @@
+""":class:`domain_intel.exporter.Exporter` unit test cases.
+
+"""
+import os
+import json
+import mock
+
+import domain_intel.exporter
+
+KEYS = sorted('domain{:03d}.com'.format(x) for x in range(25))
+
+
+def fake_aql(query, bind_vars, batch_size=None):
+    """Mimic the exporter's AQL key queries against :data:`KEYS`.
+    """
+    if 'offset' in bind_vars:
+        return KEYS[bind_vars['offset']:bind_vars['offset'] + 1]
+
+    keys = KEYS
+    if 'after' in bind_vars:
+        keys = [x for x in keys if x > bind_vars['after']]
+    if 'lower' in bind_vars:
+        keys = [x for x in keys if x >= bind_vars['lower']]
+    if 'upper' in bind_vars:
+        keys = [x for x in keys if x < bind_vars['upper']]
+
+    return ['domain/{}'.format(x) for x in keys[:bind_vars['batch_size']]]
+
+
+def mock_store():
+    """Store that holds :data:`KEYS` in its "domain" collection.
+    """
+    store = mock.Mock()
+    store.get_collection_count.return_value = len(KEYS)
+    store.aql.side_effect = fake_aql
+
+    return store
+
+
+def test_exporter_init():
+    """Initialise a domain_intel.exporter.Exporter object.
+    """
+    # When I initialise an Exporter object
+    exporter = domain_intel.exporter.Exporter(None, 'domain')
+
+    # I should get a domain_intel.exporter.Exporter instance
+    msg = 'Object is not a domain_intel.exporter.Exporter instance'
+    assert isinstance(exporter, domain_intel.exporter.Exporter), msg
+
+
+def test_exporter_partitioned_export():
+    """Export a collection across multiple partitions.
+    """
+    # Given a store with a populated collection
+    store = mock_store()
+
+    # and an exporter with 3 partitions
+    exporter = domain_intel.exporter.Exporter(store,
+                                              'domain',
+                                              partitions=3,
+                                              batch_size=4)
+
+    # when I export the collection
+    received = list(exporter)
+
+    # then I should receive every _id exactly once
+    msg = 'Partitioned export _id list error'
+    expected = ['domain/{}'.format(x) for x in KEYS]
+    assert sorted(received) == expected, msg
+
+    # and the key space should be split into 3 ranges
+    msg = 'Partitioned export key range count error'
+    assert len(exporter.ranges) == 3, msg
+
+
+def test_exporter_resume_from_checkpoint(tmpdir):
+    """Resume an interrupted export from its checkpoint.
+    """
+    # Given a store with a populated collection
+    store = mock_store()
+
+    # and a checkpoint file
+    checkpoint = os.path.join(str(tmpdir), 'domain.checkpoint')
+
+    # and an export that is interrupted part way through
+    exporter = domain_intel.exporter.Exporter(store,
+                                              'domain',
+                                              partitions=1,
+                                              batch_size=5,
+                                              checkpoint=checkpoint)
+    export = iter(exporter)
+    first_run = [next(export) for _ in range(12)]
+    export.close()
+
+    # then the checkpoint should record the last consumed batch
+    with open(checkpoint) as _fh:
+        state = json.loads(_fh.read())
+    msg = 'Checkpoint state error'
+    assert state['ranges'][0]['after'] == KEYS[9], msg
+
+    # when I resume the export
+    exporter = domain_intel.exporter.Exporter(store,
+                                              'domain',
+                                              partitions=1,
+                                              batch_size=5,
+                                              checkpoint=checkpoint)
+    second_run = list(exporter)
+
+    # then the export should continue from the checkpoint
+    msg = 'Resumed export _id list error'
+    expected = ['domain/{}'.format(x) for x in KEYS]
+    assert first_run[:10] + second_run == expected, msg
+
+    # and the checkpoint should be removed on completion
+    msg = 'Checkpoint not removed after export completion'
+    assert not os.path.exists(checkpoint), msg
@@ -0,0 +1,84 @@
+""":class:`domain_intel.fetcher.Fetcher` unit test cases.
+
+"""
+import threading
+import pytest
+
+import domain_intel.fetcher
+
+
+def test_fetcher_init():
+    """Initialise a domain_intel.fetcher.Fetcher object.
+    """
+    # When I initialise a Fetcher object
+    fetcher = domain_intel.fetcher.Fetcher(len, max_in_flight=2)
+
+    # I should get a domain_intel.fetcher.Fetcher instance
+    msg = 'Object is not a domain_intel.fetcher.Fetcher instance'
+    assert isinstance(fetcher, domain_intel.fetcher.Fetcher), msg
+
+
+def test_fetcher_map_order():
+    """Fetcher results are yielded in the order of the items.
+    """
+    # Given a call that completes in reverse order
+    releases = [threading.Event() for _ in range(3)]
+
+    def call(index):
+        releases[index].wait(5)
+        if index:
+            releases[index - 1].set()
+        return index * 10
+
+    # when I map the call over the items
+    with domain_intel.fetcher.Fetcher(call, max_in_flight=3) as fetcher:
+        releases[2].set()
+        received = list(fetcher.map(range(3)))
+
+    # then I should receive the results in item order
+    msg = 'Fetcher result order error'
+    assert received == [(0, 0), (1, 10), (2, 20)], msg
+
+
+def test_fetcher_max_in_flight():
+    """Fetcher limits the number of concurrent calls.
+    """
+    # Given a call that tracks the number of concurrent calls
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0}
+    release = threading.Event()
+
+    def call(item):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        release.wait(0.05)
+        with lock:
+            state['active'] -= 1
+        return item
+
+    # when I map the call over more items than can be in flight
+    with domain_intel.fetcher.Fetcher(call, max_in_flight=2) as fetcher:
+        received = [x for _, x in fetcher.map(range(6))]
+
+    # then all items should be processed
+    msg = 'Fetcher results error'
+    assert received == list(range(6)), msg
+
+    # no more than 2 at a time
+    msg = 'Fetcher concurrency limit error'
+    assert state['peak'] == 2, msg
+
+
+def test_fetcher_exception():
+    """Fetcher raises a call exception in the caller.
+    """
+    # Given a call that fails
+    def call(item):
+        raise ValueError(item)
+
+    # when I map the call
+    # then I should receive the exception
+    with domain_intel.fetcher.Fetcher(call, max_in_flight=2) as fetcher:
+        with pytest.raises(ValueError):
+            list(fetcher.map(['a.com']))
@@ -0,0 +1,72 @@
+""":class:`domain_intel.keycache.KeyCache` unit test cases.
+
+"""
+import domain_intel
+import domain_intel.keycache
+
+
+def test_keycache_init():
+    """Initialise a domain_intel.keycache.KeyCache object.
+    """
+    # When I initialise a KeyCache object
+    cache = domain_intel.keycache.KeyCache(['country'])
+
+    # I should get a domain_intel.keycache.KeyCache instance
+    msg = 'Object is not a domain_intel.keycache.KeyCache instance'
+    assert isinstance(cache, domain_intel.keycache.KeyCache), msg
+
+
+def test_keycache_seen():
+    """Known keys are seeded and evicted in LRU order.
+    """
+    # Given a cache of 2 keys seeded with an existing country
+    seeder = lambda x: iter(['country/AU'])
+    cache = domain_intel.keycache.KeyCache(['country'],
+                                           size=2,
+                                           seeder=seeder)
+
+    # when I check the seeded key
+    # then the key should be known
+    msg = 'Seeded key should be known'
+    assert cache.seen('country', 'AU'), msg
+
+    # and when I add 2 further keys
+    cache.add('country', 'NZ')
+    cache.add('country', 'US')
+
+    # then the least recently used key should be evicted
+    msg = 'Least recently used key should be evicted'
+    assert not cache.seen('country', 'AU'), msg
+    assert cache.seen('country', 'US'), msg
+
+    # and the counts should be recorded
+    msg = 'Known key counts error'
+    counts = cache.counts['country']
+    received = (counts['hits'], counts['misses'], counts['evictions'])
+    assert received == (2, 1, 1), msg
+
+    # and keys of untracked collections should never be known
+    cache.add('domain', 'a.com')
+    msg = 'Untracked collection key should not be known'
+    assert not cache.seen('domain', 'a.com'), msg
+
+
+def test_sqlitestore_known_keys_skip_insert():
+    """Known keys short-circuit the store insert.
+    """
+    # Given a store with known-key caching that ignores duplicates
+    store = domain_intel.SqliteStore(path=':memory:',
+                                     on_duplicate='ignore',
+                                     known_keys=True)
+
+    # when I insert the same country twice
+    received = [store.collection_insert('country', {'_key': 'AU'})
+                for _ in range(2)]
+
+    # then both inserts should be reported as a success
+    msg = 'Known key insert status error'
+    assert received == [True, True], msg
+
+    # and the second insert should be a cache hit
+    msg = 'Known key cache hit count error'
+    assert store.known_keys.counts['country']['hits'] == 1, msg
@@ -0,0 +1,201 @@
+""":class:`domain_intel.Pipeline` unit test cases.
+
+"""
+import mock
+
+import domain_intel
+
+
+def record(partition, offset, topic='t'):
+    """Consumer record stand-in.
+    """
+    return mock.Mock(topic=topic, partition=partition, offset=offset)
+
+
+def test_pipeline_init():
+    """Initialise a domain_intel.Pipeline object.
+    """
+    # When I initialise a Pipeline object
+    pipeline = domain_intel.Pipeline()
+
+    # I should get a domain_intel.Pipeline instance
+    msg = 'Object is not a domain_intel.Pipeline instance'
+    assert isinstance(pipeline, domain_intel.Pipeline), msg
+
+
+def test_pipeline_batches():
+    """Batch consumption up to the maximum read count.
+    """
+    # Given a consumer with 2 partitions of records
+    a, b, c, d = [record(*x) for x in [(0, 0), (0, 1), (1, 0), (0, 2)]]
+    consumer = mock.Mock()
+    consumer.poll.side_effect = [
+        {'p0': [a, b], 'p1': [c]},
+        {'p0': [d]},
+        {},
+    ]
+
+    # when I consume batches limited to 4 records
+    pipeline = domain_intel.Pipeline()
+    received = list(pipeline.batches(consumer, max_read_count=4))
+
+    # then I should receive the records of each poll as a batch
+    msg = 'Batched records error'
+    assert received == [[a, b, c], [d]], msg
+
+    # and the polls should not return records beyond the threshold
+    msg = 'Poll max_records limit error'
+    limits = [x[1]['max_records'] for x in consumer.poll.call_args_list]
+    assert limits == [4, 1], msg
+
+
+@mock.patch('domain_intel.Pipeline.timeout',
+            new_callable=mock.PropertyMock,
+            return_value=0)
+def test_pipeline_batches_idle(mock_timeout):
+    """Batch consumption exits when the consumer is idle.
+    """
+    # Given a consumer without records
+    consumer = mock.Mock()
+    consumer.poll.return_value = {}
+
+    # when I consume batches
+    pipeline = domain_intel.Pipeline()
+    received = list(pipeline.batches(consumer))
+
+    # then I should not receive any batches
+    msg = 'Idle consumer should not return batches'
+    assert not received, msg
+
+
+def test_pipeline_batches_commit():
+    """Processed batch offsets are committed on completion.
+    """
+    # Given a consumer with 2 polls of records
+    consumer = mock.Mock()
+    consumer.poll.side_effect = [
+        {'p0': [record(0, 0), record(0, 1)]},
+        {'p1': [record(1, 5)]},
+    ]
+
+    # and a flush callable
+    flush = mock.Mock()
+
+    # when I consume all batches
+    pipeline = domain_intel.Pipeline()
+    batches = pipeline.batches(consumer, max_read_count=3, flush=[flush])
+    for _ in batches:
+        pass
+
+    # then the downstream writes should be flushed
+    msg = 'Flush before commit error'
+    assert flush.called, msg
+
+    # and the next offset of each partition should be committed
+    msg = 'Committed offsets error'
+    offsets = consumer.commit.call_args[1]['offsets']
+    received = {k.partition: v.offset for k, v in offsets.items()}
+    assert received == {0: 2, 1: 6}, msg
+
+
+def test_pipeline_batches_no_commit_on_error():
+    """Offsets of a batch that failed processing are not committed.
+    """
+    # Given a consumer with a poll of records
+    consumer = mock.Mock()
+    consumer.poll.return_value = {'p0': [record(0, 0)]}
+
+    # when processing of the batch fails
+    pipeline = domain_intel.Pipeline()
+    try:
+        for _ in pipeline.batches(consumer):
+            raise ValueError('processing failed')
+    except ValueError:
+        pass
+
+    # then no offsets should be committed
+    msg = 'Failed batch offsets should not be committed'
+    assert not consumer.commit.called, msg
+    assert not consumer.commit_async.called, msg
+
+
+@mock.patch('domain_intel.workerpool.wait')
+@mock.patch('domain_intel.Pipeline.timeout',
+            new_callable=mock.PropertyMock,
+            return_value=0)
+def test_pipeline_batches_daemon(mock_timeout, mock_wait):
+    """Daemon batch consumption backs off while idle until drained.
+    """
+    # Given a consumer that is idle either side of a poll of records
+    a = record(0, 0)
+    consumer = mock.Mock()
+    consumer.poll.side_effect = [{}, {}, {'p0': [a]}, {}]
+
+    # and a drain request on the third idle back off
+    mock_wait.side_effect = [False, False, True]
+
+    # when I consume batches in daemon mode
+    pipeline = domain_intel.Pipeline()
+    pipeline.daemon = True
+    received = list(pipeline.batches(consumer))
+
+    # then I should receive the records that arrived while idle
+    msg = 'Daemon batched records error'
+    assert received == [[a]], msg
+
+    # and the idle back off should double and reset on new records
+    msg = 'Daemon idle back off error'
+    delays = [x[0][0] for x in mock_wait.call_args_list]
+    assert delays == [1.0, 2.0, 1.0], msg
+
+
+@mock.patch('domain_intel.workerpool.wait')
+@mock.patch('domain_intel.Pipeline.timeout',
+            new_callable=mock.PropertyMock,
+            return_value=0)
+def test_pipeline_batches_idle_callbacks(mock_timeout, mock_wait):
+    """Idle callables are invoked on each empty poll.
+    """
+    # Given a consumer that is idle either side of a poll of records
+    a = record(0, 0)
+    consumer = mock.Mock()
+    consumer.poll.side_effect = [{}, {'p0': [a]}, {}]
+
+    # and a drain request on the second idle back off
+    mock_wait.side_effect = [False, True]
+
+    # when I consume batches in daemon mode with an idle callable
+    idle = mock.Mock()
+    pipeline = domain_intel.Pipeline()
+    pipeline.daemon = True
+    list(pipeline.batches(consumer, idle=[idle]))
+
+    # then the idle callable should be invoked per empty poll
+    msg = 'Idle callable call count error'
+    assert idle.call_count == 2, msg
+
+
+@mock.patch('domain_intel.Pipeline.batches')
+def test_pipeline_persist_batches(mock_batches):
+    """Persist batches flush the bulk writer on commit and when idle.
+    """
+    # Given a consumer and a bulk writer
+    consumer = mock.Mock()
+    writer = mock.Mock()
+
+    # when I consume persist batches
+    pipeline = domain_intel.Pipeline()
+    pipeline.persist_batches(consumer, writer, 10)
+
+    # then the writer should be flushed before commits and on idle polls
+    msg = 'Persist batches writer flush error'
+    mock_batches.assert_called_once_with(consumer,
+                                         10,
+                                         flush=[writer.flush],
+                                         idle=[writer.flush_stale])
+
+    # and without a bulk writer nothing should be flushed
+    pipeline.persist_batches(consumer, None)
+    msg = 'Persist batches without a writer error'
+    expected = mock.call(consumer, None, flush=None, idle=None)
+    assert mock_batches.call_args == expected, msg
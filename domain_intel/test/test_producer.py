@@ -0,0 +1,137 @@
+""":class:`domain_intel.pipeline.producer.TrackedProducer` unit test cases.
+
+"""
+import threading
+import mock
+import pytest
+
+from domain_intel.pipeline.producer import DeliveryError, TrackedProducer
+
+
+class Future(object):
+    """Send future stand-in that holds the delivery callbacks.
+    """
+    def __init__(self):
+        self.callbacks = []
+        self.errbacks = []
+
+    def add_callback(self, func, *args):
+        self.callbacks.append((func, args))
+
+    def add_errback(self, func, *args):
+        self.errbacks.append((func, args))
+
+    def success(self):
+        for func, args in self.callbacks:
+            func(*(args + (None,)))
+
+    def failure(self, err):
+        for func, args in self.errbacks:
+            func(*(args + (err,)))
+
+
+def test_tracked_producer_init():
+    """Initialise a TrackedProducer object.
+    """
+    # When I initialise a TrackedProducer object
+    producer = TrackedProducer(mock.Mock())
+
+    # I should get a TrackedProducer instance
+    msg = 'Object is not a TrackedProducer instance'
+    assert isinstance(producer, TrackedProducer), msg
+
+
+def test_tracked_producer_counts():
+    """Delivered and failed sends are counted per topic.
+    """
+    # Given a producer
+    kafka_producer = mock.Mock()
+    futures = [Future(), Future(), Future()]
+    kafka_producer.send.side_effect = futures
+    producer = TrackedProducer(kafka_producer)
+
+    # when I send 3 messages
+    producer.send('a', b'1')
+    producer.send('a', b'2')
+    producer.send('b', b'3')
+
+    # and 2 are delivered and 1 fails
+    futures[0].success()
+    futures[1].failure(Exception('broker down'))
+    futures[2].success()
+
+    # then the per-topic counts should be tracked
+    msg = 'Per-topic delivery counts error'
+    received = {k: dict(v) for k, v in producer.report().items()}
+    expected = {
+        'a': {'delivered': 1, 'failed': 1},
+        'b': {'delivered': 1},
+    }
+    assert received == expected, msg
+
+    # and the totals should be tracked
+    msg = 'Delivery totals error'
+    assert (producer.delivered, producer.failed) == (2, 1), msg
+
+
+def test_tracked_producer_backpressure():
+    """Sends block while the in-flight limit is reached.
+    """
+    # Given a producer that allows 1 send in flight
+    kafka_producer = mock.Mock()
+    futures = [Future(), Future()]
+    kafka_producer.send.side_effect = futures
+    producer = TrackedProducer(kafka_producer, max_in_flight=1)
+
+    # and a send that is in flight
+    producer.send('a', b'1')
+
+    # when I send another message
+    sender = threading.Thread(target=producer.send, args=('a', b'2'))
+    sender.start()
+    sender.join(0.2)
+
+    # then the send should block
+    msg = 'Send should block while the in-flight limit is reached'
+    assert sender.is_alive(), msg
+
+    # and proceed once the first send is delivered
+    futures[0].success()
+    sender.join(1)
+    msg = 'Send should proceed once delivery frees a slot'
+    assert not sender.is_alive(), msg
+    assert kafka_producer.send.call_count == 2, msg
+
+
+def test_tracked_producer_delegates():
+    """Other producer attributes are delegated.
+    """
+    # Given a producer
+    kafka_producer = mock.Mock()
+    producer = TrackedProducer(kafka_producer)
+
+    # when I flush the producer
+    producer.flush()
+
+    # then the wrapped producer should be flushed
+    msg = 'Flush should be delegated to the wrapped producer'
+    assert kafka_producer.flush.called, msg
+
+
+def test_tracked_producer_flush_failed():
+    """Flush raises once a send has failed.
+    """
+    # Given a producer
+    kafka_producer = mock.Mock()
+    futures = [Future()]
+    kafka_producer.send.side_effect = futures
+    producer = TrackedProducer(kafka_producer)
+
+    # and a failed send
+    producer.send('a', b'1')
+    futures[0].failure(Exception('broker down'))
+
+    # when I flush the producer
+    # then a DeliveryError should be raised
+    with pytest.raises(DeliveryError):
+        producer.flush()
@@ -0,0 +1,106 @@
+""":class:`domain_intel.ratelimit.TokenBucket` unit test cases.
+
+"""
+import os
+import mock
+import pytest
+
+import domain_intel.ratelimit
+
+
+def test_token_bucket_init(tmpdir):
+    """Initialise a domain_intel.ratelimit.TokenBucket object.
+    """
+    # When I initialise a TokenBucket object
+    path = str(tmpdir.join('bucket'))
+    bucket = domain_intel.ratelimit.TokenBucket(10, path=path)
+
+    # I should get a domain_intel.ratelimit.TokenBucket instance
+    msg = 'Object is not a domain_intel.ratelimit.TokenBucket instance'
+    assert isinstance(bucket, domain_intel.ratelimit.TokenBucket), msg
+
+    # with a burst that defaults to the rate
+    msg = 'Token bucket default burst error'
+    assert bucket.burst == 10.0, msg
+
+
+def test_token_bucket_invalid_rate():
+    """Token bucket rate must be positive.
+    """
+    # When I initialise a TokenBucket with a zero rate
+    # then I should receive a ValueError
+    with pytest.raises(ValueError):
+        domain_intel.ratelimit.TokenBucket(0)
+
+
+@mock.patch('domain_intel.ratelimit.time')
+def test_token_bucket_acquire(mock_time, tmpdir):
+    """Acquire tokens beyond the bucket burst.
+    """
+    # Given a token bucket of 2 requests per second with a burst of 2
+    mock_time.time.return_value = 1000.0
+    path = str(tmpdir.join('bucket'))
+    bucket = domain_intel.ratelimit.TokenBucket(2, burst=2, path=path)
+
+    # when I acquire the burst
+    waits = [bucket.acquire(), bucket.acquire()]
+
+    # then I should not wait
+    msg = 'Token bucket burst should not wait'
+    assert waits == [0.0, 0.0], msg
+
+    # when I acquire a third token
+    def sleep(seconds):
+        mock_time.time.return_value += seconds
+    mock_time.sleep.side_effect = sleep
+    received = bucket.acquire()
+
+    # then I should wait for the next token
+    msg = 'Token bucket wait error'
+    assert received == 0.5, msg
+    bucket.close()
+
+
+@mock.patch('domain_intel.ratelimit.time')
+def test_token_bucket_shared(mock_time, tmpdir):
+    """Token buckets over the same file share their tokens.
+    """
+    # Given two token buckets over the same state file
+    mock_time.time.return_value = 1000.0
+    path = str(tmpdir.join('bucket'))
+    bucket = domain_intel.ratelimit.TokenBucket(1, burst=1, path=path)
+    other = domain_intel.ratelimit.TokenBucket(1, burst=1, path=path)
+
+    # when the first bucket takes the only token
+    bucket.acquire()
+
+    # then the second bucket should wait for the next token
+    def sleep(seconds):
+        mock_time.time.return_value += seconds
+    mock_time.sleep.side_effect = sleep
+    received = other.acquire()
+
+    msg = 'Shared token bucket wait error'
+    assert received == 1.0, msg
+    bucket.close()
+    other.close()
+
+
+def test_token_bucket_fork(tmpdir):
+    """Token bucket state is shared with forked processes.
+    """
+    # Given a token bucket with a single token
+    path = str(tmpdir.join('bucket'))
+    bucket = domain_intel.ratelimit.TokenBucket(50, burst=1, path=path)
+    bucket.acquire()
+
+    # when a forked process takes a token
+    pid = os.fork()
+    if not pid:
+        os._exit(0 if bucket.acquire() > 0 else 1)
+    _, status = os.waitpid(pid, 0)
+
+    # then the child should have waited on the parent's token
+    msg = 'Forked token bucket should share state'
+    assert status == 0, msg
+    bucket.close()
@@ -0,0 +1,174 @@
+""":mod:`domain_intel.pipeline.reload` unit test cases.
+
+"""
+import io
+import os
+import mock
+
+import domain_intel
+from domain_intel.pipeline.reload import (chunk_ranges,
+                                          mapped_file,
+                                          scan_records)
+
+RAW_ALEXA = os.path.join('domain_intel',
+                         'test',
+                         'files',
+                         'samples',
+                         'real-raw-alexa-domains.out')
+
+
+def test_chunk_ranges():
+    """Split a byte count into contiguous ranges.
+    """
+    # When I split 10 bytes into chunks of 4 bytes
+    received = chunk_ranges(10, chunk_size=4)
+
+    # then I should receive contiguous byte ranges
+    msg = 'Byte range chunks error'
+    assert received == [(0, 4), (4, 8), (8, 10)], msg
+
+
+def test_mapped_file_empty(tmpdir):
+    """Memory map an empty file.
+    """
+    # Given an empty file
+    target_file = tmpdir.join('empty')
+    target_file.write('')
+
+    # when I memory map the file
+    with mapped_file(str(target_file)) as mapped:
+        received = mapped[:]
+
+    # then I should receive an empty byte string
+    msg = 'Empty memory-mapped file error'
+    assert received == b'', msg
+
+
+def test_scan_records():
+    """Scan raw Alexa XML records across byte ranges.
+    """
+    # Given a raw Alexa XML archive
+    with mapped_file(RAW_ALEXA) as mapped:
+        # when I scan the whole file
+        received = list(scan_records(mapped, 'UrlInfoResponse'))
+
+        # and the file split into small byte ranges
+        ranges = chunk_ranges(len(mapped), chunk_size=1000)
+        chunked = list(scan_records(mapped, 'UrlInfoResponse', ranges))
+
+    # then I should receive each XML record
+    msg = 'Scanned XML record count error'
+    assert len(received) == 16, msg
+    assert received[0].startswith(b'<?xml version="1.0"?>'), msg
+    assert received[0].endswith(b'</aws:UrlInfoResponse>'), msg
+
+    # and the byte ranges should produce the same records
+    msg = 'Byte range XML record scan error'
+    assert chunked == received, msg
+
+
+def test_scan_records_truncated():
+    """Scan skips truncated XML records.
+    """
+    # Given a truncated XML record followed by a complete one
+    source = (b'<?xml version="1.0"?>\n<aws:A>\n'
+              b'<?xml version="1.0"?>\n<aws:A>\n</aws:A>\n'
+              b'<?xml version="1.0"?>\n<aws:A>\n')
+
+    # when I scan for records
+    received = list(scan_records(source, 'A'))
+
+    # then I should only receive the complete record
+    msg = 'Truncated XML record scan error'
+    assert received == [b'<?xml version="1.0"?>\n<aws:A>\n</aws:A>'], msg
+
+
+@mock.patch('domain_intel.utils.safe_producer')
+def test_parse_raw_alexa_worker(mock_producer):
+    """Reload raw Alexa XML records from a single worker slot.
+    """
+    # Given a worker in the second of 2 slots
+    queue = mock.Mock(slot=1)
+
+    # and a raw Alexa XML archive split into byte ranges
+    ranges = chunk_ranges(os.path.getsize(RAW_ALEXA), chunk_size=100000)
+
+    # when I reload the odd byte ranges
+    awis = domain_intel.Awis()
+    awis.parse_raw_alexa_worker(queue,
+                                RAW_ALEXA,
+                                'alexa-results',
+                                'UrlInfoResponse',
+                                ranges,
+                                workers=2)
+
+    # then the worker should only publish records from its ranges
+    msg = 'Reload worker lines|read|put|failed count error'
+    counts = queue.put.call_args[0][0]
+    producer = mock_producer.return_value.__enter__.return_value
+    assert counts[1:] == (producer.send.call_count,
+                          producer.send.call_count,
+                          0), msg
+    assert 0 < counts[1] < 16, msg
+
+
+@mock.patch('domain_intel.utils.safe_producer')
+def test_parse_raw_alexa_chunked(mock_producer):
+    """Reload raw Alexa XML across a pool of byte range workers.
+    """
+    # Given a small reload chunk size and 3 reload workers
+    config = {'reload_chunk_bytes': 50000, 'workers': {'reload': 3}}
+
+    # when I reload a raw Alexa XML archive
+    awis = domain_intel.Awis()
+    with mock.patch.dict('domain_intel.common.CONFIG', config):
+        with open(RAW_ALEXA) as _fh:
+            received = awis.parse_raw_alexa(_fh,
+                                            topic='alexa-results',
+                                            end_token='UrlInfoResponse')
+
+            # then all records should be read across the workers
+            msg = 'Chunked reload lines|read|put|failed count error'
+            assert received == (9385, 16, 16, 0), msg
+
+            # and the file object should be left open
+            msg = 'Reload should not close the caller file object'
+            assert not _fh.closed, msg
+
+
+@mock.patch('domain_intel.utils.safe_producer')
+def test_parse_raw_alexa_path(mock_producer):
+    """Reload raw Alexa XML from a file path.
+    """
+    # When I reload a raw Alexa XML archive by path
+    awis = domain_intel.Awis()
+    received = awis.parse_raw_alexa(RAW_ALEXA,
+                                    topic='alexa-results',
+                                    end_token='UrlInfoResponse')
+
+    # then all records should be read
+    msg = 'Reload by path lines|read|put|failed count error'
+    assert received == (9385, 16, 16, 0), msg
+
+
+@mock.patch('domain_intel.utils.safe_producer')
+def test_parse_raw_alexa_stream(mock_producer):
+    """Reload raw Alexa XML from a stream without a file name.
+    """
+    # Given a raw Alexa XML archive as an in-memory stream
+    with open(RAW_ALEXA, 'rb') as _fh:
+        stream = io.BytesIO(_fh.read())
+
+    # when I reload the stream
+    awis = domain_intel.Awis()
+    received = awis.parse_raw_alexa(stream,
+                                    topic='alexa-results',
+                                    end_token='UrlInfoResponse')
+
+    # then all records should be read
+    msg = 'Reload by stream lines|read|put|failed count error'
+    assert received == (9385, 16, 16, 0), msg
+
+    # and the stream should be left open
+    msg = 'Reload should not close the caller stream'
+    assert not stream.closed, msg
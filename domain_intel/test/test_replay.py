@@ -0,0 +1,153 @@
+""":class:`domain_intel.pipeline.replay.ReplayWindow` unit test cases.
+
+"""
+import mock
+import pytest
+import kafka.structs
+
+import domain_intel
+from domain_intel.pipeline.replay import ReplayWindow, parse_timestamp
+
+P0 = kafka.structs.TopicPartition('t', 0)
+P1 = kafka.structs.TopicPartition('t', 1)
+
+
+def record(partition, offset, topic='t'):
+    """Consumer record stand-in.
+    """
+    return mock.Mock(topic=topic, partition=partition, offset=offset)
+
+
+def replay_consumer():
+    """Consumer stand-in over partitions with offsets 10 to 20.
+    """
+    consumer = mock.Mock()
+    consumer.partitions_for_topic.return_value = {0, 1}
+    consumer.beginning_offsets.return_value = {P0: 10, P1: 10}
+    consumer.end_offsets.return_value = {P0: 20, P1: 20}
+    consumer.offsets_for_times.return_value = {
+        P0: mock.Mock(offset=15, timestamp=1000),
+        P1: None,
+    }
+
+    return consumer
+
+
+def test_parse_timestamp():
+    """Convert replay timestamps to milliseconds since epoch.
+    """
+    msg = 'Replay timestamp conversion error'
+    assert parse_timestamp('1500000000000') == 1500000000000, msg
+    assert parse_timestamp('2017-06-01') == 1496275200000, msg
+    assert parse_timestamp('2017-06-01T01:00:00') == 1496278800000, msg
+
+
+def test_parse_timestamp_invalid():
+    """Convert an invalid replay timestamp.
+    """
+    msg = 'Invalid replay timestamp should raise ValueError'
+    with pytest.raises(ValueError):
+        parse_timestamp('01/06/2017')
+        assert False, msg
+
+
+def test_replay_window_exclusive_bounds():
+    """Offset and timestamp lower bounds are exclusive.
+    """
+    msg = 'Offset and timestamp bounds should raise ValueError'
+    with pytest.raises(ValueError):
+        ReplayWindow(from_offset=1, since=1000)
+        assert False, msg
+
+
+def test_replay_window_assign_offsets():
+    """Assign and seek to an offset bounded window.
+    """
+    # Given a replay window over offsets 12 to 14
+    window = ReplayWindow(from_offset=12, to_offset=14)
+
+    # when I assign the window to a consumer
+    consumer = replay_consumer()
+    received = window.assign(consumer, 't')
+
+    # then all topic partitions should be assigned
+    msg = 'Replay partition assignment error'
+    assert received == [P0, P1], msg
+
+    # and each partition should seek to the lower bound
+    msg = 'Replay seek error'
+    seeks = [x[0] for x in consumer.seek.call_args_list]
+    assert seeks == [(P0, 12), (P1, 12)], msg
+
+    # and the upper bound should be exclusive of the last offset
+    msg = 'Replay upper bound error'
+    assert window.upper == {P0: 15, P1: 15}, msg
+
+
+def test_replay_window_assign_times():
+    """Assign and seek to a timestamp bounded window.
+    """
+    # Given a replay window since a point in time
+    window = ReplayWindow(since=1000)
+
+    # when I assign the window to a consumer
+    consumer = replay_consumer()
+    window.assign(consumer, 't')
+
+    # then partitions without newer records should seek to the end
+    msg = 'Replay timestamp seek error'
+    seeks = [x[0] for x in consumer.seek.call_args_list]
+    assert seeks == [(P0, 15), (P1, 20)], msg
+
+    # and the upper bound should default to the end of each partition
+    msg = 'Replay default upper bound error'
+    assert window.upper == {P0: 20, P1: 20}, msg
+
+
+@mock.patch('domain_intel.workerpool.worker_slot', return_value=(1, 2))
+def test_replay_window_assign_worker_slot(mock_slot):
+    """Assign a worker's share of the partitions.
+    """
+    # Given a replay window
+    window = ReplayWindow()
+
+    # when I assign the window from the second of 2 workers
+    received = window.assign(replay_consumer(), 't')
+
+    # then only the worker's partitions should be assigned
+    msg = 'Replay worker partition share error'
+    assert received == [P1], msg
+
+
+def test_pipeline_batches_replay():
+    """Batch consumption stops at the replay window upper bound.
+    """
+    # Given a replay window over partition offsets 10 to 11
+    window = ReplayWindow(to_offset=11)
+    consumer = replay_consumer()
+    window.assign(consumer, 't')
+
+    # and a consumer that reads past the upper bound
+    consumer.assignment.return_value = [P0, P1]
+    consumer.paused.return_value = []
+    positions = iter([10, 10, 12, 12])
+    consumer.position.side_effect = lambda x: next(positions)
+    consumer.poll.side_effect = [
+        {P0: [record(0, 10), record(0, 11), record(0, 12)],
+         P1: [record(1, 10), record(1, 11), record(1, 12)]},
+    ]
+
+    # when I consume batches
+    pipeline = domain_intel.Pipeline()
+    pipeline.replay = window
+    received = list(pipeline.batches(consumer))
+
+    # then only the records within the window should be returned
+    msg = 'Replay batch bound error'
+    offsets = [(x.partition, x.offset) for x in received[0]]
+    assert offsets == [(0, 10), (0, 11), (1, 10), (1, 11)], msg
+
+    # and no offsets should be committed
+    msg = 'Replay should not commit offsets'
+    assert not consumer.commit.called, msg
+    assert not consumer.commit_async.called, msg
@@ -0,0 +1,120 @@
+""":class:`domain_intel.responsecache.ResponseCache` unit test cases.
+
+"""
+import mock
+
+import domain_intel.responsecache
+
+
+def test_response_cache_init(tmpdir):
+    """Initialise a domain_intel.responsecache.ResponseCache object.
+    """
+    # When I initialise a ResponseCache object
+    path = str(tmpdir.join('cache.db'))
+    cache = domain_intel.responsecache.ResponseCache(path=path)
+
+    # I should get a domain_intel.responsecache.ResponseCache instance
+    msg = 'Object is not a domain_intel.responsecache.ResponseCache instance'
+    assert isinstance(cache, domain_intel.responsecache.ResponseCache), msg
+
+
+def test_response_cache_hit(tmpdir):
+    """Cached response is returned on the next lookup.
+    """
+    # Given a response cache
+    path = str(tmpdir.join('cache.db'))
+    cache = domain_intel.responsecache.ResponseCache(path=path)
+
+    # when I look up a response that is not cached
+    received = cache.get('UrlInfo', 'Action=UrlInfo&Url=google.com')
+
+    # then I should receive a miss
+    msg = 'Uncached response should miss'
+    assert received is None, msg
+
+    # when I cache the response and look it up again
+    cache.put('UrlInfo', 'Action=UrlInfo&Url=google.com', b'<xml/>')
+    received = cache.get('UrlInfo', 'Action=UrlInfo&Url=google.com')
+
+    # then I should receive the cached response
+    msg = 'Cached response error'
+    assert received == b'<xml/>', msg
+
+    # and the lookups should be counted
+    msg = 'Response cache counts error'
+    expected = {'UrlInfo': {'hits': 1, 'misses': 1}}
+    assert cache.report() == expected, msg
+
+
+@mock.patch('domain_intel.responsecache.time')
+def test_response_cache_ttl(mock_time, tmpdir):
+    """Cached response expires after the action TTL.
+    """
+    # Given a response cache with a 60 second UrlInfo TTL
+    mock_time.time.return_value = 1000.0
+    path = str(tmpdir.join('cache.db'))
+    cache = domain_intel.responsecache.ResponseCache(path=path,
+                                                     ttls={'UrlInfo': 60})
+
+    # and a cached response
+    cache.put('UrlInfo', 'Action=UrlInfo&Url=google.com', b'<xml/>')
+
+    # when I look up the response after the TTL
+    mock_time.time.return_value = 1061.0
+    received = cache.get('UrlInfo', 'Action=UrlInfo&Url=google.com')
+
+    # then I should receive a miss
+    msg = 'Expired response should miss'
+    assert received is None, msg
+
+    # and the expiry should be counted
+    msg = 'Expired response count error'
+    assert cache.counts['UrlInfo']['expired'] == 1, msg
+
+
+@mock.patch('domain_intel.responsecache.time')
+def test_response_cache_lru_eviction(mock_time, tmpdir):
+    """Least recently used responses are evicted over the size limit.
+    """
+    # Given a response cache that holds 10 bytes
+    path = str(tmpdir.join('cache.db'))
+    cache = domain_intel.responsecache.ResponseCache(path=path,
+                                                     max_bytes=10)
+
+    # and two cached 4 byte responses
+    mock_time.time.return_value = 1000.0
+    cache.put('UrlInfo', 'a', b'aaaa')
+    mock_time.time.return_value = 1001.0
+    cache.put('UrlInfo', 'b', b'bbbb')
+
+    # when the first response is used
+    mock_time.time.return_value = 1002.0
+    cache.get('UrlInfo', 'a')
+
+    # and a third response is cached
+    mock_time.time.return_value = 1003.0
+    cache.put('UrlInfo', 'c', b'cccc')
+
+    # then the least recently used response should be evicted
+    msg = 'LRU response should be evicted'
+    assert cache.get('UrlInfo', 'b') is None, msg
+
+    msg = 'Recently used response should be retained'
+    assert cache.get('UrlInfo', 'a') == b'aaaa', msg
+
+
+def test_response_cache_refresh(tmpdir):
+    """Refresh forces a miss on a cached response.
+    """
+    # Given a cached response
+    path = str(tmpdir.join('cache.db'))
+    cache = domain_intel.responsecache.ResponseCache(path=path)
+    cache.put('UrlInfo', 'a', b'aaaa')
+
+    # when I refresh the cache
+    cache.refresh = True
+    received = cache.get('UrlInfo', 'a')
+
+    # then I should receive a miss
+    msg = 'Refreshed response should miss'
+    assert received is None, msg
@@ -0,0 +1,166 @@
+""":class:`domain_intel.spool.Spool` unit test cases.
+
+"""
+import os
+import mock
+import requests.exceptions
+
+import domain_intel
+import domain_intel.spool
+
+
+def test_spool_init(tmpdir):
+    """Initialise a domain_intel.spool.Spool object.
+    """
+    # When I initialise a Spool object
+    spool = domain_intel.spool.Spool(str(tmpdir))
+
+    # I should get a domain_intel.spool.Spool instance
+    msg = 'Object is not a domain_intel.spool.Spool instance'
+    assert isinstance(spool, domain_intel.spool.Spool), msg
+
+
+def test_spool_segments(tmpdir):
+    """Spool segments are sealed once full.
+    """
+    # Given a spool with a segment size of 2
+    spool = domain_intel.spool.Spool(str(tmpdir), segment_size=2)
+
+    # when I append 3 documents
+    for key in ['a.com', 'b.com', 'c.com']:
+        spool.append('domain', {'_key': key})
+
+    # then a single segment should be sealed
+    msg = 'Sealed spool segment count error'
+    assert len(spool.segments()) == 1, msg
+
+    # and the spool should have pending documents
+    msg = 'Spool should have pending documents'
+    assert spool.pending(), msg
+
+
+def test_spool_record_degraded(tmpdir):
+    """Spool is degraded once the error threshold is breached.
+    """
+    # Given a spool with an error threshold of 2
+    spool = domain_intel.spool.Spool(str(tmpdir),
+                                     latency_threshold=1.0,
+                                     error_threshold=2)
+
+    # when I record a slow write and a failed write
+    spool.record(elapsed=5.0)
+    received = spool.record(failed=True)
+
+    # then the spool should be degraded
+    msg = 'Spool should be degraded after consecutive failures'
+    assert received, msg
+
+    # and recovery should clear the degraded state
+    spool.recover()
+    msg = 'Spool should not be degraded after recovery'
+    assert not spool.degraded, msg
+
+
+def test_spool_drain(tmpdir):
+    """Drain the spool into the store.
+    """
+    # Given a spool with vertex and edge documents
+    spool = domain_intel.spool.Spool(str(tmpdir))
+    spool.append('domain', {'_key': 'a.com'})
+    spool.append('ranked', {'_key': 'a.com:AU',
+                            '_from': 'domain/a.com',
+                            '_to': 'country/AU'})
+
+    # and a store that is available
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.return_value = {'created': 1, 'errors': 0}
+
+    # when I drain the spool
+    received = spool.drain(store)
+
+    # then the spool should be drained
+    msg = 'Spool drain should succeed'
+    assert received, msg
+    msg = 'Spool drain import count error'
+    assert import_bulk.call_count == 2, msg
+    msg = 'Drained spool should not have pending documents'
+    assert not spool.pending(), msg
+
+
+def test_spool_drain_claimed(tmpdir):
+    """Segments claimed by another drainer are skipped.
+    """
+    # Given 2 spools that share a directory
+    spool = domain_intel.spool.Spool(str(tmpdir))
+    spool.append('domain', {'_key': 'a.com'})
+    spool.seal()
+    other = domain_intel.spool.Spool(str(tmpdir))
+
+    # and a segment claimed by the other drainer
+    segment = other.segments()[0]
+    claimed = other.claim(segment)
+
+    # when I drain the spool
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    received = spool.drain(store)
+
+    # then the claimed segment should not be replayed
+    msg = 'Claimed spool segment should not be replayed'
+    assert received, msg
+    assert not import_bulk.called, msg
+
+    # and a second claim of the segment should fail
+    msg = 'Spool segment claimed twice'
+    assert other.claim(segment) is None, msg
+    assert os.path.exists(claimed), msg
+
+
+def test_spool_drain_release(tmpdir):
+    """A segment is released for later drains if the store is down.
+    """
+    # Given a spool with a sealed segment
+    spool = domain_intel.spool.Spool(str(tmpdir))
+    spool.append('domain', {'_key': 'a.com'})
+    spool.seal()
+
+    # and a store that is unavailable
+    store = mock.Mock()
+    import_bulk = store.collection.return_value.import_bulk
+    import_bulk.side_effect = requests.exceptions.ConnectionError('down')
+
+    # when I drain the spool
+    received = spool.drain(store)
+
+    # then the drain should stop
+    msg = 'Spool drain should fail while the store is down'
+    assert not received, msg
+
+    # and the segment should be available to drain again
+    msg = 'Spool segment should be released after a failed drain'
+    assert len(spool.segments()) == 1, msg
+
+
+@mock.patch('domain_intel.Store.vertex_collection')
+def test_collection_insert_spooled(mock_collection, tmpdir):
+    """Insert into an unavailable store is spooled.
+    """
+    # Given a store with a spool
+    store = domain_intel.Store('spooled', spool_dir=str(tmpdir))
+
+    # and ArangoDB is unavailable
+    insert = mock_collection.return_value.insert
+    insert.side_effect = requests.exceptions.ConnectionError('down')
+
+    # when I insert a document
+    with mock.patch('domain_intel.spool.Spool.start_drainer'):
+        received = store.collection_insert('domain', {'_key': 'a.com'})
+
+    # then the insert should be reported as a success
+    msg = 'Spooled insert should be a success'
+    assert received, msg
+
+    # and the document should be spooled
+    msg = 'Spooled document count error'
+    assert store.spool.counts['spooled'] == 1, msg
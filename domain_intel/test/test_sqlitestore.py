@@ -0,0 +1,116 @@
+""":class:`domain_intel.SqliteStore` unit test cases.
+
+"""
+import os
+import pytest
+
+import domain_intel
+import domain_intel.store
+
+
+@pytest.fixture(scope='function')
+def sqlite_store(request, tmpdir):
+    """Embedded store holding a domain ranked in a single country.
+    """
+    store = domain_intel.SqliteStore(path=os.path.join(str(tmpdir), 'ipe.db'))
+    store.persist_country_codes()
+
+    domain = {
+        '_key': 'a.com',
+        'title': 'A',
+        'online_since': None,
+        'median_load_time': None,
+        'speed_percentile': None,
+        'adult_content': None,
+        'links_in_count': None,
+        'locale': None,
+        'encoding': None,
+        'description': None,
+        'rank': 1,
+    }
+    store.collection_insert('domain', domain)
+    store.collection_insert('url-info', {'_key': 'a.com', 'data': 'raw'})
+    store.edge_insert('ranked', {'_key': 'a.com:AU',
+                                 '_from': 'domain/a.com',
+                                 '_to': 'country/AU',
+                                 'label': 10})
+
+    request.addfinalizer(store.drop_database)
+
+    return store
+
+
+def test_sqlitestore_init():
+    """Initialise a domain_intel.SqliteStore object.
+    """
+    # When I initialise a SqliteStore object
+    store = domain_intel.SqliteStore(path=':memory:')
+
+    # I should get a domain_intel.SqliteStore instance
+    msg = 'Object is not a domain_intel.SqliteStore instance'
+    assert isinstance(store, domain_intel.SqliteStore), msg
+
+
+def test_get_store_backend():
+    """Select the store backend from the factory.
+    """
+    # When I request the sqlite store backend
+    store = domain_intel.store.get_store(backend='sqlite', path=':memory:')
+
+    # I should get a domain_intel.SqliteStore instance
+    msg = 'Store factory did not return a domain_intel.SqliteStore'
+    assert isinstance(store, domain_intel.SqliteStore), msg
+
+
+def test_sqlitestore_collection_insert_duplicate(sqlite_store):
+    """Insert an existing key with the "error" conflict policy.
+    """
+    # When I insert an existing domain
+    received = sqlite_store.collection_insert('domain', {'_key': 'a.com'})
+
+    # then the insert should fail
+    msg = 'Duplicate insert should fail'
+    assert not received, msg
+
+    # and the collection count should be unchanged
+    msg = 'Collection count error'
+    assert sqlite_store.get_collection_count('domain') == 1, msg
+
+
+def test_sqlitestore_export_ids(sqlite_store):
+    """Export the domain collection labels.
+    """
+    # When I export the domain labels
+    received = list(sqlite_store.export_ids('domain'))
+
+    # then I should receive the domain _id values
+    msg = 'Exported domain labels error'
+    assert received == ['domain/a.com'], msg
+
+
+def test_sqlitestore_traverse_graph(sqlite_store):
+    """Traverse the graph relationship.
+    """
+    # When I traverse the graph from the domain
+    received = sqlite_store.traverse_graph('domain/a.com', as_json=False)
+
+    # then the domain should be the start vertex
+    msg = 'Traversal start vertex error'
+    assert received['vertices'][0]['_id'] == 'domain/a.com', msg
+
+    # and I should receive the domain country rank path
+    msg = 'Traversal path error'
+    paths = [x['vertices'][-1]['_id'] for x in received['paths'][1:]]
+    assert paths == ['country/AU'], msg
+
+
+def test_sqlitestore_wide_column_rows(sqlite_store):
+    """Generate wide-column CSV rows from the embedded store.
+    """
+    # When I generate the wide-column rows for all domains
+    received = list(sqlite_store.wide_column_rows())
+
+    # then I should receive a single CSV line for the domain
+    msg = 'Wide-column rows error'
+    assert len(received) == 1 and len(received[0][1]) == 1, msg
+    assert received[0][1][0].startswith('a.com,"A",,'), msg
@@ -2,8 +2,11 @@
 
 """
 import pytest
+import mock
+import arango.exceptions
 
 import domain_intel
+import domain_intel.store
 
 
 def test_store_init():
@@ -121,3 +124,192 @@ def test_traverse_graph():
     # then I should receive a result
     msg = 'Valid label graph traversal did not return result'
     assert received is not None, msg
+
+
+def test_store_init_invalid_on_duplicate():
+    """Initialise a domain_intel.Store object: invalid conflict policy.
+    """
+    # When I initialise a Domain Intel Store with an unknown policy
+    # then I should receive a ValueError
+    with pytest.raises(ValueError):
+        domain_intel.Store(on_duplicate='banana')
+
+
+@mock.patch('domain_intel.Store.collection')
+def test_collection_insert_on_duplicate_ignore(mock_collection):
+    """Insert a document with the "ignore" conflict policy.
+    """
+    # Given a store that ignores existing keys
+    store = domain_intel.Store(on_duplicate='ignore')
+
+    # and an existing document
+    import_bulk = mock_collection.return_value.import_bulk
+    import_bulk.return_value = {'created': 0, 'errors': 0, 'ignored': 1}
+
+    # when I insert the document
+    received = store.collection_insert('domain', {'_key': 'abc.com'})
+
+    # then the insert should be reported as a success
+    msg = 'Ignored duplicate insert should be a success'
+    assert received, msg
+
+    # and the conflict should be resolved by the server
+    msg = 'Conflict policy not passed to the bulk import endpoint'
+    kwargs = import_bulk.call_args[1]
+    assert kwargs.get('on_duplicate') == 'ignore', msg
+
+
+def test_store_shared_client():
+    """Store instances within a process share the ArangoDB client.
+    """
+    # Given two Domain Intel Store objects
+    store_1 = domain_intel.Store()
+    store_2 = domain_intel.Store('other_database')
+
+    # when I reference their ArangoDB clients
+    # then I should receive the same client
+    msg = 'Store instances should share the ArangoDB client'
+    assert store_1.client is store_2.client, msg
+
+    # and a store with client logging disabled
+    store_3 = domain_intel.Store(enable_logging=False)
+
+    # should receive its own client
+    msg = 'Store client logging setting should form part of client key'
+    assert store_1.client is not store_3.client, msg
+
+
+@mock.patch('domain_intel.Store.graph', new_callable=mock.PropertyMock)
+def test_store_cached_vertex_collection(mock_graph):
+    """Vertex collection handles are cached across inserts.
+    """
+    # Given a Domain Intel Store object
+    store = domain_intel.Store('cached_handles')
+
+    # when I insert documents into the same collection
+    for key in ['a.com', 'b.com']:
+        store.collection_insert('domain', {'_key': key})
+
+    # then the vertex collection handle should be sourced once
+    msg = 'Vertex collection handle should be cached'
+    vertex_collection = mock_graph.return_value.vertex_collection
+    assert vertex_collection.call_count == 1, msg
+
+
+@mock.patch('domain_intel.Store.aql')
+def test_traverse_many(mock_aql):
+    """Traverse the graph relationships of a batch of domains.
+    """
+    # Given a set of domain labels
+    labels = ['domain/a.com', 'domain/b.com', 'domain/c.com']
+
+    # and a store that returns the batched traversals
+    def traversals(query, bind_vars, batch_size):
+        return [{'label': x, 'vertices': [], 'paths': []}
+                for x in bind_vars['labels']]
+    mock_aql.side_effect = traversals
+
+    # when I traverse the graph in batches of 2
+    store = domain_intel.Store()
+    received = list(store.traverse_many(labels, batch_size=2, as_json=False))
+
+    # then I should receive a traversal per label
+    msg = 'Batched graph traversal labels error'
+    assert [x[0] for x in received] == labels, msg
+
+    # and the labels should be resolved in 2 queries
+    msg = 'Batched graph traversal query count error'
+    assert mock_aql.call_count == 2, msg
+
+
+@mock.patch('domain_intel.Store.aql')
+def test_traverse_many_halt_on_error(mock_aql):
+    """Raise a failed batch traversal.
+    """
+    # Given a store that cannot resolve the batch traversal
+    error = arango.exceptions.AQLQueryExecuteError('traverse failed')
+    mock_aql.side_effect = error
+
+    # when I traverse the graph and halt on error
+    store = domain_intel.Store()
+    traversals = store.traverse_many(['domain/a.com'],
+                                     as_json=False,
+                                     halt_on_error=True)
+
+    # then the AQL error should be raised
+    with pytest.raises(arango.exceptions.AQLQueryExecuteError):
+        list(traversals)
+
+
+def test_projection_expression():
+    """Build an AQL projection expression.
+    """
+    # Given a projection spec with top-level and nested fields
+    projection = {
+        'traffic': ['data.TrafficHistory.HistoricalData'],
+        'url': ['domain_linkingin'],
+    }
+
+    # when I build the projection expression
+    received = domain_intel.store.projection_expression(projection, 'v')
+
+    # then I should receive a per-collection AQL expression
+    expected = ('(PARSE_IDENTIFIER(v).collection == "traffic" ? '
+                'MERGE(KEEP(v, "_id", "_key", "_from", "_to"), '
+                '{"data": {"TrafficHistory": {"HistoricalData": '
+                'v["data"]["TrafficHistory"]["HistoricalData"]}}}) : '
+                '(PARSE_IDENTIFIER(v).collection == "url" ? '
+                'KEEP(v, "_id", "_key", "_from", "_to", "domain_linkingin") : '
+                'KEEP(v, "_id", "_key", "_from", "_to")))')
+    msg = 'AQL projection expression error'
+    assert received == expected, msg
+
+
+@mock.patch('domain_intel.Store.aql')
+def test_wide_column_rows(mock_aql):
+    """Generate wide-column CSV rows from the store.
+    """
+    # Given a store that holds a domain ranked in a single country
+    domain = {
+        '_id': 'domain/a.com',
+        '_key': 'a.com',
+        'title': 'A',
+        'online_since': None,
+        'median_load_time': None,
+        'speed_percentile': None,
+        'adult_content': None,
+        'links_in_count': None,
+        'locale': None,
+        'encoding': None,
+        'description': None,
+        'rank': 1,
+    }
+    ranked = {
+        '_id': 'ranked/a.com:AU',
+        '_to': 'country/AU',
+        'label': 10,
+    }
+    country = {'_id': 'country/AU', '_key': 'AU'}
+    mock_aql.return_value = [{
+        'label': 'domain/a.com',
+        'vertices': [domain, country],
+        'paths': [
+            {'edges': [], 'vertices': [domain]},
+            {'edges': [ranked], 'vertices': [domain, country]},
+        ],
+    }]
+
+    # when I generate the wide-column rows for the domain
+    store = domain_intel.Store()
+    received = list(store.wide_column_rows(domains=['a.com']))
+
+    # then I should receive a single CSV line for the domain
+    msg = 'Wide-column rows domain label error'
+    assert received[0][0] == 'domain/a.com', msg
+    msg = 'Wide-column rows CSV line count error'
+    assert len(received[0][1]) == 1, msg
+
+    # and the query should be restricted to the wide-column edges
+    msg = 'Wide-column rows query edge collections error'
+    query = mock_aql.call_args[0][0]
+    assert '`ranked`, `links_into`' in query, msg
@@ -6,6 +6,7 @@ import json
 import time
 import mock
 import pytest
+import kafka.partitioner.default
 
 import domain_intel.utils
 import domain_intel.common
@@ -125,3 +126,43 @@ def test_get_epoch_ranges_3_month_range(mock_time):
     msg = 'Epoch time ranges for last month incorrect'
     expected = (1493596800.0, 1501459200.0)
     assert received == expected, msg
+
+
+def test_domain_key():
+    """Kafka message key for a domain.
+    """
+    # Given a domain store label
+    label = ' domain/ABC.com\n'
+
+    # when I generate the message key
+    received = domain_intel.utils.domain_key(label)
+
+    # then I should receive the normalised domain as bytes
+    msg = 'Domain message key error'
+    assert received == b'abc.com', msg
+    assert domain_intel.utils.domain_key(b'abc.com') == received, msg
+
+
+def test_load_partitioner():
+    """Resolve a Kafka producer partitioner.
+    """
+    # Given a partitioner name
+    name = 'kafka.partitioner.default:DefaultPartitioner'
+
+    # when I resolve the partitioner
+    received = domain_intel.utils.load_partitioner(name)
+
+    # then I should receive the partitioner callable
+    msg = 'Partitioner resolution error'
+    assert received is kafka.partitioner.default.DefaultPartitioner, msg
+
+
+def test_load_partitioner_not_configured():
+    """Kafka producer partitioner not configured.
+    """
+    # When I resolve an unconfigured partitioner
+    received = domain_intel.utils.load_partitioner()
+
+    # then I should receive None
+    msg = 'Unconfigured partitioner should be None'
+    assert received is None, msg
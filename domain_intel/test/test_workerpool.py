@@ -0,0 +1,263 @@
+""":class:`domain_intel.WorkerPool` unit test cases.
+
+"""
+import os
+import time
+import signal
+import threading
+
+import domain_intel
+import domain_intel.workerpool
+
+
+def count_worker(queue, count):
+    """Worker that returns *count*.
+    """
+    queue.put(count)
+
+
+def crash_once_worker(queue, marker):
+    """Worker that fails on the first run.
+    """
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        raise ValueError('first run')
+    queue.put(1)
+
+
+def crash_worker(queue):
+    """Worker that always fails.
+    """
+    raise ValueError('always')
+
+
+def hung_worker(queue):
+    """Worker that never returns.
+    """
+    time.sleep(60)
+
+
+def busy_worker(queue, seconds):
+    """Worker that heartbeats from its work loop for *seconds*.
+    """
+    until = time.time() + seconds
+    while time.time() < until:
+        domain_intel.workerpool.heartbeat()
+        time.sleep(0.05)
+    queue.put('busy')
+
+
+def hung_once_worker(queue, marker):
+    """Worker that hangs without heartbeats on the first run until it
+    is asked to drain.
+    """
+    if os.path.exists(marker):
+        queue.put('restarted')
+        return
+
+    open(marker, 'w').close()
+    while not domain_intel.workerpool.draining():
+        time.sleep(0.05)
+    queue.put('partial')
+
+
+def drain_worker(queue):
+    """Worker that runs until a drain is requested.
+    """
+    while not domain_intel.workerpool.draining():
+        time.sleep(0.05)
+    queue.put('drained')
+
+
+def test_workerpool_init():
+    """Initialise a domain_intel.WorkerPool object.
+    """
+    # When I initialise a WorkerPool object
+    pool = domain_intel.WorkerPool(count_worker, workers=1)
+
+    # I should get a domain_intel.WorkerPool instance
+    msg = 'Object is not a domain_intel.WorkerPool instance'
+    assert isinstance(pool, domain_intel.WorkerPool), msg
+
+
+def test_workerpool_results():
+    """Results are collected from all workers.
+    """
+    # Given a pool of 3 workers that each return a count
+    pool = domain_intel.WorkerPool(count_worker, args=(2,), workers=3)
+
+    # when I run the pool
+    received = pool.run()
+
+    # then I should receive a result from each worker
+    msg = 'Worker pool results error'
+    assert received == [2, 2, 2], msg
+
+
+def test_workerpool_restart(tmpdir):
+    """A crashed worker is restarted.
+    """
+    # Given a worker that fails on the first run
+    marker = str(tmpdir.join('marker'))
+    pool = domain_intel.WorkerPool(crash_once_worker,
+                                   args=(marker,),
+                                   workers=1,
+                                   backoff=0)
+
+    # when I run the pool
+    received = pool.run()
+
+    # then the worker should be restarted to completion
+    msg = 'Restarted worker results error'
+    assert received == [1], msg
+    assert pool.counts['restarts'] == 1, msg
+
+
+def test_workerpool_max_restarts():
+    """A worker is abandoned once its restarts are exhausted.
+    """
+    # Given a worker that always fails
+    pool = domain_intel.WorkerPool(crash_worker,
+                                   workers=1,
+                                   max_restarts=2,
+                                   backoff=0)
+
+    # when I run the pool
+    received = pool.run()
+
+    # then the worker should be abandoned after 2 restarts
+    msg = 'Exhausted worker restarts error'
+    assert not received, msg
+    assert pool.counts['restarts'] == 2, msg
+    assert pool.counts['failures'] == 1, msg
+
+
+def test_workerpool_hung():
+    """A worker without heartbeats is terminated.
+    """
+    # Given a worker that hangs without heartbeats
+    pool = domain_intel.WorkerPool(hung_worker,
+                                   workers=1,
+                                   max_restarts=0,
+                                   heartbeat_interval=0,
+                                   heartbeat_timeout=0.5,
+                                   kill_grace=0.2)
+
+    # when I run the pool
+    pool.run()
+
+    # then the hung worker should be terminated
+    msg = 'Hung worker count error'
+    assert pool.counts['hung'] == 1, msg
+
+    # and killed once it ignores the SIGTERM
+    msg = 'Killed worker count error'
+    assert pool.counts['killed'] == 1, msg
+
+    # and its missing result counted as lost
+    msg = 'Lost worker result count error'
+    assert pool.counts['lost'] == 1, msg
+
+
+def test_workerpool_hung_with_heartbeat_interval():
+    """A hung worker is terminated even when heartbeats are enabled.
+    """
+    # Given a worker that hangs outside of its work loop
+    pool = domain_intel.WorkerPool(hung_worker,
+                                   workers=1,
+                                   max_restarts=0,
+                                   heartbeat_interval=0.1,
+                                   heartbeat_timeout=0.5,
+                                   kill_grace=0.2)
+
+    # when I run the pool
+    pool.run()
+
+    # then the hung worker should be terminated
+    msg = 'Hung worker with heartbeats count error'
+    assert pool.counts['hung'] == 1, msg
+
+
+def test_workerpool_heartbeat_from_work_loop():
+    """A worker that heartbeats from its work loop is not terminated.
+    """
+    # Given a worker that heartbeats for longer than the timeout
+    pool = domain_intel.WorkerPool(busy_worker,
+                                   args=(1.5,),
+                                   workers=1,
+                                   max_restarts=0,
+                                   heartbeat_interval=0.1,
+                                   heartbeat_timeout=0.5)
+
+    # when I run the pool
+    received = pool.run()
+
+    # then the worker should run to completion
+    msg = 'Busy worker heartbeat error'
+    assert received == ['busy'], msg
+    assert not pool.counts['hung'], msg
+
+
+def test_workerpool_drain():
+    """Workers drain on SIGTERM.
+    """
+    # Given workers that run until a drain is requested
+    pool = domain_intel.WorkerPool(drain_worker, workers=2)
+
+    # when the pool receives a SIGTERM
+    timer = threading.Timer(1.0, os.kill, args=(os.getpid(), signal.SIGTERM))
+    timer.start()
+    received = pool.run()
+    domain_intel.workerpool._DRAIN.clear()
+
+    # then each worker should drain to completion
+    msg = 'Drained worker results error'
+    assert received == ['drained', 'drained'], msg
+    assert not pool.counts['failures'], msg
+
+
+def test_workerpool_drain_sigint():
+    """Workers drain on SIGINT.
+    """
+    # Given workers that run until a drain is requested
+    pool = domain_intel.WorkerPool(drain_worker, workers=1)
+
+    # when the pool receives a SIGINT
+    timer = threading.Timer(1.0, os.kill, args=(os.getpid(), signal.SIGINT))
+    timer.start()
+    received = pool.run()
+    domain_intel.workerpool._DRAIN.clear()
+
+    # then the worker should drain to completion
+    msg = 'SIGINT drained worker results error'
+    assert received == ['drained'], msg
+    assert not pool.counts['failures'], msg
+
+
+def test_workerpool_hung_drains_on_sigterm(tmpdir):
+    """A hung worker that drains on SIGTERM is not killed.
+    """
+    # Given a worker that hangs on the first run until asked to drain
+    marker = str(tmpdir.join('marker'))
+    pool = domain_intel.WorkerPool(hung_once_worker,
+                                   args=(marker,),
+                                   workers=1,
+                                   max_restarts=1,
+                                   backoff=0,
+                                   heartbeat_interval=0,
+                                   heartbeat_timeout=0.5,
+                                   kill_grace=30)
+
+    # when I run the pool
+    received = pool.run()
+
+    # then the partial result should be posted before the restart
+    msg = 'Hung worker drained results error'
+    assert received == ['partial', 'restarted'], msg
+
+    # and the worker should not be killed
+    msg = 'Hung worker that drains should not be killed'
+    assert pool.counts['hung'] == 1, msg
+    assert pool.counts['restarts'] == 1, msg
+    assert not pool.counts['killed'], msg
+    assert not pool.counts['lost'], msg
@@ -4,12 +4,12 @@
 import os
 import io
 import json
+import importlib
 import collections
 import fnmatch
 import random
 import string
 import inspect
-import multiprocessing
 import contextlib
 import time
 import datetime
@@ -75,36 +75,53 @@ def get_file_line_count(file_h):
     return lines_in_file
 
 
-def threader(thread_count, target, *args, **kwargs):
-    """Common process thread creator.
+def domain_key(domain):
+    """Kafka message key for *domain*.  *domain* can also be a store
+    label such as ``domain/abc.com``.
 
-    *thread_count* controls the number of processes to launch.  *target*
-    is a reference to the executable component to thread.  *args* and
-    *kwargs* feed into the *target*'s parameter signature.
+    All records for a domain carry the same key so that they are hashed
+    to the same topic partition.  This keeps per-domain ordering and
+    gives each consumer a stable subset of domains.
+
+    Returns:
+        the normalised domain name as bytes or ``None`` if *domain* is
+        not set
+
+    """
+    if domain is None:
+        return None
+
+    if isinstance(domain, bytes):
+        domain = domain.decode('utf-8')
+
+    return domain.strip().lower().rsplit('/', 1)[-1].encode('utf-8')
 
-    All threads will be joined on startup so the completion of this
-    function indicates a exit event from all threads.
 
-    Typical example::
+def load_partitioner(name=None):
+    """Resolve the Kafka producer partitioner *name* of the form
+    ``<module>:<attribute>``.  Defaults to the ``partitioner`` value of
+    the ``kafka`` config.
 
-        >>> from domain_intel.utils import threader
-        >>> target = print
-        >>> args = ('Hello', 'there')
-        >>> threader(2, target, *args)
-        Hello there
-        Hello there
+    The partitioner is a callable that takes the serialised message key,
+    the list of all partitions and the list of available partitions and
+    returns the partition to send to (see
+    :class:`kafka.partitioner.DefaultPartitioner`).
+
+    Returns:
+        the partitioner callable or ``None`` if not configured, in
+        which case the Kafka default (murmur2 hash of the key) applies
 
     """
-    threads = []
-    for _ in range(thread_count):
-        worker = multiprocessing.Process(target=target,
-                                         args=list(args),
-                                         kwargs=dict(kwargs))
-        worker.start()
-        threads.append(worker)
+    if name is None:
+        name = CONFIG.get('kafka', {}).get('partitioner')
+
+    partitioner = None
+    if name:
+        module_name, _, attribute = name.partition(':')
+        module = importlib.import_module(module_name)
+        partitioner = getattr(module, attribute)
 
-    for _thread in threads:
-        _thread.join()
+    return partitioner
 
 
 @backoff.on_exception(backoff.expo,
@@ -120,7 +137,7 @@ def _safe_consumer(topic, **kwargs):
 
     default_kwargs = {
         'auto_offset_reset': 'earliest',
-        'enable_auto_commit': True,
+        'enable_auto_commit': False,
         'consumer_timeout_ms': 10000,
     }
     default_kwargs.update(dict(kwargs))
@@ -155,7 +172,14 @@ def _safe_producer(**kwargs):
     """
     caller = inspect.stack()[2][3]
     log.info('Starting producer for %s', caller)
-    return kafka.producer.KafkaProducer(**kwargs)
+
+    default_kwargs = {}
+    partitioner = load_partitioner()
+    if partitioner is not None:
+        default_kwargs['partitioner'] = partitioner
+    default_kwargs.update(dict(kwargs))
+
+    return kafka.producer.KafkaProducer(**default_kwargs)
 
 
 @contextlib.contextmanager
@@ -0,0 +1,620 @@
+""":class:`WorkerPool`
+
+"""
+import os
+import sys
+import time
+import signal
+import threading
+import traceback
+import contextlib
+import collections
+import multiprocessing
+from logga import log
+
+import domain_intel.common
+
+try:
+    import queue as Queue
+except ImportError:
+    import Queue
+
+CONFIG = domain_intel.common.CONFIG
+
+# Set in the pool and worker processes once a signal drain is requested.
+_DRAIN = threading.Event()
+
+# Result channel of the current worker process.
+_CHANNEL = None
+
+# Minimum seconds between heartbeats of the current worker process and
+# the time of the last heartbeat sent.
+_HEARTBEAT_INTERVAL = 0.0
+_LAST_HEARTBEAT = 0.0
+
+# Signals that request a graceful drain.
+DRAIN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+# Seconds between polls of the worker result channels.
+RECEIVE_POLL_INTERVAL = 0.05
+
+
+def draining():
+    """Check if a graceful drain has been requested.  Long running
+    workers should stop consuming new work once set.
+
+    Returns:
+        Boolean ``True`` if a drain has been requested
+
+    """
+    return _DRAIN.is_set()
+
+
+def wait(seconds):
+    """Sleep for *seconds* or until a drain is requested, whichever
+    comes first.
+
+    Returns:
+        Boolean ``True`` if a drain has been requested
+
+    """
+    return _DRAIN.wait(seconds)
+
+
+def worker_slot():
+    """Pool slot of the current worker process.  Workers can use the
+    slot to take a fixed share of work that cannot be balanced by a
+    Kafka consumer group.
+
+    Returns:
+        tuple of the form (<slot>, <workers>).  ``(0, 1)`` outside of a
+        worker pool
+
+    """
+    slot = (0, 1)
+    if _CHANNEL is not None:
+        slot = (_CHANNEL.slot, _CHANNEL.workers)
+
+    return slot
+
+
+def heartbeat():
+    """Flag to the pool that the current worker is making progress.
+
+    Work loops call this once per unit of work (for example, once per
+    :meth:`domain_intel.pipeline.Pipeline.batches` iteration) so that a
+    worker whose loop hangs stops heartbeating and is restarted.
+    Heartbeats are sent at most once per heartbeat interval.  No-op
+    outside of a worker pool.
+
+    Returns:
+        Boolean ``True`` if a heartbeat was sent
+
+    """
+    global _LAST_HEARTBEAT
+
+    if _CHANNEL is None or not _HEARTBEAT_INTERVAL:
+        return False
+
+    now = time.time()
+    if now - _LAST_HEARTBEAT < _HEARTBEAT_INTERVAL:
+        return False
+
+    _LAST_HEARTBEAT = now
+    _CHANNEL.heartbeat()
+
+    return True
+
+
+def stage_workers(stage=None):
+    """Number of workers configured for *stage*.  Stage counts are
+    taken from the ``workers`` config dictionary.  Falls back to the
+    global ``threads`` config value.
+
+    """
+    default = CONFIG.get('threads', 1)
+
+    return int(CONFIG.get('workers', {}).get(stage, default) or 1)
+
+
+class WorkerChannel(object):
+    """Worker side of the pool result channel.  Passed to the worker
+    *target* in place of the :class:`multiprocessing.Queue` that was
+    used to return counts.  Each worker process has a *channel* of its
+    own so that a worker that is killed mid-write cannot corrupt the
+    results of the other workers.
+
+    """
+    def __init__(self, slot, channel, workers=1):
+        self.__slot = slot
+        self.__channel = channel
+        self.__workers = workers
+
+    @property
+    def slot(self):
+        """Pool slot of the worker.
+        """
+        return self.__slot
+
+    @property
+    def workers(self):
+        """Number of worker slots in the pool.
+        """
+        return self.__workers
+
+    def put(self, value):
+        """Return the *value* result to the pool.
+
+        """
+        self.__channel.put((self.slot, 'result', value))
+
+    def heartbeat(self):
+        """Flag to the pool that the worker is alive.
+
+        """
+        self.__channel.put((self.slot, 'heartbeat', time.time()))
+
+    def done(self):
+        """Flag to the pool that the worker has completed.
+
+        """
+        self.__channel.put((self.slot, 'done', None))
+
+
+def _drain_handler(signum, frame):
+    """Worker process :data:`DRAIN_SIGNALS` handler.
+
+    """
+    log.info('Process %d drain requested on signal %d', os.getpid(), signum)
+    _DRAIN.set()
+
+
+@contextlib.contextmanager
+def drain_on_signals(handler=None):
+    """Install *handler* for the :data:`DRAIN_SIGNALS` for the life
+    of the context.  The default *handler* requests a drain (see
+    :func:`draining`).  Signal handlers can only be installed from the
+    main thread so this is a no-op elsewhere.
+
+    """
+    if handler is None:
+        handler = _drain_handler
+
+    previous = {}
+    for signum in DRAIN_SIGNALS:
+        try:
+            previous[signum] = signal.signal(signum, handler)
+        except ValueError:
+            log.debug('Not in main thread: signal drain disabled')
+            break
+
+    try:
+        yield
+    finally:
+        for signum, prior in previous.items():
+            if prior is not None:
+                signal.signal(signum, prior)
+
+
+def _worker_main(channel, heartbeat_interval, target, args, kwargs):
+    """Worker process entry point.  Runs *target* with the *channel*
+    as the first argument.  Heartbeats are sent from the work loop of
+    *target* via :func:`heartbeat`.
+
+    """
+    global _CHANNEL, _HEARTBEAT_INTERVAL, _LAST_HEARTBEAT
+    _CHANNEL = channel
+    _HEARTBEAT_INTERVAL = heartbeat_interval
+    _LAST_HEARTBEAT = time.time()
+
+    for signum in DRAIN_SIGNALS:
+        signal.signal(signum, _drain_handler)
+
+    try:
+        target(channel, *args, **kwargs)
+    except Exception:
+        log.error('Worker %d in slot %d failed: %s',
+                  os.getpid(), channel.slot, traceback.format_exc())
+        sys.exit(1)
+
+    channel.done()
+
+
+class WorkerPool(object):
+    """Supervised pool of worker processes for a pipeline *stage*.
+
+    Each worker runs *target* with a :class:`WorkerChannel` as the first
+    argument followed by *args* and *kwargs*.  The worker returns its
+    counts via :meth:`WorkerChannel.put`.  :meth:`run` blocks until all
+    workers have completed and returns the collected results.
+
+    The pool supervises each worker slot for the lifetime of the stage:
+
+    * a worker that exits without completing is restarted after an
+      exponential backoff of :attr:`backoff` seconds (capped at
+      :attr:`max_backoff`), up to :attr:`max_restarts` times per slot
+    * a worker that has not sent a heartbeat (see :func:`heartbeat`)
+      within :attr:`heartbeat_timeout` seconds is terminated and
+      restarted
+    * on SIGTERM or SIGINT the workers are asked to drain (see
+      :func:`draining`).  No further restarts are made and workers that
+      are still running after :attr:`drain_timeout` seconds are
+      terminated
+
+    A worker is terminated with SIGTERM so that it can drain and post
+    its results.  It is only killed with SIGKILL if it is still running
+    :attr:`kill_grace` seconds later.  The result channel of a killed
+    worker is discarded unread and the worker is counted as ``lost`` if
+    it had not posted a result.
+
+    .. attribute:: stage
+        name of the stage used to look up the number of workers
+
+    .. attribute:: workers
+        number of worker processes.  Defaults to the :func:`stage_workers`
+        value for :attr:`stage`
+
+    .. attribute:: max_restarts
+        number of restarts allowed per worker slot
+
+    .. attribute:: backoff
+        initial number of seconds to wait before a restart
+
+    .. attribute:: max_backoff
+        maximum number of seconds to wait before a restart
+
+    .. attribute:: heartbeat_interval
+        minimum number of seconds between worker heartbeats.  ``0``
+        disables heartbeats
+
+    .. attribute:: heartbeat_timeout
+        number of seconds without a heartbeat before a worker is
+        considered hung.  ``0`` disables the check
+
+    .. attribute:: drain_timeout
+        number of seconds to wait for workers to drain on a signal
+
+    .. attribute:: kill_grace
+        number of seconds between the SIGTERM and SIGKILL of a worker
+        that is terminated
+
+    .. attribute:: counts
+        :class:`collections.Counter` of ``restarts``, ``failures``,
+        ``hung``, ``killed`` and ``lost`` workers
+
+    """
+    def __init__(self,
+                 target,
+                 args=None,
+                 kwargs=None,
+                 stage=None,
+                 workers=None,
+                 max_restarts=None,
+                 backoff=None,
+                 max_backoff=None,
+                 heartbeat_interval=None,
+                 heartbeat_timeout=None,
+                 drain_timeout=None,
+                 kill_grace=None):
+        self.__target = target
+        self.__args = tuple(args or ())
+        self.__kwargs = dict(kwargs or {})
+        self.__stage = stage
+
+        if workers is None:
+            workers = stage_workers(stage)
+        self.__workers = int(workers)
+
+        if max_restarts is None:
+            max_restarts = CONFIG.get('worker_max_restarts', 3)
+        self.__max_restarts = int(max_restarts)
+
+        if backoff is None:
+            backoff = CONFIG.get('worker_backoff', 1.0)
+        self.__backoff = float(backoff)
+
+        if max_backoff is None:
+            max_backoff = CONFIG.get('worker_max_backoff', 30.0)
+        self.__max_backoff = float(max_backoff)
+
+        if heartbeat_interval is None:
+            heartbeat_interval = CONFIG.get('worker_heartbeat_interval', 5.0)
+        self.__heartbeat_interval = float(heartbeat_interval)
+
+        if heartbeat_timeout is None:
+            heartbeat_timeout = CONFIG.get('worker_heartbeat_timeout', 300.0)
+        self.__heartbeat_timeout = float(heartbeat_timeout)
+
+        if drain_timeout is None:
+            drain_timeout = CONFIG.get('worker_drain_timeout', 30.0)
+        self.__drain_timeout = float(drain_timeout)
+
+        if kill_grace is None:
+            kill_grace = CONFIG.get('worker_kill_grace', 10.0)
+        self.__kill_grace = float(kill_grace)
+
+        self.__channels = {}
+        self.__processes = {}
+        self.__posted = set()
+        self.__hung = set()
+        self.__killing = {}
+        self.__killed = set()
+        self.__heartbeats = {}
+        self.__restarts = collections.Counter()
+        self.__restart_at = {}
+        self.__finished = set()
+        self.__drain_deadline = None
+        self.__results = []
+        self.__counts = collections.Counter()
+
+    @property
+    def stage(self):
+        """:attr:`stage`
+        """
+        return self.__stage
+
+    @property
+    def workers(self):
+        """:attr:`workers`
+        """
+        return self.__workers
+
+    @property
+    def max_restarts(self):
+        """:attr:`max_restarts`
+        """
+        return self.__max_restarts
+
+    @property
+    def backoff(self):
+        """:attr:`backoff`
+        """
+        return self.__backoff
+
+    @property
+    def max_backoff(self):
+        """:attr:`max_backoff`
+        """
+        return self.__max_backoff
+
+    @property
+    def heartbeat_interval(self):
+        """:attr:`heartbeat_interval`
+        """
+        return self.__heartbeat_interval
+
+    @property
+    def heartbeat_timeout(self):
+        """:attr:`heartbeat_timeout`
+        """
+        return self.__heartbeat_timeout
+
+    @property
+    def drain_timeout(self):
+        """:attr:`drain_timeout`
+        """
+        return self.__drain_timeout
+
+    @property
+    def kill_grace(self):
+        """:attr:`kill_grace`
+        """
+        return self.__kill_grace
+
+    @property
+    def counts(self):
+        """:attr:`counts`
+        """
+        return self.__counts
+
+    def run(self):
+        """Start the workers and supervise them until all have either
+        completed or exhausted their restarts.
+
+        Returns:
+            list of the results returned by the workers via
+            :meth:`WorkerChannel.put`
+
+        """
+        log.info('Starting %d "%s" workers', self.workers, self.stage)
+
+        self.__channels = {}
+        self.__results = []
+        self.__finished = set()
+        self.__drain_deadline = None
+        _DRAIN.clear()
+
+        with drain_on_signals(self.__drain):
+            for slot in range(self.workers):
+                self.__start(slot)
+
+            while len(self.__finished) < self.workers:
+                self.__receive(timeout=1)
+                self.__supervise()
+
+        for process in self.__processes.values():
+            process.join()
+        self.__processes.clear()
+
+        # All workers have exited so anything left is already queued.
+        self.__receive()
+
+        log.info('"%s" workers completed: %d results %s',
+                 self.stage, len(self.__results), dict(self.counts))
+
+        return list(self.__results)
+
+    def __start(self, slot):
+        """Start a worker process in *slot*.
+
+        """
+        self.__channels[slot] = multiprocessing.Queue()
+        channel = WorkerChannel(slot, self.__channels[slot], self.workers)
+        args = (channel,
+                self.heartbeat_interval,
+                self.__target,
+                self.__args,
+                self.__kwargs)
+        process = multiprocessing.Process(target=_worker_main, args=args)
+        process.start()
+        log.debug('Started "%s" worker %d in slot %d',
+                  self.stage, process.pid, slot)
+
+        self.__processes[slot] = process
+        self.__heartbeats[slot] = time.time()
+        self.__restart_at.pop(slot, None)
+        self.__posted.discard(slot)
+        self.__hung.discard(slot)
+        self.__killing.pop(slot, None)
+        self.__killed.discard(slot)
+
+    def __receive(self, timeout=None):
+        """Process messages from the workers.  Polls for up to
+        *timeout* seconds for the first message.  Remaining messages
+        are read without blocking.
+
+        """
+        expires = time.time() + (timeout or 0)
+        while True:
+            received = 0
+            for slot in list(self.__channels):
+                received += self.__receive_slot(slot)
+
+            if received or time.time() >= expires:
+                break
+            time.sleep(RECEIVE_POLL_INTERVAL)
+
+    def __receive_slot(self, slot):
+        """Process the messages queued on the channel of *slot*
+        without blocking.
+
+        Returns:
+            number of messages processed
+
+        """
+        received = 0
+        while True:
+            try:
+                _, kind, value = self.__channels[slot].get(False)
+            except Queue.Empty:
+                break
+            received += 1
+
+            self.__heartbeats[slot] = time.time()
+            if kind == 'result':
+                self.__posted.add(slot)
+                self.__results.append(value)
+            elif kind == 'done' and slot not in self.__hung:
+                self.__finished.add(slot)
+
+        return received
+
+    def __terminate(self, slot, process, now):
+        """Send SIGTERM to the worker *process* in *slot*.  The worker is
+        killed if it is still running :attr:`kill_grace` seconds later.
+
+        """
+        if slot in self.__killing:
+            return
+
+        self.__killing[slot] = now + self.kill_grace
+        os.kill(process.pid, signal.SIGTERM)
+
+    def __kill(self, slot, process):
+        """Send SIGKILL to the worker *process* in *slot* once the
+        messages it has queued are processed.  The channel of a killed
+        worker may be left corrupt so it is discarded.
+
+        """
+        log.warning('Worker %d in slot %d still running %.1fs after '
+                    'SIGTERM: killing', process.pid, slot, self.kill_grace)
+        self.__receive_slot(slot)
+        os.kill(process.pid, signal.SIGKILL)
+        self.__killed.add(slot)
+        self.counts['killed'] += 1
+
+    def __supervise(self):
+        """Restart crashed, hung and pending workers.
+
+        """
+        now = time.time()
+        for slot, process in list(self.__processes.items()):
+            if slot in self.__finished:
+                if not process.is_alive():
+                    process.join()
+                    del self.__processes[slot]
+                    if slot in self.__killed:
+                        del self.__channels[slot]
+                continue
+
+            if process.is_alive():
+                if slot in self.__killing:
+                    if (slot not in self.__killed and
+                            now >= self.__killing[slot]):
+                        self.__kill(slot, process)
+                elif self.__drain_deadline and now > self.__drain_deadline:
+                    log.warning('Worker %d did not drain: terminating',
+                                process.pid)
+                    self.__terminate(slot, process, now)
+                elif (self.heartbeat_timeout and
+                      now - self.__heartbeats[slot] > self.heartbeat_timeout):
+                    log.warning('Worker %d in slot %d hung: terminating',
+                                process.pid, slot)
+                    self.counts['hung'] += 1
+                    self.__hung.add(slot)
+                    self.__terminate(slot, process, now)
+                continue
+
+            process.join()
+            del self.__processes[slot]
+
+            if slot in self.__killed:
+                del self.__channels[slot]
+                if slot not in self.__posted:
+                    log.error('Worker %d in slot %d killed before posting '
+                              'its result: counts lost', process.pid, slot)
+                    self.counts['lost'] += 1
+            else:
+                # The completion flag may have arrived after the last read.
+                self.__receive_slot(slot)
+            if slot in self.__finished:
+                continue
+
+            # A hung worker that drains on SIGTERM is still restarted.
+            if process.exitcode == 0 and (slot not in self.__hung or
+                                          draining()):
+                self.__finished.add(slot)
+            elif draining() or self.__restarts[slot] >= self.max_restarts:
+                log.error('Worker %d in slot %d exited with %s: giving up',
+                          process.pid, slot, process.exitcode)
+                self.counts['failures'] += 1
+                self.__finished.add(slot)
+            else:
+                delay = min(self.backoff * 2 ** self.__restarts[slot],
+                            self.max_backoff)
+                log.warning('Worker %d in slot %d exited with %s: '
+                            'restarting in %.1fs',
+                            process.pid, slot, process.exitcode, delay)
+                self.__restarts[slot] += 1
+                self.counts['restarts'] += 1
+                self.__restart_at[slot] = now + delay
+
+        for slot, restart_at in list(self.__restart_at.items()):
+            if draining():
+                self.__restart_at.pop(slot)
+                self.__finished.add(slot)
+            elif now >= restart_at:
+                self.__start(slot)
+
+    def __drain(self, signum, frame):
+        """Pool process :data:`DRAIN_SIGNALS` handler.  Forwards the
+        drain request to the workers.
+
+        """
+        log.info('"%s" worker pool drain requested', self.stage)
+        _DRAIN.set()
+        if self.__drain_deadline is None:
+            self.__drain_deadline = time.time() + self.drain_timeout
+        for process in self.__processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)